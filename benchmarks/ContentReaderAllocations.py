@@ -0,0 +1,59 @@
+'''
+Reports how many bytes are allocated per MiB of encrypted content served in
+requests of 128 KiB, by Encryption.encryptedContent and by ContentReader.
+The allocations of a request are the peak of the memory traced during it,
+the returned data included.
+'''
+import os, shutil, sys, tempfile, tracemalloc
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+from encviewfuse.fuse._ContentReader import ContentReader
+from encviewfuse.fuse._SourceFile import SourceFile
+
+FILE_SIZE = 16 * 1024 * 1024
+REQUEST_SIZE = 128 * 1024
+MIB = 1024 * 1024
+
+class _SaltProvider(object):
+    def getSaltFor(self, absoluteFilePath):
+        return '42'
+
+def measure(read, virtualFile):
+    # the first request creates the cipher and the buffers that are reused later on
+    read(virtualFile, 0, REQUEST_SIZE)
+    allocated = 0
+    for offset in range(0, FILE_SIZE, REQUEST_SIZE):
+        # tracing starts anew for every request, so its peak are the allocations of the request
+        tracemalloc.start()
+        try:
+            read(virtualFile, offset, REQUEST_SIZE)
+            allocated += tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return allocated / (FILE_SIZE / MIB)
+
+def main():
+    directory = tempfile.mkdtemp()
+    saltProvider = _SaltProvider()
+    encryption = Encryption('abc', saltProvider, saltProvider)
+    contentReader = ContentReader(encryption)
+    try:
+        path = os.path.join(directory, 'f')
+        with open(path, 'wb') as f:
+            f.write(os.urandom(FILE_SIZE))
+        readers = (('Encryption.encryptedContent', VirtualFile, encryption.encryptedContent),
+                   ('ContentReader, VirtualFile', VirtualFile,
+                    lambda virtualFile, offset, length: contentReader.read(virtualFile, offset, length, FILE_SIZE)),
+                   ('ContentReader, SourceFile', lambda path: SourceFile(path, os.O_RDONLY, None),
+                    lambda virtualFile, offset, length: contentReader.read(virtualFile, offset, length, FILE_SIZE)))
+        for name, openFile, read in readers:
+            virtualFile = openFile(path)
+            try:
+                print('{0}: {1:.0f} bytes allocated per MiB served'.format(name, measure(read, virtualFile)))
+            finally:
+                virtualFile.closeFileHandle()
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    sys.exit(main())
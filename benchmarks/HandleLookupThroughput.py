@@ -0,0 +1,37 @@
+'''
+Measures how many file handle lookups per second FileHandleContainer serves
+with a growing number of threads. Lookups do not take a lock, so the overall
+throughput should not collapse with more threads.
+'''
+import os, shutil, sys, tempfile, threading, time
+from encviewfuse.fuse._FileHandleContainer import FileHandleContainer
+
+LOOKUPS_PER_THREAD = 200000
+
+def measure(subject, fds, threadCount):
+    def worker():
+        for i in range(0, LOOKUPS_PER_THREAD):
+            subject.getHandle(fds[i % len(fds)])
+    threads = [threading.Thread(target=worker) for _ in range(0, threadCount)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return threadCount * LOOKUPS_PER_THREAD / (time.perf_counter() - start)
+
+def main():
+    directory = tempfile.mkdtemp()
+    subject = FileHandleContainer()
+    try:
+        files = [tempfile.NamedTemporaryFile(dir=directory, delete=False).name for _ in range(0, 10)]
+        fds = [subject.registerHandle(f, os.O_RDONLY) for f in files]
+        for threadCount in (1, 2, 4, 8):
+            print('{0} threads: {1:.0f} lookups per second'.format(threadCount, measure(subject, fds, threadCount)))
+        for fd in fds:
+            subject.unregisterHandle(fd)
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+from deterministic_encryption_utils.encryption.extensions.ExtensionRegistry import ExtensionRegistry
+from encviewfuse.fuse._ArgumentParser import FuseArgumentParser, ArgumentParserError
+from encviewfuse.fuse._SourceWalker import SourceWalker
+from argparse import ArgumentTypeError
+from collections import namedtuple
+import json, os, stat, sys
+
+
+_Record = namedtuple('_Record', ['components', 'viewPath', 'isDirectory', 'ino', 'mtime', 'size'])
+
+
+class EncryptedChangeJournal(object):
+    '''
+    Compares a source tree with a snapshot of a previous run and reports the
+    view paths of added, changed and deleted files without going through the
+    mount. The snapshot stores (inode, mtime, size) and the view path of every
+    entry in walk order, so both can be compared while walking and names of
+    unchanged entries do not have to be encrypted again. As the snapshot
+    contains the plain paths, it belongs to the source and not to the backup.
+    '''
+
+    ADDED = 'A'
+    CHANGED = 'M'
+    DELETED = 'D'
+
+    def __init__(self, root, secret, fileSaltProvider, filenameSaltProvider):
+        self.walker = SourceWalker(root)
+        self.encryption = Encryption(secret, fileSaltProvider, filenameSaltProvider)
+
+    def changes(self, snapshotPath):
+        '''
+        Yields (change, view path) tuples for all files that changed since the
+        snapshot was written. A missing snapshot counts as empty. The snapshot
+        is replaced by the current state once all changes have been yielded.
+        '''
+        temporaryPath = snapshotPath + '.part'
+        with EncryptedChangeJournal._SnapshotReader(snapshotPath) as previousRecords, open(temporaryPath, 'w', encoding='utf-8') as snapshot:
+            previous = next(previousRecords, None)
+            # view paths of the directories on the way to the current entry
+            viewPaths = ['']
+            for components, sourcePath, st in self.walker.walk():
+                while previous is not None and previous.components < components:
+                    yield from EncryptedChangeJournal.__deleted(previous)
+                    previous = next(previousRecords, None)
+                if previous is not None and previous.components != components:
+                    record = self.__record(components, sourcePath, st, viewPaths, None)
+                    yield from EncryptedChangeJournal.__compare(None, record)
+                else:
+                    record = self.__record(components, sourcePath, st, viewPaths, previous)
+                    yield from EncryptedChangeJournal.__compare(previous, record)
+                    previous = next(previousRecords, None)
+                snapshot.write(json.dumps([os.sep.join(record.components), record.viewPath, record.isDirectory, record.ino, record.mtime, record.size]))
+                snapshot.write('\n')
+            while previous is not None:
+                yield from EncryptedChangeJournal.__deleted(previous)
+                previous = next(previousRecords, None)
+        os.replace(temporaryPath, snapshotPath)
+
+    def __record(self, components, sourcePath, st, viewPaths, previous):
+        del viewPaths[len(components):]
+        isDirectory = stat.S_ISDIR(st.st_mode)
+        if previous is not None and previous.isDirectory == isDirectory and (previous.ino, previous.mtime, previous.size) == (st.st_ino, st.st_mtime_ns, st.st_size) \
+                and os.path.dirname(previous.viewPath) == viewPaths[-1]:
+            # the salts only depend on the name and the modification time
+            viewPath = previous.viewPath
+        else:
+            viewPath = os.path.join(viewPaths[-1], self.encryption.encryptFileName(sourcePath, components[-1]))
+        viewPaths.append(viewPath)
+        return _Record(components, viewPath, isDirectory, st.st_ino, st.st_mtime_ns, st.st_size)
+
+    @staticmethod
+    def __compare(previous, record):
+        if previous is not None and (previous.viewPath != record.viewPath or previous.isDirectory != record.isDirectory):
+            yield from EncryptedChangeJournal.__deleted(previous)
+            previous = None
+        if record.isDirectory:
+            return
+        if previous is None:
+            yield EncryptedChangeJournal.ADDED, record.viewPath
+        elif (previous.ino, previous.mtime, previous.size) != (record.ino, record.mtime, record.size):
+            yield EncryptedChangeJournal.CHANGED, record.viewPath
+
+    @staticmethod
+    def __deleted(previous):
+        if not previous.isDirectory:
+            yield EncryptedChangeJournal.DELETED, previous.viewPath
+
+    class _SnapshotReader(object):
+        '''
+        Reads the records of a snapshot, which are sorted by their components.
+        '''
+
+        def __init__(self, snapshotPath):
+            self.file = open(snapshotPath, 'r', encoding='utf-8') if os.path.exists(snapshotPath) else None
+
+        def __enter__(self):
+            return self.__records()
+
+        def __exit__(self, *args):
+            if self.file is not None:
+                self.file.close()
+
+        def __records(self):
+            if self.file is None:
+                return
+            for line in self.file:
+                path, viewPath, isDirectory, ino, mtime, size = json.loads(line)
+                yield _Record(tuple(path.split(os.sep)), viewPath, isDirectory, ino, mtime, size)
+
+
+def main():
+    args = None
+    try:
+        args = FuseArgumentParser(ExtensionRegistry()).parseJournalArguments(sys.argv[1:])
+    except (ArgumentTypeError, ArgumentParserError) as e:
+        print('Error during command line parsing: {0}'.format(str(e)))
+        sys.exit(1)
+
+    journal = EncryptedChangeJournal(args.source, args.mountOptions.secret, args.mountOptions.fileSalt, args.mountOptions.filenameSalt)
+    try:
+        for change, viewPath in journal.changes(args.snapshot):
+            print('{0} {1}'.format(change, viewPath))
+    except OSError as e:
+        print('Error while comparing with the snapshot: {0}'.format(str(e)), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+from deterministic_encryption_utils.encryption.extensions.ExtensionRegistry import ExtensionRegistry
+from encviewfuse.fuse._ArgumentParser import FuseArgumentParser, ArgumentParserError
+from encviewfuse.fuse._SourceWalker import SourceWalker
+from argparse import ArgumentTypeError
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+import os, stat, sys, tarfile
+
+
+# a function call that is run in the worker processes
+_Task = namedtuple('_Task', ['function', 'arguments'])
+
+# the encryption of the worker process, created once by _initializeWorker
+_encryption = None
+
+def _initializeWorker(encryptionArguments):
+    global _encryption
+    _encryption = Encryption(*encryptionArguments)
+
+def _openUnchanged(sourcePath, size, mtimeNs):
+    '''
+    Returns a VirtualFile for the source file or None if the file changed or
+    vanished since it was listed.
+    '''
+    try:
+        virtualFile = VirtualFile(sourcePath)
+    except (FileNotFoundError, ValueError):
+        return None
+    if not _isUnchanged(virtualFile, size, mtimeNs):
+        virtualFile.closeFileHandle()
+        return None
+    return virtualFile
+
+def _isUnchanged(virtualFile, size, mtimeNs):
+    st = os.fstat(virtualFile.fd)
+    return st.st_size == size and st.st_mtime_ns == mtimeNs
+
+def _encryptFile(sourcePath, targetPath, size, mtimeNs):
+    '''
+    Writes the encrypted content of the source file to the target path.
+    Returns the source path and the number of written bytes, which is None
+    if the source file changed during the export and was left out.
+    '''
+    encryptedSize = _encryption.encryptedFileSize(size)
+    # encrypted names never start with a dot, so the temporary file cannot collide with them
+    temporaryPath = os.path.join(os.path.dirname(targetPath), '.{0}.part'.format(os.path.basename(targetPath)))
+    virtualFile = _openUnchanged(sourcePath, size, mtimeNs)
+    if virtualFile is None:
+        return sourcePath, None
+    try:
+        fd = os.open(temporaryPath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            for offset in range(0, encryptedSize, EncryptedExport.CHUNK_SIZE):
+                data = memoryview(_encryption.encryptedContent(virtualFile, offset, EncryptedExport.CHUNK_SIZE))
+                while len(data) > 0:
+                    data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)
+        if not _isUnchanged(virtualFile, size, mtimeNs):
+            os.remove(temporaryPath)
+            return sourcePath, None
+    finally:
+        virtualFile.closeFileHandle()
+    os.utime(temporaryPath, ns=(mtimeNs, mtimeNs))
+    os.replace(temporaryPath, targetPath)
+    return sourcePath, encryptedSize
+
+def _encryptChunk(sourcePath, size, mtimeNs, offset, length):
+    '''
+    Returns the encrypted chunk of the source file or None if the file
+    changed during the export.
+    '''
+    virtualFile = _openUnchanged(sourcePath, size, mtimeNs)
+    if virtualFile is None:
+        return None
+    try:
+        data = _encryption.encryptedContent(virtualFile, offset, length)
+        return data if _isUnchanged(virtualFile, size, mtimeNs) else None
+    finally:
+        virtualFile.closeFileHandle()
+
+
+class EncryptedExport(object):
+    '''
+    Writes the encrypted view of a source directory, as EncViewFuse shows it,
+    without FUSE. Files are encrypted in a process pool, either into a target
+    directory or into a tar stream. Symbolic links are followed like in the
+    view, entries that are neither files nor directories are skipped. Files
+    that change while they are exported do not abort the export, they are
+    reported instead.
+    '''
+
+    CHUNK_SIZE = 4 * 1024 * 1024
+
+    def __init__(self, root, secret, fileSaltProvider, filenameSaltProvider, workers=None):
+        self.walker = SourceWalker(root)
+        self.encryptionArguments = (secret, fileSaltProvider, filenameSaltProvider)
+        self.encryption = Encryption(secret, fileSaltProvider, filenameSaltProvider)
+        self.workers = workers if workers is not None else os.cpu_count() or 1
+        # number of tasks that may run ahead of the one whose result is written
+        self.window = 2 * self.workers
+
+    def exportToDirectory(self, target, paths=None):
+        '''
+        Writes the encrypted view below the target directory. Files whose
+        encrypted version has the expected size and mtime are skipped. Returns
+        the number of exported and skipped files and the source paths of the
+        files that changed during the export, which were left out.
+        '''
+        statistics = {'exported': 0, 'skipped': 0, 'changed': list()}
+        def tasks():
+            for viewPath, sourcePath, st in self.__walk(paths):
+                targetPath = os.path.join(target, viewPath)
+                if stat.S_ISDIR(st.st_mode):
+                    os.makedirs(targetPath, exist_ok=True)
+                elif self.__isUpToDate(targetPath, st):
+                    statistics['skipped'] += 1
+                else:
+                    yield _Task(_encryptFile, (sourcePath, targetPath, st.st_size, st.st_mtime_ns))
+        with self.__executor() as executor:
+            for sourcePath, encryptedSize in self.__inOrder(executor, tasks()):
+                if encryptedSize is None:
+                    statistics['changed'].append(sourcePath)
+                else:
+                    statistics['exported'] += 1
+        return statistics
+
+    def exportToTar(self, stream, paths=None):
+        '''
+        Writes the encrypted view as an uncompressed tar stream. Returns the
+        number of exported files, the source paths of the files that changed
+        before their entry was started, which were left out, and the ones
+        that changed later, whose entry is filled up with zeros like GNU tar
+        does.
+        '''
+        statistics = {'exported': 0, 'changed': list(), 'incomplete': list()}
+        def items():
+            for viewPath, sourcePath, st in self.__walk(paths):
+                yield (viewPath, sourcePath, st)
+                if stat.S_ISREG(st.st_mode):
+                    encryptedSize = self.encryption.encryptedFileSize(st.st_size)
+                    for offset in range(0, encryptedSize, EncryptedExport.CHUNK_SIZE):
+                        length = min(EncryptedExport.CHUNK_SIZE, encryptedSize - offset)
+                        yield _Task(_encryptChunk, (sourcePath, st.st_size, st.st_mtime_ns, offset, length))
+        with self.__executor() as executor, tarfile.open(fileobj=stream, mode='w|') as tar:
+            results = self.__inOrder(executor, items())
+            for viewPath, sourcePath, st in results:
+                info = tarfile.TarInfo(viewPath)
+                info.mtime = st.st_mtime
+                info.mode = stat.S_IMODE(st.st_mode) & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+                if stat.S_ISDIR(st.st_mode):
+                    info.type = tarfile.DIRTYPE
+                    tar.addfile(info)
+                    continue
+                info.size = self.encryption.encryptedFileSize(st.st_size)
+                chunks = EncryptedExport._ChunkReader(islice(results, -(-info.size // EncryptedExport.CHUNK_SIZE)))
+                # the entry is only started once the first chunk shows that the file did not change yet
+                if not chunks.start():
+                    chunks.skip()
+                    statistics['changed'].append(sourcePath)
+                    continue
+                tar.addfile(info, chunks)
+                chunks.skip()
+                if chunks.changed:
+                    statistics['incomplete'].append(sourcePath)
+                else:
+                    statistics['exported'] += 1
+        return statistics
+
+    class _ChunkReader(object):
+        '''
+        A file object for tarfile that reads the chunks of a file entry. A
+        chunk of None means that the file changed, the rest of the entry is
+        then filled with zeros.
+        '''
+
+        def __init__(self, chunks):
+            self.chunks = chunks
+            self.chunk = memoryview(b'')
+            self.changed = False
+
+        def start(self):
+            '''
+            Takes the first chunk, returns False if the file changed before.
+            '''
+            self.changed = not self.__next()
+            return not self.changed
+
+        def read(self, size):
+            parts = list()
+            while size > 0:
+                if len(self.chunk) == 0 and (self.changed or not self.__next()):
+                    self.changed = True
+                    parts.append(bytes(size))
+                    break
+                parts.append(self.chunk[:size])
+                size -= len(parts[-1])
+                self.chunk = self.chunk[len(parts[-1]):]
+            return b''.join(parts)
+
+        def skip(self):
+            '''
+            Drops the chunks that were not read.
+            '''
+            for _ in self.chunks:
+                pass
+
+        def __next(self):
+            chunk = next(self.chunks, False)
+            if chunk is False:
+                raise OSError('The encrypted content ended unexpectedly.')
+            if chunk is None:
+                return False
+            self.chunk = memoryview(chunk)
+            return True
+
+    def __executor(self):
+        # every worker creates the encryption once, tasks only carry their own arguments
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=_initializeWorker, initargs=(self.encryptionArguments,))
+
+    def __inOrder(self, executor, items):
+        '''
+        Yields the items in their order, tasks are replaced by their results.
+        At most window tasks are submitted ahead.
+        '''
+        pending = deque()
+        running = 0
+        for item in items:
+            if isinstance(item, _Task):
+                pending.append((True, executor.submit(item.function, *item.arguments)))
+                running += 1
+            else:
+                pending.append((False, item))
+            while running >= self.window or (len(pending) > 0 and not pending[0][0]):
+                isTask, value = pending.popleft()
+                if isTask:
+                    running -= 1
+                    value = value.result()
+                yield value
+        while len(pending) > 0:
+            isTask, value = pending.popleft()
+            yield value.result() if isTask else value
+
+    def __walk(self, paths):
+        '''
+        Yields (view path, source path, stat result) for the given source paths
+        relative to the root and everything below them.
+        '''
+        # view paths of the directories on the way to the current entry
+        viewPaths = ['']
+        for components, sourcePath, st in self.walker.walk(paths):
+            del viewPaths[len(components):]
+            viewPath = os.path.join(viewPaths[-1], self.encryption.encryptFileName(sourcePath, components[-1]))
+            viewPaths.append(viewPath)
+            yield viewPath, sourcePath, st
+
+    def __isUpToDate(self, targetPath, st):
+        try:
+            targetStat = os.stat(targetPath)
+        except OSError:
+            return False
+        return targetStat.st_size == self.encryption.encryptedFileSize(st.st_size) and targetStat.st_mtime_ns == st.st_mtime_ns
+
+
+def main():
+    args = None
+    try:
+        args = FuseArgumentParser(ExtensionRegistry()).parseExportArguments(sys.argv[1:])
+    except (ArgumentTypeError, ArgumentParserError) as e:
+        print('Error during command line parsing: {0}'.format(str(e)))
+        sys.exit(1)
+
+    export = EncryptedExport(args.source, args.mountOptions.secret, args.mountOptions.fileSalt,
+                             args.mountOptions.filenameSalt, args.workers)
+    try:
+        if args.tar and args.target == '-':
+            statistics = export.exportToTar(sys.stdout.buffer, args.paths)
+        elif args.tar:
+            with open(args.target, 'wb') as f:
+                statistics = export.exportToTar(f, args.paths)
+        else:
+            statistics = export.exportToDirectory(args.target, args.paths)
+            print('Exported {0} files, {1} files were up to date.'.format(statistics['exported'], statistics['skipped']), file=sys.stderr)
+        for sourcePath in statistics['changed']:
+            print('The file "{0}" changed during the export and was left out.'.format(sourcePath), file=sys.stderr)
+        for sourcePath in statistics.get('incomplete', ()):
+            print('The file "{0}" changed during the export, its entry is filled up with zeros.'.format(sourcePath), file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print('Error during the export: {0}'.format(str(e)), file=sys.stderr)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
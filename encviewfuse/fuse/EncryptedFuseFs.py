@@ -1,55 +1,633 @@
-from deterministic_encryption_utils.encryption.Encryption import MalformedInputException
+from deterministic_encryption_utils.encryption.Encryption import Encryption, MalformedInputException
 from encviewfuse.fuse._FuseFsBase import FuseFsBase
 from fuse import FUSE, FuseOSError
-from errno import ENOENT
-import os, stat, sys
+from errno import ENOENT, ENODATA
+import os, re, stat, sys, logging, hashlib, errno, inspect
 from encviewfuse.fuse._ArgumentParser import FuseArgumentParser,\
     ArgumentParserError
 from deterministic_encryption_utils.encryption.extensions.ExtensionRegistry import ExtensionRegistry
 from argparse import ArgumentTypeError
+from encviewfuse.fuse._LruCache import LruCache
+from encviewfuse.fuse._PathTrie import PathTrie
+from encviewfuse.fuse._ReadAhead import ReadAhead
+from encviewfuse.fuse._MetadataIndex import MetadataIndex
+from encviewfuse.fuse._WarmUpCrawler import WarmUpCrawler
+from encviewfuse.fuse._SourceWatcher import SourceWatcher
+from encviewfuse.fuse._KernelNotifier import KernelNotifier
+from encviewfuse.fuse._CachingSaltProvider import CachingSaltProvider
+from encviewfuse.fuse._ContentDigests import ContentDigests
+from encviewfuse.fuse._ContentReader import ContentReader
+from encviewfuse.fuse._InodeMap import InodeMap
+from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+from functools import partial
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
 
+logger = logging.getLogger(__name__)
+# missing extended attributes are reported as ENOATTR where it exists
+ENOATTR = getattr(errno, 'ENOATTR', ENODATA)
 
 class EncViewFuse(FuseFsBase):
     
-    def __init__(self, root, secret, fileSaltProvider, filenameSaltProvider):
-        super(EncViewFuse, self).__init__(root, secret, fileSaltProvider, filenameSaltProvider)
+    DEFAULT_PATH_CACHE_SIZE = 65536
+    DEFAULT_PATH_TRIE_SIZE = 65536
+    DEFAULT_NAME_CACHE_SIZE = 262144
+    DEFAULT_ATTR_CACHE_SIZE = 65536
+    DEFAULT_SALT_CACHE_SIZE = 65536
+    DEFAULT_ATTR_TIMEOUT = 1.0
+    DEFAULT_NEGATIVE_CACHE_SIZE = 16384
+    DEFAULT_NEGATIVE_TIMEOUT = 1.0
+    DEFAULT_BLOCK_CACHE_SIZE = 32 * 1024 * 1024
+    DEFAULT_READ_AHEAD = 8
+    DEFAULT_READ_AHEAD_WORKERS = 2
+    DEFAULT_MAX_OPEN_FILES = 0
+    DEFAULT_WARM_UP_WORKERS = 1
+    DEFAULT_WARM_UP_RATE = 1000
+    DEFAULT_WARM_UP_CACHE_SIZE = 262144
+    DEFAULT_WATCH_TIMEOUT = 60.0
+    DEFAULT_READDIR_THRESHOLD = 1024
+    DEFAULT_READDIR_WORKERS = 4
+    BLOCK_SIZE = 128 * 1024
+    ENCRYPTED_NAME_PATTERN = re.compile('[A-Za-z0-9_-]+={0,2}')
+    DIGEST_ATTRIBUTE = 'user.encview.sha256'
+    DIGEST_CHUNK_SIZE = 1024 * 1024
+    DIGEST_CACHE_SIZE = 65536
+    DEFAULT_DIGEST_WORKERS = 1
+    DEFAULT_METADATA_WORKERS = 0
+    DEFAULT_DATA_WORKERS = 0
+    
+    def __init__(self, root, secret, fileSaltProvider, filenameSaltProvider, pathCacheSize=DEFAULT_PATH_CACHE_SIZE,
+                 pathTrieSize=DEFAULT_PATH_TRIE_SIZE, nameCacheSize=DEFAULT_NAME_CACHE_SIZE,
+                 attrCacheSize=DEFAULT_ATTR_CACHE_SIZE, attrTimeout=DEFAULT_ATTR_TIMEOUT, readdirPlus=False,
+                 blockCacheSize=DEFAULT_BLOCK_CACHE_SIZE, readAhead=DEFAULT_READ_AHEAD,
+                 readAheadWorkers=DEFAULT_READ_AHEAD_WORKERS, maxOpenFiles=DEFAULT_MAX_OPEN_FILES, indexFile=None, warmUp=False,
+                 warmUpWorkers=DEFAULT_WARM_UP_WORKERS, warmUpRate=DEFAULT_WARM_UP_RATE,
+                 warmUpCacheSize=DEFAULT_WARM_UP_CACHE_SIZE, watch=False,
+                 watchTimeout=DEFAULT_WATCH_TIMEOUT, readdirThreshold=DEFAULT_READDIR_THRESHOLD,
+                 readdirWorkers=DEFAULT_READDIR_WORKERS, saltCacheSize=DEFAULT_SALT_CACHE_SIZE,
+                 negativeCacheSize=DEFAULT_NEGATIVE_CACHE_SIZE, negativeTimeout=DEFAULT_NEGATIVE_TIMEOUT,
+                 contentDigests=False, digestWorkers=DEFAULT_DIGEST_WORKERS,
+                 metadataWorkers=DEFAULT_METADATA_WORKERS, dataWorkers=DEFAULT_DATA_WORKERS):
+        self.fileSaltProvider = fileSaltProvider
+        self.filenameSaltProvider = filenameSaltProvider
+        if saltCacheSize > 0:
+            self.fileSaltProvider = CachingSaltProvider(fileSaltProvider, saltCacheSize)
+            self.filenameSaltProvider = CachingSaltProvider(filenameSaltProvider, saltCacheSize)
+        super(EncViewFuse, self).__init__(root, secret, self.fileSaltProvider, self.filenameSaltProvider, maxOpenFiles,
+                                          metadataWorkers, dataWorkers)
+        self.pathCache = LruCache(pathCacheSize)
+        # hard links of the source share their inode number in the view
+        self.inodeMap = InodeMap(os.stat(self.root).st_dev)
+        # maps view directories to (unresolved root path, absolute root path, signature)
+        self.pathTrie = PathTrie(pathTrieSize)
+        # maps (directory device, directory inode, name) to (inode, mtime, encrypted name)
+        self.encryptedNameCache = LruCache(nameCacheSize)
+        # maps encrypted names to plain names
+        self.decryptedNameCache = LruCache(nameCacheSize)
+        self.attrTimeout = attrTimeout
+        self.watchTimeout = watchTimeout
+        self.sourceWatcher = self.__createSourceWatcher() if watch else None
+        self.kernelNotifier = None
+        # changes of a completely watched source tree are pushed into the caches,
+        # so they may keep entries much longer
+        self.watched = self.sourceWatcher is not None and self.sourceWatcher.isComplete()
+        # maps view paths to their attributes including the encrypted size
+        self.attributeCache = LruCache(attrCacheSize, watchTimeout if self.watched else attrTimeout)
+        # contains the view paths that were looked up recently but do not exist
+        self.negativeTimeout = negativeTimeout
+        self.negativeCache = LruCache(negativeCacheSize, watchTimeout if self.watched else negativeTimeout)
+        self.readdirPlus = readdirPlus
+        # directories with at least readdirThreshold entries are encrypted by readdirWorkers threads
+        self.readdirThreshold = readdirThreshold
+        self.readdirWorkers = readdirWorkers
+        self.readdirExecutor = None
+        self.readdirExecutorLock = Lock()
+        # maps (device, inode, mtime, size, file salt, block index) to encrypted blocks of the view,
+        # the size of the cache is limited in bytes
+        self.blockCache = LruCache(blockCacheSize, weigh=len)
+        self.contentReader = ContentReader(self.encryption)
+        self.readAhead = ReadAhead(EncViewFuse.BLOCK_SIZE, readAhead, readAheadWorkers)
+        self.metadataIndex = None
+        if indexFile is not None:
+            fingerprint = MetadataIndex.fingerprint(secret, fileSaltProvider, filenameSaltProvider)
+            self.metadataIndex = MetadataIndex(indexFile, fingerprint)
+        self.contentDigests = None
+        if contentDigests:
+            self.contentDigests = ContentDigests(EncViewFuse.DIGEST_CACHE_SIZE, digestWorkers, self.metadataIndex)
+        # the warm-up fills caches of its own that neither expire with the attribute timeout nor evict
+        # entries of requests: view paths map to (absolute root path, parent path, parent signature)
+        # like in the path cache and (directory device, directory inode, name) map to (inode, mtime,
+        # encrypted name) like in the encrypted name cache
+        self.warmUpPaths = LruCache(warmUpCacheSize if warmUp else 0)
+        self.warmUpNames = LruCache(warmUpCacheSize if warmUp else 0)
+        self.warmUpCrawler = None
+        if warmUp:
+            self.warmUpCrawler = WarmUpCrawler(self.__warmUpDirectory, warmUpWorkers, warmUpRate)
 
     def read(self, path, size, offset, fh):
         try:
             virtualFile = self.fileHandleContainer.getHandle(fh)
         except ValueError:
             raise FuseOSError(ENOENT)
-        return self.encryption.encryptedContent(virtualFile, offset, size)
+        st = virtualFile.stat()
+        if self.blockCache.capacity == 0 and not self.readAhead.isEnabled():
+            data = self.contentReader.read(virtualFile, offset, size, st.st_size)
+        else:
+            data = self.__readBlocks(fh, virtualFile, self.__contentKey(virtualFile, st), self.__encryptedFileSize(st.st_size),
+                                     size, offset)
+        if self.contentDigests is not None:
+            self.contentDigests.access(fh, self.__contentKey(virtualFile, st), self.__encryptedFileSize(st.st_size), offset, data)
+        return data
+    
+    def __contentKey(self, virtualFile, st):
+        '''
+        Returns the (device, inode, mtime, size, file salt) key of the content
+        of the given handle. The salt may depend on the name, so hard links
+        must not share their blocks or digests.
+        '''
+        return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, self.__fileSalt(virtualFile))
+    
+    def __fileSalt(self, virtualFile):
+        encryptionDict = virtualFile.encryptionDict()
+        salt = encryptionDict.get('fileSalt')
+        if salt is None:
+            salt = self.fileSaltProvider.getSaltFor(virtualFile.name())
+            encryptionDict['fileSalt'] = salt
+        return salt
+    
+    def __readBlocks(self, fh, virtualFile, fileKey, encryptedFileSize, size, offset):
+        end = min(offset + size, encryptedFileSize)
+        window = self.readAhead.access(fh, offset, size)
+        if end <= offset:
+            return b''
+        
+        firstBlockIndex = offset // EncViewFuse.BLOCK_SIZE
+        lastBlockIndex = (end - 1) // EncViewFuse.BLOCK_SIZE
+        blocks = list()
+        for blockIndex in range(firstBlockIndex, lastBlockIndex + 1):
+            blocks.append(self.__encryptedBlock(fh, virtualFile, fileKey, blockIndex))
+        
+        lastBlockIndexOfFile = (encryptedFileSize - 1) // EncViewFuse.BLOCK_SIZE
+        for blockIndex in range(lastBlockIndex + 1, min(lastBlockIndex + window, lastBlockIndexOfFile) + 1):
+            if fileKey + (blockIndex,) not in self.blockCache:
+                self.readAhead.schedule(fh, fileKey, blockIndex, partial(self.__encryptBlock, virtualFile, fileKey, blockIndex))
+        
+        blockOffset = offset - firstBlockIndex * EncViewFuse.BLOCK_SIZE
+        if len(blocks) == 1:
+            return blocks[0][blockOffset:blockOffset + end - offset]
+        # slicing memoryviews of the blocks copies the data only once
+        blocks[0] = memoryview(blocks[0])[blockOffset:]
+        blocks[-1] = memoryview(blocks[-1])[:end - (lastBlockIndex * EncViewFuse.BLOCK_SIZE)]
+        return b''.join(blocks)
+    
+    def release(self, path, fh):
+        # background reads of the handle have to be finished before it is closed
+        self.readAhead.release(fh)
+        if self.contentDigests is not None:
+            self.contentDigests.release(fh)
+        super(EncViewFuse, self).release(path, fh)
+    
+    def init(self, path):
+        if self.sourceWatcher is not None:
+            # backends other than fusepy bring their own notifier
+            if self.kernelNotifier is None and KernelNotifier.isSupported():
+                self.kernelNotifier = KernelNotifier()
+            self.sourceWatcher.start()
+        if self.warmUpCrawler is not None:
+            self.warmUpCrawler.start((os.sep, self.root))
+    
+    def destroy(self, path):
+        if self.sourceWatcher is not None:
+            self.sourceWatcher.stop()
+        if self.warmUpCrawler is not None:
+            self.warmUpCrawler.stop()
+        self.readAhead.shutdown()
+        if self.contentDigests is not None:
+            self.contentDigests.shutdown()
+        if self.readdirExecutor is not None:
+            self.readdirExecutor.shutdown(wait=True)
+        if self.metadataIndex is not None:
+            self.metadataIndex.close()
+    
+    def __encryptedBlock(self, fh, virtualFile, fileKey, blockIndex):
+        blockKey = fileKey + (blockIndex,)
+        block = self.blockCache.get(blockKey)
+        if block is None:
+            block = self.readAhead.take(fh, fileKey, blockIndex)
+            if block is None:
+                block = self.__encryptBlock(virtualFile, fileKey, blockIndex)
+            self.blockCache.put(blockKey, block)
+        return block
+    
+    def __encryptBlock(self, virtualFile, fileKey, blockIndex):
+        return self.contentReader.read(virtualFile, blockIndex * EncViewFuse.BLOCK_SIZE, EncViewFuse.BLOCK_SIZE, fileKey[3])
+    
+    def getxattr(self, path, name, position=0):
+        if name != EncViewFuse.DIGEST_ATTRIBUTE or self.contentDigests is None:
+            raise FuseOSError(ENOATTR)
+        absRootPath, fileKey = self.__fileKey(path)
+        digest = self.contentDigests.get(fileKey)
+        if digest is None:
+            # the next request will find the digest, until then the content has to be read
+            self.contentDigests.schedule(fileKey, partial(self.__computeDigest, absRootPath, fileKey))
+            raise FuseOSError(ENOATTR)
+        return digest.encode()
+    
+    def listxattr(self, path):
+        if self.contentDigests is None:
+            return []
+        _, fileKey = self.__fileKey(path)
+        if self.contentDigests.get(fileKey) is None:
+            return []
+        return [EncViewFuse.DIGEST_ATTRIBUTE]
+    
+    def __fileKey(self, path):
+        '''
+        Returns the absolute root path and the (device, inode, mtime, size,
+        file salt) key of a regular file. Other entries have no extended
+        attributes.
+        '''
+        try:
+            absRootPath = self.__decryptToAbsolutePath(path)
+            st = os.stat(absRootPath)
+        except (MalformedInputException, OSError):
+            raise FuseOSError(ENOENT)
+        if not stat.S_ISREG(st.st_mode):
+            raise FuseOSError(ENOATTR)
+        try:
+            salt = self.fileSaltProvider.getSaltFor(absRootPath)
+        except ValueError:
+            raise FuseOSError(ENOENT)
+        return absRootPath, (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, salt)
+    
+    def __computeDigest(self, absRootPath, fileKey):
+        virtualFile = VirtualFile(absRootPath)
+        try:
+            st = os.fstat(virtualFile.fd)
+            if (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size) != fileKey[:4]:
+                return None
+            digest = hashlib.sha256()
+            for offset in range(0, self.__encryptedFileSize(st.st_size), EncViewFuse.DIGEST_CHUNK_SIZE):
+                digest.update(self.contentReader.read(virtualFile, offset, EncViewFuse.DIGEST_CHUNK_SIZE, st.st_size))
+            st = os.fstat(virtualFile.fd)
+            if (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size) != fileKey[:4]:
+                return None
+            return digest.hexdigest()
+        finally:
+            virtualFile.closeFileHandle()
     
     def getattr(self, path, fh=None):
+        stats = self.attributeCache.get(path)
+        if stats is not None:
+            return dict(stats)
+        
+        if self.negativeCache.get(path) is not None:
+            raise FuseOSError(ENOENT)
         try:
             absRootPath = self.__decryptToAbsolutePath(path)
-            
-            if not os.path.exists(absRootPath) or os.path.islink(absRootPath):
-                raise FuseOSError(ENOENT)
-            
             st = os.lstat(absRootPath)
-            stats = dict((key, getattr(st, key)) for key in ('st_atime', 'st_ctime',
-                     'st_gid', 'st_mode', 'st_mtime', 'st_nlink', 'st_size', 'st_uid'))
-            stats['st_mode'] = st.st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
-            
-            if os.path.isfile(absRootPath):
-                stats['st_size'] = self.__encryptedFileSize(os.path.getsize(absRootPath))                
-            return stats
-        except MalformedInputException:
+        except (MalformedInputException, OSError):
+            self.negativeCache.put(path, True)
+            raise FuseOSError(ENOENT)
+        if stat.S_ISLNK(st.st_mode):
+            self.negativeCache.put(path, True)
             raise FuseOSError(ENOENT)
+        
+        stats = self.__attributesFromStat(st)
+        self.attributeCache.put(path, stats)
+        return dict(stats)
+    
+    def __attributesFromStat(self, st):
+        stats = dict((key, getattr(st, key)) for key in ('st_atime', 'st_ctime',
+                 'st_gid', 'st_mode', 'st_mtime', 'st_nlink', 'st_size', 'st_uid'))
+        stats['st_mode'] = st.st_mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH)
+        stats['st_ino'] = self.inodeMap.inode(st.st_dev, st.st_ino)
+        if stat.S_ISREG(st.st_mode):
+            stats['st_size'] = self.__encryptedFileSize(st.st_size)
+        return stats
 
 
     def _FuseFsBase__convertViewPathToAbsoluteRootPath(self, path):
         return self.__decryptToAbsolutePath(path)
 
-    def _FuseFsBase__processReadDirEntry(self, absRootPath, entry):
+    def _FuseFsBase__processReadDirEntries(self, path, absRootPath, entries):
+        dirStat = os.stat(absRootPath)
+        directoryIndex = None
+        if self.metadataIndex is not None:
+            directoryIndex = self.metadataIndex.directory(dirStat.st_dev, dirStat.st_ino)
+        viewEntry = partial(self.__viewEntry, path, absRootPath, dirStat, directoryIndex)
+        names = list()
+        parallel = False
+        for chunk in EncViewFuse.__chunks(entries, self.readdirThreshold):
+            names.extend(entry.name for entry in chunk)
+            # small directories end within the first chunk and are not worth the thread hand-off
+            parallel = parallel or (len(chunk) == self.readdirThreshold and self.readdirWorkers > 1)
+            if parallel:
+                yield from self.__viewEntriesInParallel(viewEntry, chunk)
+            else:
+                yield from map(viewEntry, chunk)
+        if directoryIndex is not None:
+            directoryIndex.finish(names)
+    
+    def __viewEntry(self, path, absRootPath, dirStat, directoryIndex, entry):
+        try:
+            entryStat = entry.stat()
+        except OSError:
+            entryStat = None
+        entryViewName = self.__encryptFileName(dirStat, absRootPath, entry.name, entryStat, directoryIndex)
+        self.negativeCache.remove(os.path.join(path, entryViewName))
+        if self.readdirPlus and entryStat is not None:
+            # hand out the attributes right away, pyfuse3 passes them on to the kernel and fusepy finds them in the cache
+            attributes = self.__attributesFromStat(entryStat)
+            self.attributeCache.put(os.path.join(path, entryViewName), attributes)
+            return (entryViewName, dict(attributes), 0)
+        return entryViewName
+    
+    def __viewEntriesInParallel(self, viewEntry, chunk):
+        '''
+        Computes the view entries of the chunk in the readdir pool, keeping
+        their order.
+        '''
+        with self.readdirExecutorLock:
+            if self.readdirExecutor is None:
+                self.readdirExecutor = ThreadPoolExecutor(max_workers=self.readdirWorkers, thread_name_prefix='encviewfuse-readdir')
+            executor = self.readdirExecutor
+        batches = EncViewFuse.__chunks(chunk, EncViewFuse.READDIR_BATCH_SIZE)
+        for viewEntries in executor.map(lambda batch: [viewEntry(entry) for entry in batch], batches):
+            yield from viewEntries
+    
+    @staticmethod
+    def __chunks(iterable, size):
+        iterator = iter(iterable)
+        while True:
+            chunk = list(islice(iterator, size))
+            if len(chunk) == 0:
+                return
+            yield chunk
+    
+    def __encryptFileName(self, dirStat, absRootPath, entry, entryStat, directoryIndex=None, warmUp=False):
         absRootPathEntry = os.path.join(absRootPath, entry)
-        entryViewName = self.encryption.encryptFileName(absRootPathEntry, entry)
-        return [entryViewName]
+        if entryStat is None:
+            # let the encryption report the missing file
+            return self.encryption.encryptFileName(absRootPathEntry, entry)
+        
+        cacheKey = (dirStat.st_dev, dirStat.st_ino, entry)
+        entryViewName = self.__cachedFileName(cacheKey, entryStat)
+        if entryViewName is None:
+            if directoryIndex is not None:
+                entryViewName = directoryIndex.lookup(entry, entryStat.st_ino, entryStat.st_mtime_ns)
+            if entryViewName is None:
+                entryViewName = self.encryption.encryptFileName(absRootPathEntry, entry)
+                if directoryIndex is not None:
+                    directoryIndex.store(entry, entryStat.st_ino, entryStat.st_mtime_ns, entryViewName)
+            nameCache = self.warmUpNames if warmUp else self.encryptedNameCache
+            nameCache.put(cacheKey, (entryStat.st_ino, entryStat.st_mtime_ns, entryViewName))
+        if not warmUp:
+            self.decryptedNameCache.put(entryViewName, entry)
+        return entryViewName
+    
+    def __cachedFileName(self, cacheKey, entryStat):
+        for nameCache in (self.encryptedNameCache, self.warmUpNames):
+            cacheEntry = nameCache.get(cacheKey)
+            if cacheEntry is not None and cacheEntry[0] == entryStat.st_ino and cacheEntry[1] == entryStat.st_mtime_ns:
+                return cacheEntry[2]
+        return None
+    
+    def __warmUpDirectory(self, directory):
+        '''
+        Fills the warm-up caches for the entries of the given (view path,
+        absolute root path) directory. Symbolic links are skipped, so the crawl
+        cannot run in circles. Returns the number of entries and the
+        subdirectories to crawl, which are none once the caches are full.
+        '''
+        if self.__isWarmUpCacheFull():
+            return 0, list()
+        viewPath, absRootPath = directory
+        dirStat = os.stat(absRootPath)
+        dirSignature = (dirStat.st_dev, dirStat.st_ino, dirStat.st_ctime_ns)
+        directoryIndex = None
+        if self.metadataIndex is not None:
+            directoryIndex = self.metadataIndex.directory(dirStat.st_dev, dirStat.st_ino)
+        names = list()
+        subdirectories = list()
+        with os.scandir(absRootPath) as entries:
+            for entry in entries:
+                if self.__isWarmUpCacheFull():
+                    logger.info('The warm-up caches are full, stopping the crawl.')
+                    return len(names), list()
+                names.append(entry.name)
+                if entry.is_symlink():
+                    continue
+                entryStat = entry.stat(follow_symlinks=False)
+                entryViewName = self.__encryptFileName(dirStat, absRootPath, entry.name, entryStat, directoryIndex, True)
+                entryViewPath = os.path.join(viewPath, entryViewName)
+                self.warmUpPaths.put(entryViewPath, (entry.path, absRootPath, dirSignature))
+                if stat.S_ISDIR(entryStat.st_mode):
+                    subdirectories.append((entryStat.st_mtime, (entryViewPath, entry.path)))
+        if directoryIndex is not None:
+            directoryIndex.finish(names)
+        return len(names), subdirectories
+    
+    def __isWarmUpCacheFull(self):
+        return len(self.warmUpPaths) >= self.warmUpPaths.capacity
+    
+    def __createSourceWatcher(self):
+        try:
+            sourceWatcher = SourceWatcher(self.__sourceChanged, self.__sourceEventsLost)
+        except OSError as e:
+            logger.warning('Cannot watch the source directory, caches expire after the attribute timeout: %s', e)
+            return None
+        sourceWatcher.watchTree(self.root)
+        if not sourceWatcher.isComplete():
+            logger.warning('The inotify watch limit is reached, caches expire after the attribute timeout. '
+                           'Consider raising fs.inotify.max_user_watches.')
+        return sourceWatcher
+    
+    def __sourceChanged(self, directory, name, isDirectory):
+        '''
+        Drops everything cached for the changed entry of the given source
+        directory and for the directory itself, whose mtime changed as well.
+        '''
+        if self.watched and not self.sourceWatcher.isComplete():
+            self.watched = False
+            self.attributeCache = LruCache(self.attributeCache.capacity, self.attrTimeout)
+            self.negativeCache = LruCache(self.negativeCache.capacity, self.negativeTimeout)
+            logger.warning('The inotify watch limit is reached, the kernel may show stale entries for up to %s seconds.',
+                           self.watchTimeout)
+        viewDirectory = self.__viewPath(directory)
+        if viewDirectory is None:
+            return
+        self.__invalidateEntry(directory, viewDirectory, name, isDirectory)
+        if directory != self.root:
+            parentDirectory, directoryName = os.path.split(directory)
+            self.__invalidateEntry(parentDirectory, os.path.dirname(viewDirectory), directoryName, True)
+    
+    def __sourceEventsLost(self):
+        logger.warning('Source changes were lost, dropping all cached attributes.')
+        self.attributeCache.clear()
+        self.negativeCache.clear()
+        self.pathCache.clear()
+        self.warmUpPaths.clear()
+        self.__notifyKernel(os.sep)
+    
+    def __invalidateEntry(self, directory, viewDirectory, name, isDirectory):
+        try:
+            dirStat = os.stat(directory)
+        except OSError:
+            return
+        # the name handed out last is needed for entries that are gone already
+        cacheEntry = self.encryptedNameCache.get((dirStat.st_dev, dirStat.st_ino, name))
+        oldViewName = None if cacheEntry is None else cacheEntry[2]
+        newViewName = None
+        try:
+            st = os.stat(os.path.join(directory, name))
+            newViewName = self.__encryptFileName(dirStat, directory, name, st)
+        except OSError:
+            st = None
+        if st is not None and stat.S_ISREG(st.st_mode) and self.contentDigests is not None:
+            # the salt of a renamed file may have changed, digests under its old names are stale
+            self.contentDigests.invalidate(st.st_dev, st.st_ino)
+        for viewName in set((oldViewName, newViewName)) - set((None,)):
+            viewPath = os.path.join(viewDirectory, viewName)
+            self.attributeCache.remove(viewPath)
+            self.negativeCache.remove(viewPath)
+            self.pathCache.remove(viewPath)
+            self.warmUpPaths.remove(viewPath)
+            if isDirectory and viewName != newViewName:
+                prefix = os.path.join(viewPath, '')
+                self.attributeCache.removeIf(lambda key, value: key.startswith(prefix))
+                self.pathCache.removeIf(lambda key, value: key.startswith(prefix))
+                self.warmUpPaths.removeIf(lambda key, value: key.startswith(prefix))
+            self.__notifyKernel(viewPath)
+        self.attributeCache.remove(viewDirectory)
+        self.__notifyKernel(viewDirectory)
+    
+    def __viewPath(self, directory):
+        '''
+        Returns the view path of the given source directory or None if it does
+        not exist anymore.
+        '''
+        relativePath = os.path.relpath(directory, self.root)
+        viewPath = os.sep
+        if relativePath == os.curdir:
+            return viewPath
+        parentPath = self.root
+        try:
+            parentStat = os.stat(parentPath)
+            for name in relativePath.split(os.sep):
+                path = os.path.join(parentPath, name)
+                st = os.stat(path)
+                viewPath = os.path.join(viewPath, self.__encryptFileName(parentStat, parentPath, name, st))
+                parentPath, parentStat = path, st
+        except OSError:
+            return None
+        return viewPath
+    
+    def __notifyKernel(self, viewPath):
+        if self.kernelNotifier is not None:
+            self.kernelNotifier.invalidate(viewPath)
+    
+    def __decryptFileName(self, viewName):
+        plainName = self.decryptedNameCache.get(viewName)
+        if plainName is None:
+            if not EncViewFuse.__isWellFormedName(viewName):
+                raise MalformedInputException('The name {0} is not an encrypted name.'.format(viewName))
+            plainName = self.encryption.decryptPath(viewName)
+            self.decryptedNameCache.put(viewName, plainName)
+        return plainName
         
     def __decryptToAbsolutePath(self, path):
-        return os.path.realpath(self.root + self.encryption.decryptPath(path))
+        cacheEntry = self.pathCache.get(path, validate=EncViewFuse.__isValidPathCacheEntry)
+        if cacheEntry is None:
+            cacheEntry = self.warmUpPaths.get(path, validate=EncViewFuse.__isValidPathCacheEntry)
+        if cacheEntry is not None:
+            return cacheEntry[0]
+        
+        components = [component for component in path.split(os.sep) if len(component) != 0]
+        if len(components) == 0:
+            return self.root
+        
+        depth, (unresolvedPath, absRootPath, signature) = self.__longestValidPrefix(components)
+        if depth == len(components):
+            return absRootPath
+        if depth == 0 and len(components) == 1:
+            signature = EncViewFuse.__directorySignature(self.root)
+        
+        # only the components below the longest known prefix have to be decrypted and resolved
+        for index in range(depth, len(components)):
+            parentSignature = signature
+            plainName = self.__decryptFileName(components[index])
+            unresolvedPath = os.path.join(unresolvedPath, plainName)
+            absRootPath, st = EncViewFuse.__resolveComponent(absRootPath, plainName)
+            signature = None if st is None else (st.st_dev, st.st_ino, st.st_ctime_ns)
+            if st is not None and stat.S_ISDIR(st.st_mode):
+                self.pathTrie.insert(components[:index + 1], (unresolvedPath, absRootPath, signature))
+        
+        if parentSignature is not None:
+            self.pathCache.put(path, (absRootPath, os.path.dirname(unresolvedPath), parentSignature))
+        return absRootPath
+    
+    def __longestValidPrefix(self, components):
+        while True:
+            depth, directory = self.pathTrie.longestPrefix(components)
+            if depth == 0:
+                return 0, (self.root, self.root, None)
+            unresolvedPath, _, signature = directory
+            if EncViewFuse.__directorySignature(unresolvedPath) == signature:
+                return depth, directory
+            self.pathTrie.remove(components[:depth])
+    
+    @staticmethod
+    def __resolveComponent(absRootParentPath, plainName):
+        '''
+        Resolves a single plain path component below an already resolved parent
+        path. Returns the resolved path and the stat result for it (None if the
+        path does not exist).
+        '''
+        candidate = os.path.join(absRootParentPath, plainName)
+        try:
+            st = os.lstat(candidate)
+        except OSError:
+            st = None
+        if st is not None and not stat.S_ISLNK(st.st_mode) and plainName not in (os.curdir, os.pardir) and os.sep not in plainName:
+            return candidate, st
+        absRootPath = os.path.realpath(candidate)
+        try:
+            return absRootPath, os.stat(absRootPath)
+        except OSError:
+            return absRootPath, None
+    
+    @staticmethod
+    def __isWellFormedName(viewName):
+        '''
+        Checks whether the name can be an encrypted name at all, i.e. it is
+        URL-safe base64 of the key addition followed by whole cipher blocks.
+        Probes for names like .DS_Store or desktop.ini fail here without any
+        cryptography.
+        '''
+        if len(viewName) % 4 != 0 or EncViewFuse.ENCRYPTED_NAME_PATTERN.fullmatch(viewName) is None:
+            return False
+        decodedLength = len(viewName) // 4 * 3 - viewName.count('=')
+        dataLength = decodedLength - Encryption.FILENAME_KEYADDITION_LENGTH
+        return dataLength > 0 and dataLength % Encryption.BLOCKSIZE_BYTES == 0
+    
+    @staticmethod
+    def __isValidPathCacheEntry(cacheEntry):
+        _, parentPath, parentSignature = cacheEntry
+        return EncViewFuse.__directorySignature(parentPath) == parentSignature
+    
+    @staticmethod
+    def __directorySignature(path):
+        '''
+        Returns a value that changes whenever the directory is replaced, renamed
+        or its entries are changed. Returns None if the directory does not exist.
+        '''
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (st.st_dev, st.st_ino, st.st_ctime_ns)
     
     def __encryptedFileSize(self, fileSizeInBytes):
         return self.encryption.encryptedFileSize(fileSizeInBytes)
@@ -57,7 +635,47 @@ class EncViewFuse(FuseFsBase):
 
 
 
+def _effectiveFilesystemOptions(fsOptions):
+    '''
+    Returns the given file system options completed by the defaults of EncViewFuse.
+    '''
+    parameters = inspect.signature(EncViewFuse.__init__).parameters.values()
+    options = {parameter.name: parameter.default for parameter in parameters if parameter.default is not inspect.Parameter.empty}
+    options.update(fsOptions)
+    return options
+
+def _fuseOptions(fs, backend, others):
+    '''
+    Returns the options of the mount for the given backend. The kernel caches
+    attributes and entries exactly as long as the file system, unless changes
+    of the watched source reach the kernel as invalidations.
+    '''
+    fuseOptions = dict(others)
+    attrTimeout = fs.attrTimeout
+    entryTimeout = fs.attrTimeout
+    negativeTimeout = fs.negativeTimeout
+    if fs.watched and backend == 'pyfuse3':
+        # the low-level API invalidates the entries of names as well as their nodes
+        attrTimeout = entryTimeout = negativeTimeout = fs.watchTimeout
+        fuseOptions.setdefault('kernel_cache', True)
+    elif fs.watched and KernelNotifier.isSupported():
+        # fuse_invalidate_path only drops cached nodes, so new, renamed and deleted names keep the short timeouts
+        attrTimeout = fs.watchTimeout
+        fuseOptions.setdefault('kernel_cache', True)
+    elif fs.watched:
+        logger.warning('libfuse cannot invalidate kernel caches, keeping the kernel attribute timeout short.')
+    fuseOptions.setdefault('attr_timeout', attrTimeout)
+    fuseOptions.setdefault('entry_timeout', entryTimeout)
+    fuseOptions.setdefault('negative_timeout', negativeTimeout)
+    # the inode numbers are unique and stable, so backup tools can rely on them
+    fuseOptions.setdefault('use_ino', True)
+    return fuseOptions
+
+def _formatOptions(options):
+    return ', '.join('{0}={1}'.format(key, value) for key, value in sorted(options.items()))
+
 def main():
+    logging.basicConfig(level=logging.INFO, format='%(name)s: %(levelname)s: %(message)s')
     args = None
     try:
         args = FuseArgumentParser(ExtensionRegistry()).parseArguments(sys.argv[1:])
@@ -65,7 +683,21 @@ def main():
         print('Error during command line parsing: {0}'.format(str(e)))
         sys.exit(1)
     
-    FUSE(EncViewFuse(args.device, args.mountOptions.secret, args.mountOptions.fileSalt, args.mountOptions.filenameSalt), args.dir, **args.mountOptions.others)
+    fs = EncViewFuse(args.device, args.mountOptions.secret, args.mountOptions.fileSalt, args.mountOptions.filenameSalt, **args.mountOptions.fsOptions)
+    backend = args.mountOptions.backend
+    fuseOptions = _fuseOptions(fs, backend, args.mountOptions.others)
+    logger.info('Mounting %s on %s with backend %s and profile %s', args.device, args.dir, backend, args.mountOptions.profile or 'none')
+    logger.info('File system options: %s', _formatOptions(_effectiveFilesystemOptions(args.mountOptions.fsOptions)))
+    logger.info('Fuse options: %s', _formatOptions(fuseOptions))
+    if backend == 'pyfuse3':
+        try:
+            from encviewfuse.fuse._Pyfuse3Backend import mount
+        except ImportError as e:
+            print('The pyfuse3 backend is not available, install encviewfuse[pyfuse3]: {0}'.format(str(e)))
+            sys.exit(1)
+        mount(fs, args.dir, fuseOptions)
+    else:
+        FUSE(fs, args.dir, **fuseOptions)
 
 if __name__ == '__main__':
     main()
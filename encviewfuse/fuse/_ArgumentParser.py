@@ -22,6 +22,30 @@ class FuseArgumentParser(object):
         parser.add_argument("-o", action=FuseArgumentParser.__makeMountOptionsAction(self.extensionRegistry, self.saltProvidersRequired), type=FuseArgumentParser.__are_mount_options, required=True, dest='mountOptions', help='mount options')
         return parser.parse_args(arguments)
     
+    def parseExportArguments(self, arguments):
+        parser = FuseArgumentParser.__ThrowingArgumentParser(description='Export of the encrypted view without fuse')
+        parser.add_argument('source', action=_FullPaths, type=FuseArgumentParser.__is_dir, help='the document root for the original files')
+        parser.add_argument('target', help='the target directory or, together with --tar, the tar file (- for stdout)')
+        parser.add_argument('paths', nargs='*', help='the files and directories to export relative to the document root (default: all)')
+        parser.add_argument("-o", action=FuseArgumentParser.__makeMountOptionsAction(self.extensionRegistry, self.saltProvidersRequired), type=FuseArgumentParser.__are_mount_options, required=True, dest='mountOptions', help='mount options, only the secret and the salt providers are used')
+        parser.add_argument('--tar', action='store_true', help='write a tar stream instead of a directory')
+        parser.add_argument('--workers', type=FuseArgumentParser.__positive_int, help='the number of encrypting processes (default: number of CPUs)')
+        args = parser.parse_args(arguments)
+        if not args.tar:
+            args.target = FuseArgumentParser.__is_dir(os.path.abspath(os.path.expanduser(args.target)))
+        return args
+    
+    def parseJournalArguments(self, arguments):
+        parser = FuseArgumentParser.__ThrowingArgumentParser(description='Lists the encrypted paths changed since the last run')
+        parser.add_argument('source', action=_FullPaths, type=FuseArgumentParser.__is_dir, help='the document root for the original files')
+        parser.add_argument('snapshot', action=_FullPaths, help='the snapshot of the previous run, it is created if missing and updated afterwards')
+        parser.add_argument("-o", action=FuseArgumentParser.__makeMountOptionsAction(self.extensionRegistry, self.saltProvidersRequired), type=FuseArgumentParser.__are_mount_options, required=True, dest='mountOptions', help='mount options, only the secret and the salt providers are used')
+        return parser.parse_args(arguments)
+    
+    @staticmethod
+    def __positive_int(value):
+        return _positiveInt('--workers', value)
+    
     @staticmethod
     def __is_dir(dirname):
         """Checks if a path is an actual directory"""
@@ -75,10 +99,98 @@ class _FullPaths(Action):
     def __call__(self, parser, namespace, values, option_string=None):
         setattr(namespace, self.dest, os.path.abspath(os.path.expanduser(values)))
         
+def _nonNegativeInt(key, value):
+    try:
+        result = int(value) if not isinstance(value, bool) else -1
+    except ValueError:
+        result = -1
+    if result < 0:
+        raise ArgumentTypeError('The option "{0}" requires a non-negative integer value.'.format(key))
+    return result
+
+def _nonNegativeFloat(key, value):
+    try:
+        result = float(value) if not isinstance(value, bool) else -1
+    except ValueError:
+        result = -1
+    if not result >= 0:
+        raise ArgumentTypeError('The option "{0}" requires a non-negative number.'.format(key))
+    return result
+
+def _boolean(key, value):
+    if isinstance(value, bool):
+        return value
+    if value.lower() in ('true', 'yes', '1'):
+        return True
+    if value.lower() in ('false', 'no', '0'):
+        return False
+    raise ArgumentTypeError('The option "{0}" requires a boolean value.'.format(key))
+
+def _positiveInt(key, value):
+    result = _nonNegativeInt(key, value)
+    if result == 0:
+        raise ArgumentTypeError('The option "{0}" requires a positive integer value.'.format(key))
+    return result
+
+def _path(key, value):
+    if isinstance(value, bool):
+        raise ArgumentTypeError('The option "{0}" requires a path.'.format(key))
+    return os.path.abspath(os.path.expanduser(value))
+
 class _MountOptions(Action, metaclass=ABCMeta):
     
+    # options that configure the file system itself and are not passed to fuse
+    FILESYSTEM_OPTIONS = {
+        'pathCacheSize': _nonNegativeInt,
+        'pathTrieSize': _nonNegativeInt,
+        'nameCacheSize': _nonNegativeInt,
+        'attrCacheSize': _nonNegativeInt,
+        'attrTimeout': _nonNegativeFloat,
+        'readdirPlus': _boolean,
+        'blockCacheSize': _nonNegativeInt,
+        'readAhead': _nonNegativeInt,
+        'readAheadWorkers': _positiveInt,
+        'maxOpenFiles': _nonNegativeInt,
+        'indexFile': _path,
+        'warmUp': _boolean,
+        'warmUpWorkers': _positiveInt,
+        'warmUpRate': _nonNegativeInt,
+        'warmUpCacheSize': _nonNegativeInt,
+        'watch': _boolean,
+        'watchTimeout': _nonNegativeFloat,
+        'readdirThreshold': _positiveInt,
+        'readdirWorkers': _positiveInt,
+        'saltCacheSize': _nonNegativeInt,
+        'negativeCacheSize': _nonNegativeInt,
+        'negativeTimeout': _nonNegativeFloat,
+        'contentDigests': _boolean,
+        'digestWorkers': _positiveInt,
+        'metadataWorkers': _nonNegativeInt,
+        'dataWorkers': _nonNegativeInt,
+    }
+    
+    # implementations of the fuse protocol selected with backend=<name>
+    BACKENDS = ('fusepy', 'pyfuse3')
+    
+    # named sets of mount options selected with perf=<name>, explicitly given options take precedence
+    PROFILES = {
+        # a backup reads every file once and sequentially, and the source rarely changes meanwhile
+        'backup': (
+            'ro',
+            'auto_cache',
+            'max_read=131072',
+            'max_readahead=1048576',
+            'attrTimeout=30',
+            'negativeTimeout=30',
+            'readdirPlus',
+            'blockCacheSize=134217728',
+            'readAhead=32',
+            'readAheadWorkers=4',
+        ),
+    }
+    
     def __call__(self, parser, namespace, values, option_string=None):
-        resultObject = namedtuple('ParsedMountOptions', ['secret', 'fileSalt', 'filenameSalt', 'others'])
+        resultObject = namedtuple('ParsedMountOptions', ['secret', 'fileSalt', 'filenameSalt', 'profile', 'backend', 'fsOptions', 'others'])
         options = values.split(',')
                 
         resultObject.secret = self.getSecretFromOptions(options)
@@ -93,15 +205,24 @@ class _MountOptions(Action, metaclass=ABCMeta):
             except ValueError:
                 raise ArgumentTypeError('The filename salt provider is invalid.')
         
-        interestingOptions = ["secret=", "secretfile=", "fileSalt", "filenameSalt"]
+        resultObject.profile = self.getProfileFromOptions(options)
+        if resultObject.profile is not None:
+            options = list(_MountOptions.PROFILES[resultObject.profile]) + options
+        
+        resultObject.backend = self.getBackendFromOptions(options)
+        
+        interestingOptions = ["secret=", "secretfile=", "fileSalt", "filenameSalt", "perf=", "backend="]
         filteredOptions = filter(lambda x: not any(x.startswith(string) for string in interestingOptions), options)
+        fsOptions = dict()
         otherOptions = dict()
         for option in filteredOptions:
             parts = option.split('=')
-            if len(parts) == 1:
-                otherOptions[parts[0]] = True
+            value = True if len(parts) == 1 else parts[1]
+            if parts[0] in _MountOptions.FILESYSTEM_OPTIONS:
+                fsOptions[parts[0]] = _MountOptions.FILESYSTEM_OPTIONS[parts[0]](parts[0], value)
             else:
-                otherOptions[parts[0]] = parts[1]
+                otherOptions[parts[0]] = value
+        resultObject.fsOptions = fsOptions
         resultObject.others = otherOptions
 
         setattr(namespace, self.dest, resultObject)
@@ -121,6 +242,22 @@ class _MountOptions(Action, metaclass=ABCMeta):
             else:
                     raise ArgumentTypeError('You have to provide a secret or secret file.')
             
+    def getProfileFromOptions(self, options):
+        profiles = [s[len("perf="):] for s in options if s.startswith("perf=")]
+        if len(profiles) == 0:
+            return None
+        if profiles[-1] not in _MountOptions.PROFILES:
+            raise ArgumentTypeError('The profile "{0}" is unknown, known profiles are: {1}.'.format(profiles[-1], ', '.join(sorted(_MountOptions.PROFILES.keys()))))
+        return profiles[-1]
+            
+    def getBackendFromOptions(self, options):
+        backends = [s[len("backend="):] for s in options if s.startswith("backend=")]
+        if len(backends) == 0:
+            return _MountOptions.BACKENDS[0]
+        if backends[-1] not in _MountOptions.BACKENDS:
+            raise ArgumentTypeError('The backend "{0}" is unknown, known backends are: {1}.'.format(backends[-1], ', '.join(_MountOptions.BACKENDS)))
+        return backends[-1]
+            
     def getValueForKey(self, options, key, required=True):
         entry = [s for s in options if s.startswith('{0}='.format(key))]
         if not required and entry is None:
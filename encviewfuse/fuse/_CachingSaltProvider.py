@@ -0,0 +1,39 @@
+import os
+from encviewfuse.fuse._LruCache import LruCache
+
+class CachingSaltProvider(object):
+    '''
+    Remembers the salts of a file or filename salt provider per (path, inode,
+    mtime), so salts of unchanged files are not derived again. It does not
+    subclass the provider classes of the encryption library on purpose: the
+    ExtensionRegistry instantiates every subclass it finds.
+    '''
+
+    def __init__(self, provider, capacity):
+        self.provider = provider
+        self.cache = LruCache(capacity)
+
+    def getId(self):
+        return self.provider.getId()
+
+    def getSaltFor(self, absoluteFilePath):
+        try:
+            st = os.stat(absoluteFilePath)
+        except OSError:
+            # let the provider report the missing file
+            return self.provider.getSaltFor(absoluteFilePath)
+        cacheKey = (absoluteFilePath, st.st_ino, st.st_mtime_ns)
+        salt = self.cache.get(cacheKey)
+        if salt is None:
+            salt = self.provider.getSaltFor(absoluteFilePath)
+            self.cache.put(cacheKey, salt)
+        return salt
+
+    def statistics(self):
+        '''
+        Returns the cache statistics, avoided is the number of salts that did
+        not have to be derived again.
+        '''
+        statistics = self.cache.statistics()
+        statistics['avoided'] = statistics['hits']
+        return statistics
@@ -0,0 +1,106 @@
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from encviewfuse.fuse._LruCache import LruCache
+
+class ContentDigests(object):
+    '''
+    Keeps SHA-256 digests of the encrypted content of files per (device,
+    inode, mtime, size, file salt). Digests are taken while a handle reads a file from
+    start to end or computed in background threads on request. If a metadata
+    index is given, digests are persisted in it, so they survive remounts as
+    long as the secret and the salt providers stay the same.
+    '''
+
+    def __init__(self, capacity, workers, metadataIndex=None):
+        if workers < 1:
+            raise ValueError('At least one worker is required but "{0}" were given.'.format(workers))
+        self.cache = LruCache(capacity)
+        self.workers = workers
+        self.metadataIndex = metadataIndex
+        self.executor = None
+        # file keys whose digest is computed at the moment
+        self.computing = set()
+        # maps handles to [file key, digest, next offset] of files read sequentially
+        self.reads = dict()
+        self.lock = Lock()
+
+    def get(self, fileKey):
+        '''
+        Returns the hex digest for the given file key or None if it is unknown.
+        '''
+        digest = self.cache.get(fileKey)
+        if digest is None and self.metadataIndex is not None:
+            digest = self.metadataIndex.loadDigest(*fileKey)
+            if digest is not None:
+                self.cache.put(fileKey, digest)
+        return digest
+
+    def schedule(self, fileKey, compute):
+        '''
+        Computes the digest of the file in the background by calling compute,
+        which returns the hex digest or None if the file changed meanwhile.
+        '''
+        with self.lock:
+            if fileKey in self.computing:
+                return
+            self.computing.add(fileKey)
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='encviewfuse-digest')
+            self.executor.submit(self.__compute, fileKey, compute)
+
+    def access(self, fh, fileKey, encryptedSize, offset, data):
+        '''
+        Records data read from the given handle. If a handle reads the whole
+        file in order, the digest of the file is stored.
+        '''
+        with self.lock:
+            read = self.reads.pop(fh, None)
+        if offset == 0:
+            read = [fileKey, hashlib.sha256(), 0]
+        elif read is None or read[0] != fileKey or read[2] != offset:
+            return
+        read[1].update(data)
+        read[2] += len(data)
+        if read[2] >= encryptedSize:
+            self.__store(fileKey, read[1].hexdigest())
+        elif len(data) > 0:
+            with self.lock:
+                self.reads[fh] = read
+
+    def invalidate(self, dev, ino):
+        '''
+        Drops all digests of the given file, e.g. after it has been renamed.
+        '''
+        self.cache.removeIf(lambda fileKey, digest: fileKey[:2] == (dev, ino))
+        if self.metadataIndex is not None:
+            self.metadataIndex.removeDigests(dev, ino)
+
+    def release(self, fh):
+        with self.lock:
+            self.reads.pop(fh, None)
+
+    def shutdown(self):
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+            self.reads.clear()
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def __compute(self, fileKey, compute):
+        try:
+            digest = compute()
+            if digest is not None:
+                self.__store(fileKey, digest)
+        except Exception:
+            # the digest is computed again on the next request
+            pass
+        finally:
+            with self.lock:
+                self.computing.discard(fileKey)
+
+    def __store(self, fileKey, digest):
+        self.cache.put(fileKey, digest)
+        if self.metadataIndex is not None:
+            self.metadataIndex.storeDigest(*fileKey, digest)
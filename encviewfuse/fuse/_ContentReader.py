@@ -0,0 +1,106 @@
+import os
+from threading import local
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+
+class ContentReader(object):
+    '''
+    Reads encrypted content like Encryption.encryptedContent, but reads the
+    plain data with a single positional read into a buffer that is reused by
+    the calling thread and encrypts it in place. Only the returned bytes are
+    allocated per call. The cipher of a file is taken from its encryption
+    dictionary, which encryptedContent fills on the first call. Ciphers that
+    cannot encrypt in place are served by encryptedContent.
+    '''
+
+    KEY_ADDITION_LENGTH = Encryption.FILE_KEYADDITION_LENGTH
+    BLOCK_SIZE = Encryption.BLOCKSIZE_BYTES
+
+    def __init__(self, encryption):
+        self.encryption = encryption
+        self.buffers = local()
+        self.inPlace = None
+
+    def read(self, virtualFile, offset, length, plainSize):
+        '''
+        Returns length bytes of the encrypted content at offset, at most up
+        to the end of the content. plainSize is the size of the plain file.
+        '''
+        encryptedFileSize = self.encryption.encryptedFileSize(plainSize)
+        length = min(length, encryptedFileSize - offset)
+        if length <= 0:
+            return b''
+        encryptionDict = virtualFile.encryptionDict()
+        if 'fileCipher' not in encryptionDict:
+            # creates the cipher and the key addition without reading data
+            self.encryption.encryptedContent(virtualFile, 0, 0)
+        cipher = encryptionDict['fileCipher']
+        if not self.__canEncryptInPlace(cipher):
+            return self.encryption.encryptedContent(virtualFile, offset, length)
+
+        # the buffer starts at the first byte of the key addition or of the first cipher block
+        keyAdditionLength = max(0, ContentReader.KEY_ADDITION_LENGTH - offset)
+        bufferOffset = 0 if keyAdditionLength > 0 else offset - (offset - ContentReader.KEY_ADDITION_LENGTH) % ContentReader.BLOCK_SIZE
+        dataOffset = max(0, bufferOffset - ContentReader.KEY_ADDITION_LENGTH)
+        dataEnd = offset + length - ContentReader.KEY_ADDITION_LENGTH
+        dataEnd = min(-(-dataEnd // ContentReader.BLOCK_SIZE) * ContentReader.BLOCK_SIZE, encryptedFileSize - ContentReader.KEY_ADDITION_LENGTH)
+        dataStart = ContentReader.KEY_ADDITION_LENGTH if keyAdditionLength > 0 else 0
+        view = self.__buffer(dataStart + dataEnd - dataOffset)
+
+        if keyAdditionLength > 0:
+            view[:ContentReader.KEY_ADDITION_LENGTH] = encryptionDict['fileKeyAddition']
+        if dataEnd > dataOffset:
+            data = view[dataStart:dataStart + dataEnd - dataOffset]
+            readLength = min(dataEnd, plainSize) - dataOffset
+            if self.__readInto(virtualFile, data[:readLength], dataOffset) != readLength:
+                # the file shrank in between, encryptedContent handles that like any other read
+                return self.encryption.encryptedContent(virtualFile, offset, length)
+            if readLength < len(data):
+                # PKCS#7 padding of the last block
+                paddingLength = len(data) - readLength
+                data[readLength:] = bytes((paddingLength,)) * paddingLength
+            cipher.encrypt(data, output=data)
+        return bytes(view[offset - bufferOffset:offset - bufferOffset + length])
+
+    def __buffer(self, size):
+        buffer = getattr(self.buffers, 'buffer', None)
+        if buffer is None or len(buffer) < size:
+            buffer = memoryview(bytearray(size))
+            self.buffers.buffer = buffer
+        return buffer[:size]
+
+    def __canEncryptInPlace(self, cipher):
+        if self.inPlace is None:
+            block = bytearray(ContentReader.BLOCK_SIZE)
+            try:
+                cipher.encrypt(block, output=block)
+                self.inPlace = True
+            except TypeError:
+                # PyCrypto does not know the output parameter
+                self.inPlace = False
+        return self.inPlace
+
+    @staticmethod
+    def __readInto(virtualFile, buffer, offset):
+        readInto = getattr(virtualFile, 'readInto', None)
+        if readInto is not None:
+            return readInto(buffer, offset)
+        return ContentReader.preadInto(virtualFile.fd, buffer, offset)
+
+    @staticmethod
+    def preadInto(fd, buffer, offset):
+        '''
+        Reads into the buffer until it is full or the end of the file is
+        reached and returns the number of read bytes.
+        '''
+        total = 0
+        while total < len(buffer):
+            if hasattr(os, 'preadv'):
+                count = os.preadv(fd, [buffer[total:]], offset + total)
+            else:
+                data = os.pread(fd, len(buffer) - total, offset + total)
+                count = len(data)
+                buffer[total:total + count] = data
+            if count == 0:
+                break
+            total += count
+        return total
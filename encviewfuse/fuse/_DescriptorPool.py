@@ -0,0 +1,89 @@
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from errno import EBADF
+from threading import Lock
+
+class DescriptorPool(object):
+    '''
+    Limits the number of descriptors held open by source files. As soon as
+    more than maxOpen source files have an open descriptor, the descriptors
+    of the least recently used ones that are not read at the moment are
+    closed. These files reopen their descriptor on their next read.
+    Source files provide openDescriptor(), which returns a new descriptor
+    for the file, and closeDescriptor().
+    '''
+
+    def __init__(self, maxOpen):
+        if maxOpen < 1:
+            raise ValueError('At least one open descriptor is required but "{0}" were given.'.format(maxOpen))
+        self.maxOpen = maxOpen
+        # source files with an open descriptor in the order of their last use
+        self.openFiles = OrderedDict()
+        self.lock = Lock()
+        self.reopened = 0
+
+    def register(self, sourceFile):
+        '''
+        Registers a source file whose descriptor has just been opened.
+        '''
+        with self.lock:
+            self.openFiles[sourceFile] = None
+            self.__evict()
+
+    def unregister(self, sourceFile):
+        with self.lock:
+            self.openFiles.pop(sourceFile, None)
+
+    @contextmanager
+    def use(self, sourceFile):
+        '''
+        Returns an open descriptor for the source file that stays open until
+        the context is left. A closed descriptor is reopened without holding
+        the lock, so other files are not blocked by a slow open.
+        '''
+        with self.lock:
+            # a used file is never evicted, also not while it is reopened
+            sourceFile.users += 1
+            isOpen = sourceFile in self.openFiles
+            if isOpen:
+                self.openFiles.move_to_end(sourceFile)
+        try:
+            if not isOpen:
+                self.__reopen(sourceFile)
+            yield sourceFile.fd
+        finally:
+            with self.lock:
+                sourceFile.users -= 1
+                self.__evict()
+
+    def statistics(self):
+        with self.lock:
+            return {'open': len(self.openFiles), 'maxOpen': self.maxOpen, 'reopened': self.reopened}
+
+    def __reopen(self, sourceFile):
+        fd = sourceFile.openDescriptor()
+        with self.lock:
+            published = not sourceFile.closed and sourceFile not in self.openFiles
+            if published:
+                sourceFile.fd = fd
+                self.openFiles[sourceFile] = None
+                self.reopened += 1
+                self.__evict()
+        if not published:
+            # another read reopened the file first or the file has been closed meanwhile
+            os.close(fd)
+            if sourceFile.closed:
+                raise OSError(EBADF, 'The source file has been closed.')
+
+    def __evict(self):
+        excess = len(self.openFiles) - self.maxOpen
+        if excess <= 0:
+            return
+        for sourceFile in list(self.openFiles.keys()):
+            if excess == 0:
+                break
+            if sourceFile.users == 0:
+                del self.openFiles[sourceFile]
+                sourceFile.closeDescriptor()
+                excess -= 1
@@ -1,37 +1,73 @@
+import os
+from itertools import count
 from threading import Lock
-from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+from encviewfuse.fuse._SourceFile import SourceFile, SourceFileName
+from encviewfuse.fuse._DescriptorPool import DescriptorPool
 
 class FileHandleContainer(object):
-    
-    def __init__(self):
+    '''
+    Maps handle numbers to open files. All handles opened for the same file
+    share one reference counted SourceFile, i.e. one file descriptor, and all
+    handles opened under the same name share one encryption context. Looking up a handle does not take a lock: handle
+    numbers are drawn from an atomic counter and never reused, and single
+    dictionary operations are atomic. If maxOpenFiles is given, at most that
+    many descriptors are kept open; handles stay valid nonetheless.
+    '''
+
+    def __init__(self, maxOpenFiles=0):
+        self.descriptorPool = DescriptorPool(maxOpenFiles) if maxOpenFiles > 0 else None
         self.handles = dict()
-        self.freeIndices = list()
-        self.lock = Lock()
-    
+        self.indices = count(1) # 0 is a special handle
+        # maps (device, inode, mtime, flags) to [source file, reference count]
+        self.sources = dict()
+        # maps (source key, path) to [source file name, reference count]
+        self.names = dict()
+        self.sourcesLock = Lock()
+
     def registerHandle(self, path, flags):
-        with self.lock:
-            fileHandleObject = VirtualFile(path, flags)
-            fileHandleIndex = self.__getNextFreeIndex()
-            self.handles[fileHandleIndex] = fileHandleObject
-            return fileHandleIndex
-    
+        try:
+            st = os.stat(path)
+        except OSError:
+            raise ValueError('The given path "{0}" has to point to an existing file.'.format(path))
+        sourceKey = (st.st_dev, st.st_ino, st.st_mtime_ns, flags)
+        nameKey = (sourceKey, path)
+        with self.sourcesLock:
+            name = self.names.get(nameKey)
+            if name is None:
+                source = self.sources.get(sourceKey)
+                if source is None:
+                    source = [SourceFile(path, flags, sourceKey, self.descriptorPool), 0]
+                    self.sources[sourceKey] = source
+                source[1] += 1
+                name = [SourceFileName(path, source[0], nameKey), 0]
+                self.names[nameKey] = name
+            name[1] += 1
+        fileHandleIndex = next(self.indices)
+        self.handles[fileHandleIndex] = name[0]
+        return fileHandleIndex
+
     def getHandle(self, index):
-        with self.lock:
-            if index not in self.handles.keys():
-                raise ValueError('The given index "{0}" is not valid.'.format(index))
-            return self.handles[index]
-    
+        fileHandleObject = self.handles.get(index)
+        if fileHandleObject is None:
+            raise ValueError('The given index "{0}" is not valid.'.format(index))
+        return fileHandleObject
+
     def unregisterHandle(self, index):
-        if index is 0:
+        if index == 0:
             return
-        with self.lock:
-            if index not in self.handles.keys():
-                raise ValueError('The given index "{0}" is not valid.'.format(index))
-            self.freeIndices.append(index)
-            handleObject = self.handles.pop(index)
-            handleObject.closeFileHandle()
-        
-    def __getNextFreeIndex(self):
-        if len(self.freeIndices) > 0:
-            return self.freeIndices.pop()
-        return len(self.handles) + 1 # 0 is a special handle
+        handleObject = self.handles.pop(index, None)
+        if handleObject is None:
+            raise ValueError('The given index "{0}" is not valid.'.format(index))
+        sourceFile = handleObject.sourceFile
+        with self.sourcesLock:
+            name = self.names[handleObject.nameKey]
+            name[1] -= 1
+            if name[1] != 0:
+                return
+            del self.names[handleObject.nameKey]
+            source = self.sources[sourceFile.sourceKey]
+            source[1] -= 1
+            if source[1] != 0:
+                return
+            del self.sources[sourceFile.sourceKey]
+        sourceFile.closeFileHandle()
@@ -4,16 +4,58 @@ from errno import EPERM, ENOENT
 from fuse import FuseOSError, Operations, LoggingMixIn
 import os
 from encviewfuse.fuse._FileHandleContainer import FileHandleContainer
+from encviewfuse.fuse._OperationScheduler import OperationScheduler
+from functools import partial
+from itertools import islice
 
 class FuseFsBase(LoggingMixIn, Operations, metaclass=ABCMeta):
     
-    def __init__(self, root, secret, fileSaltProvider, filenameSaltProvider):
+    # operations that run in the calling thread, they start and stop the workers of the scheduler
+    DIRECT_OPERATIONS = frozenset(('init', 'destroy'))
+    # number of view entries that readdir computes at once
+    READDIR_BATCH_SIZE = 64
+    
+    def __init__(self, root, secret, fileSaltProvider, filenameSaltProvider, maxOpenFiles=0, metadataWorkers=0,
+                 dataWorkers=0):
         self.root = os.path.realpath(root)
         self.encryption = Encryption(secret, fileSaltProvider, filenameSaltProvider)
-        self.fileHandleContainer = FileHandleContainer()
+        self.fileHandleContainer = FileHandleContainer(maxOpenFiles)
+        self.scheduler = OperationScheduler(metadataWorkers, dataWorkers)
 
     def __call__(self, op, path, *args):
-        return super(FuseFsBase, self).__call__(op, path, *args)
+        call = partial(super(FuseFsBase, self).__call__, op, path, *args)
+        if op in FuseFsBase.DIRECT_OPERATIONS:
+            try:
+                return call()
+            finally:
+                if op == 'destroy':
+                    self.scheduler.shutdown()
+        # reads are queued per file handle, which is their last argument
+        key = args[-1] if op in OperationScheduler.DATA_OPERATIONS else None
+        if op == 'readdir':
+            return self.__scheduledEntries(self.scheduler.run(op, call, key))
+        return self.scheduler.run(op, call, key)
+
+    def __scheduledEntries(self, entries):
+        '''
+        Yields the view entries of readdir. fusepy iterates them in its own
+        thread, so every batch is computed by the scheduler like any other
+        metadata operation.
+        '''
+        entries = iter(entries)
+        try:
+            while True:
+                batch = self.scheduler.run('readdir', partial(FuseFsBase.__batch, entries))
+                yield from batch
+                if len(batch) < FuseFsBase.READDIR_BATCH_SIZE:
+                    return
+        finally:
+            if hasattr(entries, 'close'):
+                entries.close()
+
+    @staticmethod
+    def __batch(entries):
+        return list(islice(entries, FuseFsBase.READDIR_BATCH_SIZE))
 
     @abstractmethod
     def __convertViewPathToAbsoluteRootPath(self, path):
@@ -24,9 +66,11 @@ class FuseFsBase(LoggingMixIn, Operations, metaclass=ABCMeta):
         '''
     
     @abstractmethod
-    def __processReadDirEntry(self, absRootPath, entry):
+    def __processReadDirEntries(self, path, absRootPath, entries):
         '''
-        Returns the view entries that shall be displayed for the given entry
+        Returns an iterable of the view entries that shall be displayed for the
+        given entries of the directory. The entries are os.DirEntry objects. A
+        view entry is either a name or a (name, attributes, offset) tuple.
         '''  
 
     def access(self, path, mode):
@@ -87,11 +131,33 @@ class FuseFsBase(LoggingMixIn, Operations, metaclass=ABCMeta):
         '''
         
     def readdir(self, path, fh):
-        dirContent = ['.', '..']
         absRootPath = self.__convertViewPathToAbsoluteRootPath(path)
-        for entry in os.listdir(absRootPath):
-            dirContent.extend(self.__processReadDirEntry(absRootPath, entry))
-        return dirContent       
+        entries = os.scandir(absRootPath)
+        return self.__streamDirectory(path, absRootPath, entries)
+
+    def __streamDirectory(self, path, absRootPath, entries):
+        '''
+        Yields the view entries while the directory is still read, so large
+        directories are handed to the kernel piece by piece.
+        '''
+        try:
+            yield '.'
+            yield '..'
+            yield from self.__processReadDirEntries(path, absRootPath, entries)
+        finally:
+            entries.close()
+
+    def fileSalt(self, path):
+        '''
+        Returns the salt of the content of the file at the given view path.
+        If the salt depends on the name, the names of a file, e.g. hard
+        links, have different content.
+        '''
+        absRootPath = self.__convertViewPathToAbsoluteRootPath(path)
+        try:
+            return self.encryption.fileSaltProvider.getSaltFor(absRootPath)
+        except ValueError:
+            raise FuseOSError(ENOENT)
 
     def readlink(self, path, buf, bufsize):
         raise FuseOSError(EPERM)
@@ -0,0 +1,61 @@
+from threading import Lock
+
+class InodeMap(object):
+    '''
+    Maps (device, inode) of source entries to inode numbers of the view that
+    are unique across all devices below the root. Inodes of the root device
+    keep their number, inodes of other devices get a 16 bit device prefix
+    above their lower 48 bits. Small device numbers are the prefix
+    themselves, larger ones get a prefix derived from the device number,
+    which only depends on the order of mounting if two of them collide.
+    Inodes that do not fit into 48 bits are numbered by a table, so their
+    numbers only stay the same during a mount.
+    '''
+
+    INODE_BITS = 48
+    # prefixes below this one are device numbers, the ones above are assigned
+    ASSIGNED_PREFIXES = 0x8000
+    TABLE_PREFIX = 0xFFFF
+
+    def __init__(self, rootDevice):
+        self.rootDevice = rootDevice
+        # maps devices to assigned prefixes (None if all are taken)
+        self.prefixes = dict()
+        self.assignedPrefixes = set()
+        # maps (device, inode) to the numbers of the table
+        self.table = dict()
+        self.lock = Lock()
+
+    def inode(self, device, inode):
+        if inode < 1 << InodeMap.INODE_BITS:
+            if device == self.rootDevice:
+                return inode
+            prefix = self.__prefix(device)
+            if prefix is not None:
+                return (prefix << InodeMap.INODE_BITS) | inode
+        return self.__tableInode(device, inode)
+
+    def __prefix(self, device):
+        if 0 < device < InodeMap.ASSIGNED_PREFIXES:
+            return device
+        with self.lock:
+            if device in self.prefixes:
+                return self.prefixes[device]
+            prefix = None
+            count = InodeMap.TABLE_PREFIX - InodeMap.ASSIGNED_PREFIXES
+            for probe in range(0, count):
+                candidate = InodeMap.ASSIGNED_PREFIXES + (device + probe) % count
+                if candidate not in self.assignedPrefixes:
+                    prefix = candidate
+                    self.assignedPrefixes.add(prefix)
+                    break
+            self.prefixes[device] = prefix
+            return prefix
+
+    def __tableInode(self, device, inode):
+        with self.lock:
+            number = self.table.get((device, inode))
+            if number is None:
+                number = (InodeMap.TABLE_PREFIX << InodeMap.INODE_BITS) | (len(self.table) + 1)
+                self.table[(device, inode)] = number
+            return number
@@ -0,0 +1,26 @@
+import ctypes
+import os
+# fusepy does not wrap the notification functions, so they are taken from its libfuse handle
+from fuse import _libfuse
+
+class KernelNotifier(object):
+    '''
+    Asks the kernel to drop its cached entry, attributes and pages of view
+    paths. This requires fuse_invalidate_path of libfuse and the fuse instance
+    of the mount, so notifiers have to be created in a filesystem callback
+    such as init.
+    '''
+
+    @staticmethod
+    def isSupported():
+        return getattr(_libfuse, 'fuse_invalidate_path', None) is not None
+
+    def __init__(self):
+        self.invalidatePath = _libfuse.fuse_invalidate_path
+        self.invalidatePath.argtypes = (ctypes.c_void_p, ctypes.c_char_p)
+        self.invalidatePath.restype = ctypes.c_int
+        self.fusePointer = ctypes.c_void_p(_libfuse.fuse_get_context().contents.fuse)
+
+    def invalidate(self, path):
+        # a negative result only means that the kernel does not know the path
+        self.invalidatePath(self.fusePointer, os.fsencode(path))
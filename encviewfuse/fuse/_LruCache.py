@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from threading import Lock
+import time
+
+class LruCache(object):
+    '''
+    A thread-safe cache that evicts the least recently used entries as soon as
+    more than capacity entries are stored. A capacity of 0 disables the cache.
+    If a ttl in seconds is given, entries expire after that time. If a weigh
+    function is given, the capacity limits the summed weight of all values
+    instead of their number.
+    '''
+
+    def __init__(self, capacity, ttl=None, weigh=None):
+        if capacity < 0:
+            raise ValueError('The capacity "{0}" must not be negative.'.format(capacity))
+        if ttl is not None and ttl < 0:
+            raise ValueError('The ttl "{0}" must not be negative.'.format(ttl))
+        self.capacity = capacity if ttl != 0 else 0
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.deadlines = dict()
+        self.weigh = weigh if weigh is not None else lambda value: 1
+        self.weight = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None, validate=None):
+        '''
+        Returns the value for the given key or default if there is none. If a
+        validate function is given, it is called with the cached value outside
+        of the cache lock. Values for which it returns False are dropped and
+        count as a miss.
+        '''
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return default
+            if self.ttl is not None and self.deadlines[key] <= time.monotonic():
+                self.__remove(key)
+                self.misses += 1
+                return default
+            value = self.entries[key]
+            if validate is None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+        valid = validate(value)
+        with self.lock:
+            if not valid:
+                if self.entries.get(key) is value:
+                    self.__remove(key)
+                self.misses += 1
+                return default
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        weight = self.weigh(value)
+        if weight > self.capacity:
+            return
+        with self.lock:
+            self.__remove(key)
+            self.entries[key] = value
+            self.weight += weight
+            if self.ttl is not None:
+                self.deadlines[key] = time.monotonic() + self.ttl
+            while self.weight > self.capacity:
+                self.__remove(next(iter(self.entries)))
+
+    def remove(self, key):
+        with self.lock:
+            self.__remove(key)
+
+    def removeIf(self, predicate):
+        with self.lock:
+            keys = [key for key, value in self.entries.items() if predicate(key, value)]
+            for key in keys:
+                self.__remove(key)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.deadlines.clear()
+            self.weight = 0
+
+    def statistics(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {'size': len(self.entries), 'weight': self.weight, 'capacity': self.capacity, 'hits': self.hits,
+                    'misses': self.misses, 'hitRatio': self.hits / lookups if lookups > 0 else 0.0}
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def __remove(self, key):
+        if key in self.entries:
+            self.weight -= self.weigh(self.entries.pop(key))
+            self.deadlines.pop(key, None)
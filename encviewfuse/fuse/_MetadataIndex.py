@@ -0,0 +1,162 @@
+import os
+import sqlite3
+import hashlib
+import hmac
+from threading import Lock
+
+class MetadataIndex(object):
+    '''
+    A persistent index of encrypted file names stored in an SQLite database.
+    Entries are stored per directory (device, inode) and entry name together
+    with the inode and mtime of the entry they are valid for. Digests of the
+    encrypted content are stored per (device, inode, mtime, size, file salt),
+    as the salt may depend on the name of the file. The index is
+    bound to a fingerprint of the secret and the salt providers. An index
+    with another fingerprint is never used but reset.
+    '''
+
+    VERSION = '3'
+
+    class _Directory(object):
+        '''
+        The index entries of a single directory, loaded on first lookup.
+        '''
+
+        def __init__(self, index, dirDev, dirIno):
+            self.index = index
+            self.dirDev = dirDev
+            self.dirIno = dirIno
+            self.names = None
+            self.lock = Lock()
+
+        def lookup(self, name, ino, mtime):
+            with self.lock:
+                if self.names is None:
+                    self.names = self.index.loadDirectory(self.dirDev, self.dirIno)
+            indexEntry = self.names.get(name)
+            if indexEntry is None or indexEntry[0] != ino or indexEntry[1] != mtime:
+                return None
+            return indexEntry[2]
+
+        def store(self, name, ino, mtime, encryptedName):
+            self.index.store(self.dirDev, self.dirIno, name, ino, mtime, encryptedName)
+
+        def finish(self, names):
+            '''
+            Removes the entries of names that are no longer in the directory and
+            writes all pending changes.
+            '''
+            if self.names is not None:
+                self.index.removeMissing(self.dirDev, self.dirIno, set(self.names.keys()) - set(names))
+            self.index.flush()
+
+    def __init__(self, path, fingerprint):
+        self.lock = Lock()
+        self.pending = list()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute('PRAGMA synchronous=NORMAL')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            storedFingerprint = self.connection.execute('SELECT value FROM meta WHERE key = ?', ('fingerprint',)).fetchone()
+            storedVersion = self.connection.execute('SELECT value FROM meta WHERE key = ?', ('version',)).fetchone()
+            if storedFingerprint != (fingerprint,) or storedVersion != (MetadataIndex.VERSION,):
+                self.__reset(fingerprint)
+            self.connection.commit()
+
+    @staticmethod
+    def fingerprint(secret, fileSaltProvider, filenameSaltProvider):
+        '''
+        Returns a fingerprint of the secret and the salt providers that does not
+        reveal the secret.
+        '''
+        providerIds = '{0}\0{1}'.format(MetadataIndex.__providerId(fileSaltProvider), MetadataIndex.__providerId(filenameSaltProvider))
+        return hmac.new(secret.encode(), b'encviewfuse-index\0' + providerIds.encode(), hashlib.sha256).hexdigest()
+
+    def directory(self, dirDev, dirIno):
+        return MetadataIndex._Directory(self, dirDev, dirIno)
+
+    def loadDirectory(self, dirDev, dirIno):
+        '''
+        Returns a dictionary mapping the names in the given directory to
+        (inode, mtime, encrypted name).
+        '''
+        with self.lock:
+            rows = self.connection.execute('SELECT name, ino, mtime, encryptedName FROM names WHERE dirDev = ? AND dirIno = ?',
+                                           (MetadataIndex.__signed(dirDev), MetadataIndex.__signed(dirIno))).fetchall()
+        return dict((os.fsdecode(name), (MetadataIndex.__unsigned(ino), mtime, encryptedName)) for name, ino, mtime, encryptedName in rows)
+
+    def store(self, dirDev, dirIno, name, ino, mtime, encryptedName):
+        with self.lock:
+            self.pending.append((MetadataIndex.__signed(dirDev), MetadataIndex.__signed(dirIno), os.fsencode(name),
+                                 MetadataIndex.__signed(ino), mtime, encryptedName))
+
+    def removeMissing(self, dirDev, dirIno, names):
+        if len(names) == 0:
+            return
+        with self.lock:
+            self.connection.executemany('DELETE FROM names WHERE dirDev = ? AND dirIno = ? AND name = ?',
+                                        [(MetadataIndex.__signed(dirDev), MetadataIndex.__signed(dirIno), os.fsencode(name)) for name in names])
+            self.connection.commit()
+
+    def flush(self):
+        with self.lock:
+            if len(self.pending) == 0:
+                return
+            self.connection.executemany('INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?, ?, ?)', self.pending)
+            self.connection.commit()
+            self.pending = list()
+
+    def loadDigest(self, dev, ino, mtime, size, salt):
+        with self.lock:
+            row = self.connection.execute('SELECT digest FROM digests WHERE dev = ? AND ino = ? AND salt = ? AND mtime = ? AND size = ?',
+                                          (MetadataIndex.__signed(dev), MetadataIndex.__signed(ino), salt, mtime, size)).fetchone()
+        return None if row is None else row[0]
+
+    def storeDigest(self, dev, ino, mtime, size, salt, digest):
+        # a file has one digest per salt, the one of its current content
+        with self.lock:
+            self.connection.execute('DELETE FROM digests WHERE dev = ? AND ino = ? AND (mtime != ? OR size != ?)',
+                                    (MetadataIndex.__signed(dev), MetadataIndex.__signed(ino), mtime, size))
+            self.connection.execute('INSERT OR REPLACE INTO digests VALUES (?, ?, ?, ?, ?, ?)',
+                                    (MetadataIndex.__signed(dev), MetadataIndex.__signed(ino), salt, mtime, size, digest))
+            self.connection.commit()
+
+    def removeDigests(self, dev, ino):
+        with self.lock:
+            self.connection.execute('DELETE FROM digests WHERE dev = ? AND ino = ?',
+                                    (MetadataIndex.__signed(dev), MetadataIndex.__signed(ino)))
+            self.connection.commit()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.connection.close()
+
+    def __reset(self, fingerprint):
+        self.connection.execute('DROP TABLE IF EXISTS names')
+        self.connection.execute('''CREATE TABLE names (dirDev INTEGER NOT NULL, dirIno INTEGER NOT NULL, name BLOB NOT NULL,
+                                   ino INTEGER NOT NULL, mtime INTEGER NOT NULL, encryptedName TEXT NOT NULL,
+                                   PRIMARY KEY (dirDev, dirIno, name))''')
+        self.connection.execute('DROP TABLE IF EXISTS digests')
+        self.connection.execute('''CREATE TABLE digests (dev INTEGER NOT NULL, ino INTEGER NOT NULL, salt TEXT NOT NULL,
+                                   mtime INTEGER NOT NULL, size INTEGER NOT NULL, digest TEXT NOT NULL,
+                                   PRIMARY KEY (dev, ino, salt))''')
+        self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('fingerprint', fingerprint))
+        self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('version', MetadataIndex.VERSION))
+
+    @staticmethod
+    def __signed(value):
+        # device and inode numbers are unsigned 64 bit values but SQLite only knows signed ones
+        return value - (1 << 64) if value >= (1 << 63) else value
+
+    @staticmethod
+    def __unsigned(value):
+        return value + (1 << 64) if value < 0 else value
+
+    @staticmethod
+    def __providerId(provider):
+        getId = getattr(provider, 'getId', None)
+        if getId is not None:
+            return getId()
+        return type(provider).__name__
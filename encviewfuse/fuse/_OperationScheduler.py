@@ -0,0 +1,101 @@
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from threading import Condition, Thread
+
+class OperationScheduler(object):
+    '''
+    Runs file system operations in two bounded pools of worker threads, one
+    for bulk data operations and one for all others, so metadata requests do
+    not queue behind reads. The calling thread waits for the result. Tasks
+    are queued per key, e.g. per file handle, and the keys of a pool are
+    served in turn, so a single large read stream cannot starve the others.
+    A pool with 0 workers runs its operations in the calling thread.
+    '''
+
+    DATA_OPERATIONS = frozenset(('read',))
+
+    def __init__(self, metadataWorkers, dataWorkers):
+        self.metadataPool = _FairPool(metadataWorkers, 'encviewfuse-metadata')
+        self.dataPool = _FairPool(dataWorkers, 'encviewfuse-data')
+
+    def run(self, op, function, key=None):
+        pool = self.dataPool if op in OperationScheduler.DATA_OPERATIONS else self.metadataPool
+        return pool.run(key, function)
+
+    def statistics(self):
+        return {'metadata': self.metadataPool.statistics(), 'data': self.dataPool.statistics()}
+
+    def shutdown(self):
+        self.metadataPool.shutdown()
+        self.dataPool.shutdown()
+
+
+class _FairPool(object):
+    '''
+    A pool of worker threads that takes its tasks from the per key queues in
+    turn. The threads are started with the first task.
+    '''
+
+    def __init__(self, workers, name):
+        self.workers = workers
+        self.name = name
+        # maps keys to queues of (function, future), the next key to serve is the first one
+        self.queues = OrderedDict()
+        self.condition = Condition()
+        self.threads = list()
+        self.stopped = False
+        self.scheduled = 0
+        self.queued = 0
+
+    def run(self, key, function):
+        with self.condition:
+            direct = self.workers == 0 or self.stopped
+            if not direct:
+                future = Future()
+                self.queues.setdefault(key, deque()).append((function, future))
+                self.scheduled += 1
+                self.queued += 1
+                if len(self.threads) == 0:
+                    self.__startWorkers()
+                self.condition.notify()
+        if direct:
+            # also operations that arrive after the shutdown
+            return function()
+        return future.result()
+
+    def statistics(self):
+        with self.condition:
+            return {'workers': self.workers, 'scheduled': self.scheduled, 'queued': self.queued}
+
+    def shutdown(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join()
+
+    def __startWorkers(self):
+        for index in range(0, self.workers):
+            thread = Thread(target=self.__work, name='{0}-{1}'.format(self.name, index), daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def __work(self):
+        while True:
+            with self.condition:
+                while not self.stopped and len(self.queues) == 0:
+                    self.condition.wait()
+                if len(self.queues) == 0:
+                    return
+                key, queue = self.queues.popitem(last=False)
+                function, future = queue.popleft()
+                if len(queue) > 0:
+                    # the other keys are served before this one again
+                    self.queues[key] = queue
+                self.queued -= 1
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(function())
+            except BaseException as e:
+                future.set_exception(e)
@@ -0,0 +1,116 @@
+from threading import Lock
+
+class PathTrie(object):
+    '''
+    A thread-safe prefix tree over path components. Every node stores a value
+    for the path formed by the components leading to it. The tree is cleared
+    as soon as it would grow beyond capacity nodes. A capacity of 0 disables it.
+    '''
+
+    class _Node(object):
+        __slots__ = ('value', 'children')
+
+        def __init__(self, value):
+            self.value = value
+            self.children = dict()
+
+    def __init__(self, capacity):
+        if capacity < 0:
+            raise ValueError('The capacity "{0}" must not be negative.'.format(capacity))
+        self.capacity = capacity
+        self.rootNode = PathTrie._Node(None)
+        self.size = 0
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def longestPrefix(self, components):
+        '''
+        Returns the number of leading components that have a node and the
+        value of the deepest of these nodes (None if there is no such node).
+        '''
+        with self.lock:
+            node = self.rootNode
+            depth = 0
+            for component in components:
+                child = node.children.get(component)
+                if child is None:
+                    break
+                node = child
+                depth += 1
+            self.hits += depth
+            self.misses += len(components) - depth
+            return depth, node.value
+
+    def insert(self, components, value):
+        '''
+        Stores the value for the given components. Returns False if the value
+        could not be stored because a parent node is missing.
+        '''
+        if self.capacity == 0 or len(components) == 0:
+            return False
+        with self.lock:
+            parent = self.__findNode(components[:-1])
+            if parent is None:
+                return False
+            child = parent.children.get(components[-1])
+            if child is not None:
+                child.value = value
+                return True
+            if self.size >= self.capacity:
+                self.__clear()
+                if len(components) > 1:
+                    return False
+                parent = self.rootNode
+            parent.children[components[-1]] = PathTrie._Node(value)
+            self.size += 1
+            return True
+
+    def remove(self, components):
+        '''
+        Removes the node for the given components including all nodes below it.
+        '''
+        if len(components) == 0:
+            self.clear()
+            return
+        with self.lock:
+            parent = self.__findNode(components[:-1])
+            if parent is None:
+                return
+            node = parent.children.pop(components[-1], None)
+            if node is not None:
+                self.size -= PathTrie.__countNodes(node)
+
+    def clear(self):
+        with self.lock:
+            self.__clear()
+
+    def statistics(self):
+        with self.lock:
+            return {'size': self.size, 'capacity': self.capacity, 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        with self.lock:
+            return self.size
+
+    def __clear(self):
+        self.rootNode.children.clear()
+        self.size = 0
+
+    def __findNode(self, components):
+        node = self.rootNode
+        for component in components:
+            node = node.children.get(component)
+            if node is None:
+                return None
+        return node
+
+    @staticmethod
+    def __countNodes(node):
+        count = 0
+        pending = [node]
+        while pending:
+            current = pending.pop()
+            count += 1
+            pending.extend(current.children.values())
+        return count
@@ -0,0 +1,376 @@
+import asyncio
+import os
+import stat
+from collections import deque
+from errno import EIO, ENOENT
+from functools import partial
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import pyfuse3
+try:
+    import pyfuse3.asyncio as pyfuse3_asyncio
+except ImportError:
+    # releases before 3.3 ship the asyncio support as a separate module
+    import pyfuse3_asyncio
+
+
+class Pyfuse3Operations(pyfuse3.Operations):
+    '''
+    Serves a FuseFsBase file system through the low-level libfuse API of
+    pyfuse3 on an asyncio loop. The path based operations of the file system
+    run in a thread pool, so the loop only dispatches requests. They are
+    called directly, not through the scheduler of the file system, which
+    would hand every request to another thread a second time.
+
+    The low-level API addresses entries by node ids, which are the inode
+    numbers reported by the file system. The kernel caches the content of a
+    file per node, so hard links only share one node if they have the same
+    file salt. A name whose salt differs from the one of the first name gets
+    an own node id counted down from the largest inode number. The kernel
+    does not allow a directory to have several nodes, so a directory reached
+    through another path, e.g. through a symbolic link, gets an own node id
+    as well.
+    '''
+
+    # keepCache values, auto keeps the cache if size and mtime are unchanged since the last open
+    KEEP_CACHE_NEVER = 'never'
+    KEEP_CACHE_AUTO = 'auto'
+    KEEP_CACHE_ALWAYS = 'always'
+
+    def __init__(self, fs, entryTimeout=1.0, attrTimeout=1.0, negativeTimeout=0.0, keepCache=KEEP_CACHE_NEVER, workers=None):
+        super(Pyfuse3Operations, self).__init__()
+        self.fs = fs
+        self.entryTimeout = entryTimeout
+        self.attrTimeout = attrTimeout
+        self.negativeTimeout = negativeTimeout
+        self.keepCache = keepCache
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='encviewfuse-pyfuse3')
+        # maps node ids to the view paths they were looked up with and back
+        self.paths = {pyfuse3.ROOT_INODE: ['/']}
+        self.inodes = {'/': pyfuse3.ROOT_INODE}
+        self.lookups = dict()
+        self.directoryNodes = set()
+        # maps node ids to the (inode, file salt) of their content and back
+        self.contents = dict()
+        self.nodes = dict()
+        self.aliasInodes = count((1 << 64) - 1, -1)
+        self.lock = Lock()
+        # maps directory handles to their _DirectoryStream
+        self.directories = dict()
+        self.directoryHandles = count(1)
+        # maps node ids to (mtime, size) of their last open
+        self.versions = dict()
+
+    def init(self):
+        # invalidations of the source watcher go through the low-level API
+        self.fs.kernelNotifier = self
+        self.fs('init', '/')
+
+    def shutdown(self):
+        self.fs('destroy', '/')
+        self.executor.shutdown(wait=True)
+
+    def invalidate(self, path):
+        '''
+        Asks the kernel to drop the entry of the view path and the cached
+        attributes and pages of its node.
+        '''
+        with self.lock:
+            parentInode = self.inodes.get(os.path.dirname(path))
+            inode = self.inodes.get(path)
+        if parentInode is not None:
+            pyfuse3.invalidate_entry_async(parentInode, os.fsencode(os.path.basename(path)))
+        if inode is not None:
+            try:
+                pyfuse3.invalidate_inode(inode)
+            except OSError:
+                # the kernel does not know the node anymore
+                pass
+
+    async def lookup(self, parent_inode, name, ctx=None):
+        path = self.__childPath(self.__path(parent_inode), os.fsdecode(name))
+        try:
+            attributes, salt = await self.__run(_entryOf, self.fs, path)
+        except pyfuse3.FUSEError as e:
+            if e.errno != ENOENT or self.negativeTimeout == 0:
+                raise
+            # a node id of 0 lets the kernel remember that the entry does not exist
+            entry = pyfuse3.EntryAttributes()
+            entry.st_ino = 0
+            entry.entry_timeout = self.negativeTimeout
+            return entry
+        entry = self.__entry(path, attributes, salt)
+        self.__addLookup(entry.st_ino)
+        return entry
+
+    async def forget(self, inode_list):
+        with self.lock:
+            for inode, lookups in inode_list:
+                remaining = self.lookups.get(inode, 0) - lookups
+                if remaining > 0:
+                    self.lookups[inode] = remaining
+                    continue
+                self.lookups.pop(inode, None)
+                self.versions.pop(inode, None)
+                self.directoryNodes.discard(inode)
+                content = self.contents.pop(inode, None)
+                if content is not None and self.nodes.get(content) == inode:
+                    del self.nodes[content]
+                if inode == pyfuse3.ROOT_INODE:
+                    continue
+                for path in self.paths.pop(inode, list()):
+                    if self.inodes.get(path) == inode:
+                        del self.inodes[path]
+
+    async def getattr(self, inode, ctx=None):
+        attributes = await self.__call('getattr', self.__path(inode))
+        return self.__attributes(inode, attributes)
+
+    async def access(self, inode, mode, ctx=None):
+        try:
+            await self.__call('access', self.__path(inode), mode)
+        except pyfuse3.FUSEError:
+            return False
+        return True
+
+    async def opendir(self, inode, ctx=None):
+        # the entries are read as the kernel asks for them
+        stream = _DirectoryStream(self.fs, self.__path(inode))
+        handle = next(self.directoryHandles)
+        self.directories[handle] = stream
+        return handle
+
+    async def readdir(self, fh, start_id, token):
+        stream = self.directories[fh]
+        while True:
+            entries = await self.__run(stream.read, start_id)
+            if len(entries) == 0:
+                return
+            for name, attributes, salt in entries:
+                entry = self.__entry(self.__childPath(stream.path, name), attributes, salt)
+                if not pyfuse3.readdir_reply(token, os.fsencode(name), entry, start_id + 1):
+                    return
+                # the kernel holds a reference to every entry that was added
+                self.__addLookup(entry.st_ino)
+                start_id += 1
+
+    async def releasedir(self, fh):
+        stream = self.directories.pop(fh, None)
+        if stream is not None:
+            stream.close()
+
+    async def open(self, inode, flags, ctx=None):
+        path = self.__path(inode)
+        fh = await self.__call('open', path, flags)
+        keepCache = self.keepCache == Pyfuse3Operations.KEEP_CACHE_ALWAYS
+        if self.keepCache == Pyfuse3Operations.KEEP_CACHE_AUTO:
+            attributes = await self.__call('getattr', path)
+            version = (attributes['st_mtime'], attributes['st_size'])
+            with self.lock:
+                keepCache = self.versions.get(inode) == version
+                self.versions[inode] = version
+        return pyfuse3.FileInfo(fh=fh, keep_cache=keepCache)
+
+    async def read(self, fh, off, size):
+        return await self.__call('read', None, size, off, fh)
+
+    async def release(self, fh):
+        await self.__call('release', None, fh)
+
+    async def getxattr(self, inode, name, ctx=None):
+        return await self.__call('getxattr', self.__path(inode), os.fsdecode(name))
+
+    async def listxattr(self, inode, ctx=None):
+        names = await self.__call('listxattr', self.__path(inode))
+        return [os.fsencode(name) for name in names]
+
+    async def statfs(self, ctx=None):
+        values = await self.__call('statfs', self.fs.root)
+        result = pyfuse3.StatvfsData()
+        for key in ('f_bsize', 'f_frsize', 'f_blocks', 'f_bfree', 'f_bavail', 'f_files', 'f_ffree', 'f_favail', 'f_namemax'):
+            setattr(result, key, values[key])
+        return result
+
+    async def __call(self, op, path, *args):
+        return await self.__run(getattr(self.fs, op), path, *args)
+
+    async def __run(self, function, *args):
+        loop = asyncio.get_event_loop()
+        try:
+            return await loop.run_in_executor(self.executor, partial(function, *args))
+        except OSError as e:
+            # like fusepy, errors of the file system are reported with their errno
+            raise pyfuse3.FUSEError(e.errno or EIO)
+
+    def __path(self, inode):
+        with self.lock:
+            paths = self.paths.get(inode)
+        if not paths:
+            raise pyfuse3.FUSEError(ENOENT)
+        return paths[0]
+
+    @staticmethod
+    def __childPath(path, name):
+        if name == '.':
+            return path
+        if name == '..':
+            return os.path.dirname(path)
+        return os.path.join(path, name)
+
+    def __entry(self, path, attributes, salt):
+        with self.lock:
+            inode = self.__bind(path, attributes, salt)
+        entry = self.__attributes(inode, attributes)
+        entry.entry_timeout = self.entryTimeout
+        return entry
+
+    def __bind(self, path, attributes, salt):
+        '''
+        Returns the node id of the view path, binding it if necessary.
+        '''
+        content = (attributes.get('st_ino', 0), salt)
+        isDirectory = stat.S_ISDIR(attributes['st_mode'])
+        boundInode = self.inodes.get(path)
+        if boundInode is not None and (self.contents.get(boundInode) == content or (isDirectory and boundInode in self.directoryNodes)):
+            return boundInode
+        if boundInode is not None:
+            # the path refers to another file than before
+            self.paths[boundInode].remove(path)
+        inode = self.nodes.get(content)
+        if inode is None or (isDirectory and len(self.paths.get(inode, ())) > 0):
+            inode = content[0]
+            if inode in (0, pyfuse3.ROOT_INODE) or inode in self.contents:
+                inode = next(self.aliasInodes)
+            self.nodes.setdefault(content, inode)
+            self.contents[inode] = content
+        self.paths.setdefault(inode, list()).append(path)
+        self.inodes[path] = inode
+        if isDirectory:
+            self.directoryNodes.add(inode)
+        return inode
+
+    def __addLookup(self, inode):
+        with self.lock:
+            self.lookups[inode] = self.lookups.get(inode, 0) + 1
+
+    def __attributes(self, inode, attributes):
+        entry = pyfuse3.EntryAttributes()
+        entry.st_ino = inode
+        entry.st_mode = attributes['st_mode']
+        entry.st_nlink = attributes['st_nlink']
+        entry.st_uid = attributes['st_uid']
+        entry.st_gid = attributes['st_gid']
+        entry.st_size = attributes['st_size']
+        entry.st_blksize = 4096
+        entry.st_blocks = (attributes['st_size'] + 511) // 512
+        entry.st_atime_ns = int(attributes['st_atime'] * 1e9)
+        entry.st_mtime_ns = int(attributes['st_mtime'] * 1e9)
+        entry.st_ctime_ns = int(attributes['st_ctime'] * 1e9)
+        entry.attr_timeout = self.attrTimeout
+        return entry
+
+
+class _DirectoryStream(object):
+    '''
+    The entries of an open view directory. They are taken from the readdir
+    generator of the file system as the kernel asks for them, so huge
+    directories are never held in memory. Entries that the kernel did not
+    accept yet are kept for its next request. A request for an earlier
+    offset, e.g. after rewinddir, reads the directory again.
+    '''
+
+    BATCH_SIZE = 64
+
+    def __init__(self, fs, path):
+        self.fs = fs
+        self.path = path
+        self.entries = None
+        # (name, attributes, file salt) of the entries from offset on that were read but not accepted
+        self.pending = deque()
+        self.offset = 0
+
+    def read(self, offset):
+        '''
+        Returns up to BATCH_SIZE (name, attributes, file salt) of the entries
+        from the given offset on, an empty list at the end of the directory.
+        '''
+        if self.entries is None or offset < self.offset:
+            self.close()
+            self.entries = iter(self.fs.readdir(self.path, None))
+        while self.offset < offset:
+            if len(self.pending) == 0 and not self.__readEntry():
+                return list()
+            self.pending.popleft()
+            self.offset += 1
+        while len(self.pending) < _DirectoryStream.BATCH_SIZE and self.__readEntry():
+            pass
+        return list(self.pending)
+
+    def close(self):
+        if self.entries is not None and hasattr(self.entries, 'close'):
+            self.entries.close()
+        self.entries = None
+        self.pending.clear()
+        self.offset = 0
+
+    def __readEntry(self):
+        '''
+        Appends the next entry of the directory to the pending ones. Entries
+        that vanish while listing are left out. Returns False at the end.
+        '''
+        for viewEntry in self.entries:
+            name, attributes = (viewEntry, None) if isinstance(viewEntry, str) else viewEntry[0:2]
+            if name in ('.', '..'):
+                continue
+            try:
+                attributes, salt = _entryOf(self.fs, os.path.join(self.path, name), attributes)
+            except OSError:
+                continue
+            self.pending.append((name, attributes, salt))
+            return True
+        return False
+
+
+def _entryOf(fs, path, attributes=None):
+    '''
+    Returns the attributes of the view path and the file salt of a regular
+    file, which tells the content of its names apart.
+    '''
+    if attributes is None:
+        attributes = fs.getattr(path)
+    salt = fs.fileSalt(path) if stat.S_ISREG(attributes['st_mode']) else None
+    return attributes, salt
+
+
+# fusepy options that the low-level API does not know, they are mapped to reply attributes instead
+TRANSLATED_OPTIONS = ('attr_timeout', 'entry_timeout', 'negative_timeout', 'kernel_cache', 'auto_cache',
+                      'use_ino', 'max_readahead', 'foreground', 'nothreads')
+
+def mount(fs, mountpoint, fuseOptions):
+    '''
+    Mounts the file system with pyfuse3 and serves it until it is unmounted.
+    fuseOptions are the options that would be passed to fusepy's FUSE.
+    '''
+    keepCache = Pyfuse3Operations.KEEP_CACHE_NEVER
+    if fuseOptions.get('kernel_cache'):
+        keepCache = Pyfuse3Operations.KEEP_CACHE_ALWAYS
+    elif fuseOptions.get('auto_cache'):
+        keepCache = Pyfuse3Operations.KEEP_CACHE_AUTO
+    operations = Pyfuse3Operations(fs, float(fuseOptions.get('entry_timeout', 1.0)), float(fuseOptions.get('attr_timeout', 1.0)),
+                                   float(fuseOptions.get('negative_timeout', 0.0)), keepCache)
+    options = set(pyfuse3.default_options)
+    options.add('fsname=encviewfuse')
+    for key, value in fuseOptions.items():
+        if key not in TRANSLATED_OPTIONS:
+            options.add(key if value is True else '{0}={1}'.format(key, value))
+
+    pyfuse3_asyncio.enable()
+    pyfuse3.init(operations, mountpoint, options)
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(pyfuse3.main())
+    finally:
+        pyfuse3.close(unmount=True)
+        operations.shutdown()
+        loop.close()
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import Lock
+
+class ReadAhead(object):
+    '''
+    Detects sequential reads per file handle and computes the following blocks
+    in background threads before they are requested. The number of blocks read
+    ahead doubles with every sequential read up to maxWindow and drops to 0 as
+    soon as a handle is read randomly. A maxWindow of 0 disables read-ahead.
+    '''
+
+    class _HandleState(object):
+        def __init__(self):
+            self.nextOffset = 0
+            self.window = 0
+            # maps block indices to (file key, future)
+            self.pending = dict()
+
+    def __init__(self, blockSize, maxWindow, workers):
+        if maxWindow < 0:
+            raise ValueError('The window "{0}" must not be negative.'.format(maxWindow))
+        if workers < 1:
+            raise ValueError('At least one worker is required but "{0}" were given.'.format(workers))
+        self.blockSize = blockSize
+        self.maxWindow = maxWindow
+        self.workers = workers
+        self.executor = None
+        self.handles = dict()
+        self.lock = Lock()
+
+    def isEnabled(self):
+        return self.maxWindow > 0
+
+    def access(self, fh, offset, size):
+        '''
+        Records a read of the given handle and returns the number of blocks
+        following the read that shall be read ahead.
+        '''
+        if not self.isEnabled():
+            return 0
+        with self.lock:
+            state = self.handles.get(fh)
+            if state is None:
+                state = ReadAhead._HandleState()
+                self.handles[fh] = state
+            if offset == state.nextOffset:
+                state.window = min(max(2 * state.window, 1), self.maxWindow)
+                firstBlockIndex = offset // self.blockSize
+                passed = [blockIndex for blockIndex in state.pending.keys() if blockIndex < firstBlockIndex]
+            else:
+                state.window = 0
+                passed = list(state.pending.keys())
+            for blockIndex in passed:
+                state.pending.pop(blockIndex)[1].cancel()
+            state.nextOffset = offset + size
+            return state.window
+
+    def schedule(self, fh, fileKey, blockIndex, function):
+        '''
+        Computes the block with the given index of the file identified by the
+        given key in the background by calling function.
+        '''
+        with self.lock:
+            state = self.handles.get(fh)
+            if state is None or blockIndex in state.pending:
+                return
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='encviewfuse-readahead')
+            state.pending[blockIndex] = (fileKey, self.executor.submit(function))
+
+    def take(self, fh, fileKey, blockIndex):
+        '''
+        Returns the block computed in the background or None if there is none.
+        '''
+        with self.lock:
+            state = self.handles.get(fh)
+            if state is None or blockIndex not in state.pending:
+                return None
+            pendingFileKey, future = state.pending.pop(blockIndex)
+        if pendingFileKey != fileKey or future.cancelled():
+            future.cancel()
+            return None
+        try:
+            return future.result()
+        except Exception:
+            # the caller computes the block again and gets to see the error itself
+            return None
+
+    def release(self, fh):
+        '''
+        Forgets the given handle. Blocks of the handle that are computed at the
+        moment are waited for, so the handle can be closed afterwards.
+        '''
+        with self.lock:
+            state = self.handles.pop(fh, None)
+        if state is not None:
+            futures = [future for _, future in state.pending.values() if not future.cancel()]
+            wait(futures)
+
+    def shutdown(self):
+        with self.lock:
+            executor = self.executor
+            self.executor = None
+            self.handles.clear()
+        if executor is not None:
+            executor.shutdown(wait=True)
@@ -0,0 +1,113 @@
+import os
+from threading import Lock
+from errno import ESTALE, EBADF
+from contextlib import contextmanager
+from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+from encviewfuse.fuse._ContentReader import ContentReader
+
+class SourceFile(VirtualFile):
+    '''
+    A virtual file for a file in the root directory that is shared by all
+    handles opened for it. Reads are positional, so they neither depend on
+    nor change a file offset and do not have to be serialized. If a
+    descriptor pool is given, the descriptor may be closed between reads and
+    is reopened on demand. A reopened file has to be the very same file,
+    otherwise reads fail with ESTALE.
+    '''
+
+    def __init__(self, absRootPath, flags, sourceKey, descriptorPool=None):
+        super(SourceFile, self).__init__(absRootPath, flags)
+        self.flags = flags
+        self.sourceKey = sourceKey
+        st = os.fstat(self.fd)
+        self.identity = SourceFile.__identity(st)
+        self.users = 0
+        self.closed = False
+        self.descriptorPool = descriptorPool
+        if descriptorPool is not None:
+            descriptorPool.register(self)
+
+    def read(self, offset, size):
+        with self.__descriptor() as fd:
+            return os.pread(fd, size, offset)
+
+    def readInto(self, buffer, offset):
+        with self.__descriptor() as fd:
+            return ContentReader.preadInto(fd, buffer, offset)
+
+    def size(self):
+        return self.stat().st_size
+
+    def stat(self):
+        with self.__descriptor() as fd:
+            return os.fstat(fd)
+
+    def closeFileHandle(self):
+        self.closed = True
+        if self.descriptorPool is not None:
+            self.descriptorPool.unregister(self)
+        self.closeDescriptor()
+
+    def closeDescriptor(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def openDescriptor(self):
+        '''
+        Opens a new descriptor for the file, which has to be the very same
+        file as at the first open.
+        '''
+        fd = os.open(self.absRootPath, self.flags)
+        try:
+            identity = SourceFile.__identity(os.fstat(fd))
+        except OSError:
+            os.close(fd)
+            raise
+        if identity != self.identity:
+            os.close(fd)
+            raise OSError(ESTALE, 'The file "{0}" has been replaced.'.format(self.absRootPath))
+        return fd
+
+    @contextmanager
+    def __descriptor(self):
+        if self.closed:
+            raise OSError(EBADF, 'The file "{0}" has been closed.'.format(self.absRootPath))
+        if self.descriptorPool is None:
+            yield self.fd
+        else:
+            with self.descriptorPool.use(self) as fd:
+                yield fd
+
+    @staticmethod
+    def __identity(st):
+        return (st.st_dev, st.st_ino, st.st_mtime_ns)
+
+
+class SourceFileName(VirtualFile):
+    '''
+    A name under which a SourceFile has been opened. The file key depends on
+    the name through the file salt, so every name keeps its own encryption
+    context, while all names of a file, e.g. hard links, share its
+    descriptor.
+    '''
+
+    def __init__(self, absRootPath, sourceFile, nameKey):
+        # VirtualFile.__init__ would open a descriptor of its own
+        self.absRootPath = absRootPath
+        self.sourceFile = sourceFile
+        self.nameKey = nameKey
+        self.lock = Lock()
+        self.encryptionDictionary = dict()
+
+    def read(self, offset, size):
+        return self.sourceFile.read(offset, size)
+
+    def readInto(self, buffer, offset):
+        return self.sourceFile.readInto(buffer, offset)
+
+    def size(self):
+        return self.sourceFile.size()
+
+    def stat(self):
+        return self.sourceFile.stat()
@@ -0,0 +1,62 @@
+import os
+import stat
+
+class SourceWalker(object):
+    '''
+    Walks a source tree the way the view shows it: symbolic links are followed
+    (but never into one of their own parents) and entries that are neither
+    files nor directories are skipped. Entries are yielded as (relative path
+    components, source path, stat result) in sorted order with directories
+    before their entries, i.e. ordered by their path components.
+    '''
+
+    def __init__(self, root):
+        self.root = os.path.realpath(root)
+
+    def walk(self, paths=None):
+        '''
+        Walks the given paths relative to the root (default: the whole tree).
+        The parent directories of a path are yielded as well.
+        '''
+        if paths is None or len(paths) == 0:
+            paths = [os.curdir]
+        # parent directories shared by several paths are only yielded once
+        yieldedParents = set()
+        for path in paths:
+            sourcePath = os.path.normpath(os.path.join(self.root, path))
+            relativePath = os.path.relpath(sourcePath, self.root)
+            if relativePath == os.pardir or relativePath.startswith(os.pardir + os.sep):
+                raise ValueError('The path "{0}" is not below the source directory.'.format(path))
+            components = tuple() if relativePath == os.curdir else tuple(relativePath.split(os.sep))
+            for depth in range(1, len(components)):
+                if components[:depth] not in yieldedParents:
+                    yieldedParents.add(components[:depth])
+                    parentPath = os.path.join(self.root, *components[:depth])
+                    yield components[:depth], parentPath, os.stat(parentPath)
+            st = os.stat(sourcePath)
+            if len(components) > 0 and (stat.S_ISREG(st.st_mode) or stat.S_ISDIR(st.st_mode)):
+                yield components, sourcePath, st
+            yield from self.__walkDirectory(components, sourcePath, st, frozenset())
+
+    def __walkDirectory(self, components, sourcePath, st, ancestors):
+        if not stat.S_ISDIR(st.st_mode):
+            return
+        directoryKey = (st.st_dev, st.st_ino)
+        if directoryKey in ancestors:
+            # a symbolic link pointing to one of its parents
+            return
+        ancestors = ancestors | frozenset((directoryKey,))
+        with os.scandir(sourcePath) as entries:
+            names = sorted(entry.name for entry in entries)
+        for name in names:
+            entryPath = os.path.join(sourcePath, name)
+            try:
+                entryStat = os.stat(entryPath)
+            except OSError:
+                # broken symbolic links are not part of the view
+                continue
+            if not (stat.S_ISDIR(entryStat.st_mode) or stat.S_ISREG(entryStat.st_mode)):
+                continue
+            entryComponents = components + (name,)
+            yield entryComponents, entryPath, entryStat
+            yield from self.__walkDirectory(entryComponents, entryPath, entryStat, ancestors)
@@ -0,0 +1,166 @@
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+from threading import Lock, Thread
+
+class SourceWatcher(object):
+    '''
+    Watches a directory tree with Linux inotify and reports every change of a
+    directory entry by calling changed with the directory path, the entry name
+    and whether the entry is a directory. overflow is called if events were
+    lost. Symbolic links are not followed. If the inotify watch limit is
+    reached, the affected directories stay unwatched and isComplete returns
+    False from then on.
+    '''
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ONLYDIR = 0x01000000
+    IN_DONT_FOLLOW = 0x02000000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = os.O_NONBLOCK
+    IN_CLOEXEC = os.O_CLOEXEC
+
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+                  IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+    EVENT_HEADER = struct.Struct('iIII')
+
+    def __init__(self, changed, overflow):
+        libcName = ctypes.util.find_library('c')
+        self.libc = ctypes.CDLL(libcName, use_errno=True)
+        if not hasattr(self.libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available.')
+        self.libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.changed = changed
+        self.overflow = overflow
+        self.fd = self.__check(self.libc.inotify_init1(SourceWatcher.IN_NONBLOCK | SourceWatcher.IN_CLOEXEC))
+        self.wakeUpRead, self.wakeUpWrite = os.pipe()
+        # maps watch descriptors to directory paths and back
+        self.paths = dict()
+        self.watches = dict()
+        self.complete = True
+        self.lock = Lock()
+        self.thread = None
+
+    def watchTree(self, rootDirectory):
+        '''
+        Watches the given directory and all directories below it.
+        '''
+        pending = [rootDirectory]
+        while len(pending) > 0:
+            directory = pending.pop()
+            if not self.__watch(directory):
+                continue
+            try:
+                with os.scandir(directory) as entries:
+                    pending.extend(entry.path for entry in entries if entry.is_dir(follow_symlinks=False))
+            except OSError:
+                # the directory vanished in between, its watch is dropped by the kernel
+                pass
+
+    def isComplete(self):
+        with self.lock:
+            return self.complete
+
+    def start(self):
+        self.thread = Thread(target=self.__run, name='encviewfuse-watcher', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        if self.thread is not None:
+            os.write(self.wakeUpWrite, b'\0')
+            self.thread.join()
+            self.thread = None
+        os.close(self.fd)
+        os.close(self.wakeUpRead)
+        os.close(self.wakeUpWrite)
+
+    def __watch(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), SourceWatcher.WATCH_MASK)
+        if wd < 0:
+            if ctypes.get_errno() == errno.ENOSPC:
+                with self.lock:
+                    self.complete = False
+            return False
+        with self.lock:
+            oldDirectory = self.paths.get(wd)
+            if oldDirectory is not None:
+                self.watches.pop(oldDirectory, None)
+            self.paths[wd] = directory
+            self.watches[directory] = wd
+        return True
+
+    def __unwatchTree(self, directory):
+        '''
+        Forgets the given directory and the directories below it, e.g. because
+        they are moved to another path.
+        '''
+        prefix = os.path.join(directory, '')
+        with self.lock:
+            directories = [path for path in self.watches.keys() if path == directory or path.startswith(prefix)]
+            wds = [self.watches.pop(path) for path in directories]
+            for wd in wds:
+                self.paths.pop(wd, None)
+        for wd in wds:
+            self.libc.inotify_rm_watch(self.fd, wd)
+
+    def __run(self):
+        while True:
+            readable, _, _ = select.select([self.fd, self.wakeUpRead], [], [])
+            if self.wakeUpRead in readable:
+                return
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                continue
+            self.__dispatch(data)
+
+    def __dispatch(self, data):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, nameLength = SourceWatcher.EVENT_HEADER.unpack_from(data, offset)
+            offset += SourceWatcher.EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + nameLength].rstrip(b'\0'))
+            offset += nameLength
+            if mask & SourceWatcher.IN_Q_OVERFLOW:
+                self.overflow()
+                continue
+            with self.lock:
+                directory = self.paths.get(wd)
+                if mask & SourceWatcher.IN_IGNORED and directory is not None:
+                    self.paths.pop(wd)
+                    if self.watches.get(directory) == wd:
+                        self.watches.pop(directory)
+            if directory is None or mask & (SourceWatcher.IN_IGNORED | SourceWatcher.IN_DELETE_SELF | SourceWatcher.IN_MOVE_SELF):
+                # the parent directory reports these changes, too
+                continue
+            isDirectory = mask & SourceWatcher.IN_ISDIR != 0
+            path = os.path.join(directory, name)
+            if isDirectory and mask & SourceWatcher.IN_MOVED_FROM:
+                self.__unwatchTree(path)
+            elif isDirectory and mask & (SourceWatcher.IN_CREATE | SourceWatcher.IN_MOVED_TO):
+                self.watchTree(path)
+            try:
+                self.changed(directory, name, isDirectory)
+            except Exception:
+                # a failed invalidation must not stop watching
+                pass
+
+    @staticmethod
+    def __check(result):
+        if result < 0:
+            errorNumber = ctypes.get_errno()
+            raise OSError(errorNumber, os.strerror(errorNumber))
+        return result
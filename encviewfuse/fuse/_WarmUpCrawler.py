@@ -0,0 +1,91 @@
+import heapq
+import time
+from itertools import count
+from threading import Condition, Lock, Thread
+
+class WarmUpCrawler(object):
+    '''
+    Crawls a directory tree in background threads. Directories are visited
+    most recently modified first by calling visit with the directory, which
+    returns the number of processed entries and a list of (mtime, directory)
+    tuples for the subdirectories. At most rate entries are processed per
+    second (0 means unlimited).
+    '''
+
+    def __init__(self, visit, workers, rate):
+        if workers < 1:
+            raise ValueError('At least one worker is required but "{0}" were given.'.format(workers))
+        if rate < 0:
+            raise ValueError('The rate "{0}" must not be negative.'.format(rate))
+        self.visit = visit
+        self.workers = workers
+        self.rate = rate
+        self.queue = list()
+        self.sequence = count()
+        self.busy = 0
+        self.stopped = False
+        self.condition = Condition()
+        self.threads = list()
+        self.rateLock = Lock()
+        self.nextAllowedTime = 0
+        self.visited = 0
+
+    def start(self, rootDirectory):
+        with self.condition:
+            self.__push(0, rootDirectory)
+        for index in range(0, self.workers):
+            thread = Thread(target=self.__work, name='encviewfuse-warmup-{0}'.format(index), daemon=True)
+            self.threads.append(thread)
+            thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
+        self.join()
+
+    def join(self, timeout=None):
+        for thread in self.threads:
+            thread.join(timeout)
+
+    def isFinished(self):
+        with self.condition:
+            return self.stopped or (len(self.threads) > 0 and len(self.queue) == 0 and self.busy == 0)
+
+    def __push(self, mtime, directory):
+        # heapq is a min heap, so the negated mtime yields the most recent directory first
+        heapq.heappush(self.queue, (-mtime, next(self.sequence), directory))
+
+    def __work(self):
+        while True:
+            with self.condition:
+                while not self.stopped and len(self.queue) == 0 and self.busy > 0:
+                    self.condition.wait()
+                if self.stopped or len(self.queue) == 0:
+                    self.condition.notify_all()
+                    return
+                _, _, directory = heapq.heappop(self.queue)
+                self.busy += 1
+            try:
+                processedEntries, subdirectories = self.visit(directory)
+            except Exception:
+                # a directory that vanished or cannot be read is simply not warmed up
+                processedEntries, subdirectories = 0, list()
+            with self.condition:
+                for mtime, subdirectory in subdirectories:
+                    self.__push(mtime, subdirectory)
+                self.busy -= 1
+                self.visited += 1
+                self.condition.notify_all()
+            self.__throttle(processedEntries)
+
+    def __throttle(self, processedEntries):
+        if self.rate == 0 or processedEntries == 0:
+            return
+        with self.rateLock:
+            now = time.monotonic()
+            self.nextAllowedTime = max(self.nextAllowedTime, now) + processedEntries / self.rate
+            delay = self.nextAllowedTime - now
+        if delay > 0:
+            with self.condition:
+                self.condition.wait_for(lambda: self.stopped, delay)
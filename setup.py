@@ -29,10 +29,16 @@ setup(
     ],
     keywords='encryption fuse view',
     packages=find_packages(exclude=['contrib', 'docs', 'tests*']),
+    python_requires='>=3.6',
     install_requires=['fusepy', 'deterministic_encryption_utils'],
+    extras_require={
+        'pyfuse3': ['pyfuse3'],
+    },
     entry_points={
         'console_scripts': [
-            'encviewfuse_fs=encviewfuse.fuse.EncryptedFuseFs:main'
+            'encviewfuse_fs=encviewfuse.fuse.EncryptedFuseFs:main',
+            'encviewfuse_export=encviewfuse.fuse.EncryptedExport:main',
+            'encviewfuse_changes=encviewfuse.fuse.EncryptedChangeJournal:main'
         ],
     },
 )
@@ -0,0 +1,60 @@
+import os, tempfile, unittest
+from encviewfuse.fuse._CachingSaltProvider import CachingSaltProvider
+
+
+class TestCachingSaltProvider(unittest.TestCase):
+
+    class _CountingSaltProvider(object):
+        def __init__(self):
+            self.calls = 0
+
+        def getId(self):
+            return 'counting'
+
+        def getSaltFor(self, absoluteFilePath):
+            if not os.path.exists(absoluteFilePath):
+                raise ValueError('The given path must exist.')
+            self.calls += 1
+            return '{0}-{1}'.format(os.path.basename(absoluteFilePath), self.calls)
+
+    def setUp(self):
+        self.provider = TestCachingSaltProvider._CountingSaltProvider()
+        self.subject = CachingSaltProvider(self.provider, 10)
+        file = tempfile.NamedTemporaryFile(delete=False)
+        file.close()
+        self.filePath = file.name
+
+    def tearDown(self):
+        if os.path.exists(self.filePath):
+            os.remove(self.filePath)
+
+    def testDelegatesId(self):
+        self.assertEqual('counting', self.subject.getId())
+
+    def testUnchangedFileIsNotDerivedAgain(self):
+        salt = self.subject.getSaltFor(self.filePath)
+        self.assertEqual(salt, self.subject.getSaltFor(self.filePath))
+        self.assertEqual(1, self.provider.calls)
+        self.assertEqual(1, self.subject.statistics()['avoided'])
+
+    def testModifiedFileIsDerivedAgain(self):
+        salt = self.subject.getSaltFor(self.filePath)
+        st = os.stat(self.filePath)
+        os.utime(self.filePath, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+        self.assertNotEqual(salt, self.subject.getSaltFor(self.filePath))
+        self.assertEqual(2, self.provider.calls)
+
+    def testMissingFileIsReportedByProvider(self):
+        os.remove(self.filePath)
+        self.assertRaises(ValueError, self.subject.getSaltFor, self.filePath)
+
+    def testCapacityIsBounded(self):
+        subject = CachingSaltProvider(self.provider, 0)
+        subject.getSaltFor(self.filePath)
+        subject.getSaltFor(self.filePath)
+        self.assertEqual(2, self.provider.calls)
+        self.assertEqual(0, subject.statistics()['size'])
+
+
+if __name__ == "__main__":
+    unittest.main()
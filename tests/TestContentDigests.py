@@ -0,0 +1,71 @@
+import hashlib, unittest
+from threading import Event
+from encviewfuse.fuse._ContentDigests import ContentDigests
+
+
+class TestContentDigests(unittest.TestCase):
+
+    FILE_KEY = (1, 2, 3, 4, 'salt')
+
+    def setUp(self):
+        self.subject = ContentDigests(10, 1)
+
+    def tearDown(self):
+        self.subject.shutdown()
+
+    def testSequentialReadStoresDigest(self):
+        self.subject.access(1, TestContentDigests.FILE_KEY, 6, 0, b'abc')
+        self.assertIsNone(self.subject.get(TestContentDigests.FILE_KEY))
+        self.subject.access(1, TestContentDigests.FILE_KEY, 6, 3, b'def')
+        self.assertEqual(hashlib.sha256(b'abcdef').hexdigest(), self.subject.get(TestContentDigests.FILE_KEY))
+
+    def testRandomReadStoresNoDigest(self):
+        self.subject.access(1, TestContentDigests.FILE_KEY, 6, 0, b'abc')
+        self.subject.access(1, TestContentDigests.FILE_KEY, 6, 4, b'ef')
+        self.subject.access(1, TestContentDigests.FILE_KEY, 6, 5, b'f')
+        self.assertIsNone(self.subject.get(TestContentDigests.FILE_KEY))
+
+    def testReleasedHandleStoresNoDigest(self):
+        self.subject.access(1, TestContentDigests.FILE_KEY, 6, 0, b'abc')
+        self.subject.release(1)
+        self.subject.access(1, TestContentDigests.FILE_KEY, 6, 3, b'def')
+        self.assertIsNone(self.subject.get(TestContentDigests.FILE_KEY))
+
+    def testScheduleComputesDigestInBackground(self):
+        self.subject.schedule(TestContentDigests.FILE_KEY, lambda: 'digest')
+        self.subject.shutdown()
+        self.assertEqual('digest', self.subject.get(TestContentDigests.FILE_KEY))
+
+    def testScheduleComputesDigestOnce(self):
+        release = Event()
+        calls = list()
+        def compute():
+            calls.append(None)
+            release.wait()
+            return 'digest'
+        self.subject.schedule(TestContentDigests.FILE_KEY, compute)
+        self.subject.schedule(TestContentDigests.FILE_KEY, compute)
+        release.set()
+        self.subject.shutdown()
+        self.assertEqual(1, len(calls))
+
+    def testChangedFileStoresNoDigest(self):
+        self.subject.schedule(TestContentDigests.FILE_KEY, lambda: None)
+        self.subject.shutdown()
+        self.assertIsNone(self.subject.get(TestContentDigests.FILE_KEY))
+
+    def testInvalidateDropsDigestsOfAllSalts(self):
+        otherKey = (1, 2, 3, 4, 'other')
+        unrelatedKey = (1, 3, 3, 4, 'salt')
+        for fileKey in (TestContentDigests.FILE_KEY, otherKey, unrelatedKey):
+            self.subject.schedule(fileKey, lambda: 'digest')
+        self.subject.shutdown()
+        
+        self.subject.invalidate(1, 2)
+        self.assertIsNone(self.subject.get(TestContentDigests.FILE_KEY))
+        self.assertIsNone(self.subject.get(otherKey))
+        self.assertEqual('digest', self.subject.get(unrelatedKey))
+
+
+if __name__ == "__main__":
+    unittest.main()
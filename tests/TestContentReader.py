@@ -0,0 +1,71 @@
+import os, shutil, tempfile, unittest
+from encviewfuse.fuse._ContentReader import ContentReader
+from encviewfuse.fuse._SourceFile import SourceFile
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+
+
+class TestContentReader(unittest.TestCase):
+
+    class _SaltProviderMock(object):
+        def getSaltFor(self, absoluteFilePath):
+            return '42'
+
+    def setUp(self):
+        self.rootDir = tempfile.mkdtemp()
+        saltProvider = TestContentReader._SaltProviderMock()
+        self.encryption = Encryption('abc', saltProvider, saltProvider)
+        self.subject = ContentReader(self.encryption)
+
+    def tearDown(self):
+        shutil.rmtree(self.rootDir)
+
+    def testReadEqualsEncryptedContent(self):
+        for size in (0, 1, 15, 16, 17, 100, 4096):
+            path = self.__createFile('f{0}'.format(size), size)
+            expected = self.__encryptedContent(path)
+            sourceFile = SourceFile(path, os.O_RDONLY, None)
+            try:
+                for offset in range(0, len(expected) + 2):
+                    for length in (0, 1, 3, 15, 16, 17, 33, 200, len(expected)):
+                        self.assertEqual(expected[offset:offset + length], self.subject.read(sourceFile, offset, length, size),
+                                         'size {0}, offset {1}, length {2}'.format(size, offset, length))
+            finally:
+                sourceFile.closeFileHandle()
+
+    def testReadFromVirtualFile(self):
+        path = self.__createFile('f', 1000)
+        expected = self.__encryptedContent(path)
+        virtualFile = VirtualFile(path)
+        try:
+            self.assertEqual(expected, self.subject.read(virtualFile, 0, 4096, 1000))
+            self.assertEqual(expected[40:500], self.subject.read(virtualFile, 40, 460, 1000))
+        finally:
+            virtualFile.closeFileHandle()
+
+    def testReadShrunkFile(self):
+        path = self.__createFile('f', 1000)
+        virtualFile = VirtualFile(path)
+        try:
+            os.truncate(path, 100)
+            expected = self.encryption.encryptedContent(virtualFile, 0, 4096)
+            self.assertEqual(expected, self.subject.read(virtualFile, 0, 4096, 1000))
+        finally:
+            virtualFile.closeFileHandle()
+
+    def __createFile(self, name, size):
+        path = os.path.join(self.rootDir, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        return path
+
+    def __encryptedContent(self, path):
+        virtualFile = VirtualFile(path)
+        try:
+            return self.encryption.encryptedContent(virtualFile, 0, self.encryption.encryptedFileSize(os.path.getsize(path)))
+        finally:
+            virtualFile.closeFileHandle()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import errno, os, unittest
+from encviewfuse.fuse._DescriptorPool import DescriptorPool
+
+
+class TestDescriptorPool(unittest.TestCase):
+
+    class _SourceFileMock(object):
+        def __init__(self):
+            self.fd = 42
+            self.users = 0
+            self.closed = False
+
+        def closeDescriptor(self):
+            self.fd = None
+
+        def openDescriptor(self):
+            return 42
+
+    def setUp(self):
+        self.subject = DescriptorPool(1)
+
+    def testInvalidMaximum(self):
+        with self.assertRaises(ValueError) as _:
+            DescriptorPool(0)
+
+    def testLeastRecentlyUsedIsClosed(self):
+        first = TestDescriptorPool._SourceFileMock()
+        second = TestDescriptorPool._SourceFileMock()
+        self.subject.register(first)
+        self.subject.register(second)
+        self.assertIsNone(first.fd)
+        self.assertEqual(42, second.fd)
+
+    def testUseReopensDescriptor(self):
+        first = TestDescriptorPool._SourceFileMock()
+        second = TestDescriptorPool._SourceFileMock()
+        self.subject.register(first)
+        self.subject.register(second)
+        with self.subject.use(first) as fd:
+            self.assertEqual(42, fd)
+        self.assertIsNone(second.fd)
+        self.assertEqual(1, self.subject.statistics()['reopened'])
+
+    def testUsedDescriptorIsNotClosed(self):
+        first = TestDescriptorPool._SourceFileMock()
+        second = TestDescriptorPool._SourceFileMock()
+        self.subject.register(first)
+        with self.subject.use(first) as _:
+            self.subject.register(second)
+            self.assertEqual(42, first.fd)
+            self.assertIsNone(second.fd)
+        self.assertEqual(1, self.subject.statistics()['open'])
+
+    def testReopenDoesNotHoldLock(self):
+        first = TestDescriptorPool._SourceFileMock()
+        second = TestDescriptorPool._SourceFileMock()
+        self.subject.register(first)
+        self.subject.register(second)
+        locked = list()
+        first.openDescriptor = lambda: locked.append(self.subject.lock.locked()) or 42
+        with self.subject.use(first) as fd:
+            self.assertEqual(42, fd)
+        self.assertEqual([False], locked)
+
+    def testFileClosedWhileReopening(self):
+        first = TestDescriptorPool._SourceFileMock()
+        second = TestDescriptorPool._SourceFileMock()
+        self.subject.register(first)
+        self.subject.register(second)
+        def openDescriptor():
+            first.closed = True
+            return os.open(os.devnull, os.O_RDONLY)
+        first.openDescriptor = openDescriptor
+        with self.assertRaises(OSError) as context:
+            with self.subject.use(first) as _:
+                pass
+        self.assertEqual(errno.EBADF, context.exception.errno)
+        self.assertEqual(0, first.users)
+        self.assertEqual(1, self.subject.statistics()['open'])
+
+    def testUnregister(self):
+        first = TestDescriptorPool._SourceFileMock()
+        self.subject.register(first)
+        self.subject.unregister(first)
+        self.assertEqual(0, self.subject.statistics()['open'])
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,115 @@
+import os, shutil, tempfile, unittest
+from encviewfuse.fuse.EncryptedChangeJournal import EncryptedChangeJournal
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+
+
+class TestEncryptedChangeJournal(unittest.TestCase):
+
+    class _SaltProviderMock(object):
+        def getSaltFor(self, absoluteFilePath):
+            return os.path.basename(absoluteFilePath)
+
+    def setUp(self):
+        self.rootDir = tempfile.mkdtemp()
+        self.snapshotDir = tempfile.mkdtemp()
+        self.snapshot = os.path.join(self.snapshotDir, 'snapshot')
+        # RootDir
+        # - f1
+        # - d1
+        #   - f2
+        # - d1-x
+        #   - f3
+        self.f1 = self.__createFile(self.rootDir, 'f1')
+        self.d1 = os.path.join(self.rootDir, 'd1')
+        os.mkdir(self.d1)
+        self.f2 = self.__createFile(self.d1, 'f2')
+        os.mkdir(os.path.join(self.rootDir, 'd1-x'))
+        self.f3 = self.__createFile(os.path.join(self.rootDir, 'd1-x'), 'f3')
+        saltProvider = TestEncryptedChangeJournal._SaltProviderMock()
+        self.encryption = Encryption('abc', saltProvider, saltProvider)
+        self.subject = EncryptedChangeJournal(self.rootDir, 'abc', saltProvider, saltProvider)
+
+    def tearDown(self):
+        shutil.rmtree(self.rootDir)
+        shutil.rmtree(self.snapshotDir)
+
+    def testFirstRunAddsAllFiles(self):
+        changes = list(self.subject.changes(self.snapshot))
+        self.assertEqual(sorted([('A', self.__encryptedPath('f1')), ('A', self.__encryptedPath('d1/f2')),
+                                 ('A', self.__encryptedPath('d1-x/f3'))]), sorted(changes))
+        self.assertTrue(os.path.isfile(self.snapshot))
+
+    def testNoChanges(self):
+        list(self.subject.changes(self.snapshot))
+        self.assertEqual([], list(self.subject.changes(self.snapshot)))
+
+    def testUnchangedNamesAreNotEncryptedAgain(self):
+        list(self.subject.changes(self.snapshot))
+        encryptions = list()
+        encryptFileName = self.subject.encryption.encryptFileName
+        def countingEncryptFileName(*args):
+            encryptions.append(args)
+            return encryptFileName(*args)
+        self.subject.encryption.encryptFileName = countingEncryptFileName
+
+        list(self.subject.changes(self.snapshot))
+
+        self.assertEqual([], encryptions)
+
+    def testAddedChangedAndDeletedFiles(self):
+        list(self.subject.changes(self.snapshot))
+        f2Path = self.__encryptedPath('d1/f2')
+        os.remove(self.f2)
+        with open(self.f3, 'ab') as f:
+            f.write(b'changed')
+        self.__createFile(self.d1, 'f4')
+
+        changes = list(self.subject.changes(self.snapshot))
+
+        self.assertEqual(sorted([('D', f2Path), ('M', self.__encryptedPath('d1-x/f3')),
+                                 ('A', self.__encryptedPath('d1/f4'))]), sorted(changes))
+
+    def testRenamedDirectory(self):
+        list(self.subject.changes(self.snapshot))
+        f2Path = self.__encryptedPath('d1/f2')
+        os.rename(self.d1, os.path.join(self.rootDir, 'd2'))
+
+        changes = list(self.subject.changes(self.snapshot))
+
+        self.assertEqual(sorted([('D', f2Path), ('A', self.__encryptedPath('d2/f2'))]), sorted(changes))
+
+    def testFileReplacedByDirectory(self):
+        list(self.subject.changes(self.snapshot))
+        f1Path = self.__encryptedPath('f1')
+        os.remove(self.f1)
+        os.mkdir(self.f1)
+        self.__createFile(self.f1, 'f5')
+
+        changes = list(self.subject.changes(self.snapshot))
+
+        self.assertEqual(sorted([('D', f1Path), ('A', self.__encryptedPath('f1/f5'))]), sorted(changes))
+
+    def testSnapshotIsKeptIfChangesAreNotConsumed(self):
+        list(self.subject.changes(self.snapshot))
+        with open(self.snapshot) as f:
+            snapshot = f.read()
+        self.__createFile(self.d1, 'f4')
+
+        next(self.subject.changes(self.snapshot))
+
+        with open(self.snapshot) as f:
+            self.assertEqual(snapshot, f.read())
+
+    def __encryptedPath(self, relativePath):
+        return self.encryption.encryptPath(self.rootDir, relativePath)
+
+    @staticmethod
+    def __createFile(directory, name):
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(10))
+        return path
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import io, os, shutil, tarfile, tempfile, types, unittest
+from unittest import mock
+from encviewfuse.fuse.EncryptedExport import EncryptedExport
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+
+
+class _SaltProviderMock(object):
+    # defined on module level, so the worker processes can unpickle it
+    def getSaltFor(self, absoluteFilePath):
+        return '42'
+
+
+class TestEncryptedExport(unittest.TestCase):
+
+    def setUp(self):
+        self.rootDir = tempfile.mkdtemp()
+        self.targetDir = tempfile.mkdtemp()
+        # RootDir
+        # - f1
+        # - d1
+        #   - f2 (larger than one chunk)
+        #   - fl1 (--> f1)
+        # - dl1 (--> d1)
+        self.f1 = self.__createFile(self.rootDir, 'f1', 7)
+        self.d1 = os.path.join(self.rootDir, 'd1')
+        os.mkdir(self.d1)
+        self.f2 = self.__createFile(self.d1, 'f2', EncryptedExport.CHUNK_SIZE + 100)
+        os.symlink(self.f1, os.path.join(self.d1, 'fl1'))
+        os.symlink(self.d1, os.path.join(self.rootDir, 'dl1'))
+        saltProvider = _SaltProviderMock()
+        self.encryption = Encryption('abc', saltProvider, saltProvider)
+        self.subject = EncryptedExport(self.rootDir, 'abc', saltProvider, saltProvider, workers=2)
+
+    def tearDown(self):
+        shutil.rmtree(self.rootDir)
+        shutil.rmtree(self.targetDir)
+
+    def testExportToDirectory(self):
+        statistics = self.subject.exportToDirectory(self.targetDir)
+
+        self.assertEqual({'exported': 5, 'skipped': 0, 'changed': []}, statistics)
+        for relativePath in ('f1', 'd1/f2', 'd1/fl1', 'dl1/f2', 'dl1/fl1'):
+            with open(os.path.join(self.targetDir, self.__encryptedPath(relativePath)), 'rb') as f:
+                self.assertEqual(self.__encryptedContent(os.path.join(self.rootDir, relativePath)), f.read())
+
+    def testExportToDirectorySkipsUpToDateFiles(self):
+        self.subject.exportToDirectory(self.targetDir)
+        with open(self.f1, 'ab') as f:
+            f.write(b'changed')
+
+        statistics = self.subject.exportToDirectory(self.targetDir)
+
+        self.assertEqual({'exported': 3, 'skipped': 2, 'changed': []}, statistics)
+        with open(os.path.join(self.targetDir, self.__encryptedPath('f1')), 'rb') as f:
+            self.assertEqual(self.__encryptedContent(self.f1), f.read())
+
+    def testExportSelectedPaths(self):
+        statistics = self.subject.exportToDirectory(self.targetDir, ['d1/f2'])
+
+        self.assertEqual({'exported': 1, 'skipped': 0, 'changed': []}, statistics)
+        self.assertEqual([self.__encryptedPath('d1')], os.listdir(self.targetDir))
+        self.assertTrue(os.path.isfile(os.path.join(self.targetDir, self.__encryptedPath('d1/f2'))))
+
+    def testExportToDirectoryLeavesOutChangedFile(self):
+        with self.__changedDuringExport(self.f1):
+            statistics = self.subject.exportToDirectory(self.targetDir)
+
+        self.assertEqual({'exported': 4, 'skipped': 0, 'changed': [self.f1]}, statistics)
+        self.assertNotIn(self.__encryptedPath('f1'), os.listdir(self.targetDir))
+        self.assertTrue(os.path.isfile(os.path.join(self.targetDir, self.__encryptedPath('d1/fl1'))))
+
+    def testErrorExportPathOutsideOfSource(self):
+        with self.assertRaises(ValueError):
+            self.subject.exportToDirectory(self.targetDir, ['../outside'])
+
+    def testExportToTar(self):
+        stream = io.BytesIO()
+        self.subject.exportToTar(stream)
+
+        stream.seek(0)
+        with tarfile.open(fileobj=stream) as tar:
+            names = tar.getnames()
+            self.assertEqual(sorted(self.__encryptedPath(p) for p in ('f1', 'd1', 'd1/f2', 'd1/fl1', 'dl1', 'dl1/f2', 'dl1/fl1')), sorted(names))
+            self.assertTrue(tar.getmember(self.__encryptedPath('d1')).isdir())
+            for relativePath in ('f1', 'd1/f2', 'dl1/fl1'):
+                content = tar.extractfile(self.__encryptedPath(relativePath)).read()
+                self.assertEqual(self.__encryptedContent(os.path.join(self.rootDir, relativePath)), content)
+
+    def testExportToTarLeavesOutChangedFile(self):
+        stream = io.BytesIO()
+        with self.__changedDuringExport(self.f2):
+            statistics = self.subject.exportToTar(stream)
+
+        self.assertEqual({'exported': 4, 'changed': [self.f2], 'incomplete': []}, statistics)
+        stream.seek(0)
+        with tarfile.open(fileobj=stream) as tar:
+            self.assertNotIn(self.__encryptedPath('d1/f2'), tar.getnames())
+            content = tar.extractfile(self.__encryptedPath('dl1/fl1')).read()
+            self.assertEqual(self.__encryptedContent(self.f1), content)
+
+    def testChunkReaderFillsChangedFileWithZeros(self):
+        chunks = EncryptedExport._ChunkReader(iter([b'abc', None, b'ghi']))
+        self.assertTrue(chunks.start())
+        self.assertEqual(b'ab', chunks.read(2))
+        self.assertEqual(b'c\0\0\0', chunks.read(4))
+        chunks.skip()
+        self.assertTrue(chunks.changed)
+
+    def __changedDuringExport(self, path):
+        '''
+        Lets the walk report another size for the given file than it has
+        when it is encrypted.
+        '''
+        walk = self.subject.walker.walk
+        def changedWalk(paths):
+            for components, sourcePath, st in walk(paths):
+                if sourcePath == path:
+                    st = types.SimpleNamespace(st_mode=st.st_mode, st_size=st.st_size + 1, st_mtime=st.st_mtime,
+                                               st_mtime_ns=st.st_mtime_ns)
+                yield components, sourcePath, st
+        return mock.patch.object(self.subject.walker, 'walk', changedWalk)
+
+    def __encryptedPath(self, relativePath):
+        return self.encryption.encryptPath(self.rootDir, relativePath)
+
+    def __encryptedContent(self, path):
+        virtualFile = VirtualFile(path)
+        try:
+            return self.encryption.encryptedContent(virtualFile, 0, self.encryption.encryptedFileSize(virtualFile.size()))
+        finally:
+            virtualFile.closeFileHandle()
+
+    @staticmethod
+    def __createFile(directory, name, size):
+        path = os.path.join(directory, name)
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        return path
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,11 @@
-import os, shutil, tempfile, unittest
-from encviewfuse.fuse.EncryptedFuseFs import EncViewFuse
+import hashlib, os, shutil, tempfile, threading, time, unittest
+from encviewfuse.fuse.EncryptedFuseFs import EncViewFuse, _effectiveFilesystemOptions, _fuseOptions
 from deterministic_encryption_utils.encryption.Encryption import Encryption
 from collections import namedtuple
 import stat
 from fuse import FuseOSError
 from deterministic_encryption_utils.encryption.VirtualFile import VirtualFile
+from unittest import mock
 
 
 class TestEncryptedFuseFs(unittest.TestCase):
@@ -13,6 +14,10 @@ class TestEncryptedFuseFs(unittest.TestCase):
         def getSaltFor(self, absoluteFilePath):
             return '42'
 
+    class _NameSaltProviderMock(object):
+        def getSaltFor(self, absoluteFilePath):
+            return os.path.basename(absoluteFilePath)
+
     def setUp(self):
         self.rootDir = tempfile.mkdtemp()
         self.dirStructure = TestEncryptedFuseFs.__setupRootDir(self.rootDir)
@@ -55,7 +60,7 @@ class TestEncryptedFuseFs(unittest.TestCase):
 
 
     def testReadDirRoot(self):
-        result = self.subject.readdir('/', None)
+        result = list(self.subject.readdir('/', None))
          
         self.assertIn('.', result)
         result.remove('.')
@@ -171,6 +176,56 @@ class TestEncryptedFuseFs(unittest.TestCase):
         with self.assertRaises(FuseOSError) as _:
             self.subject.open(encryptedFilePath, os.O_APPEND)
     
+    def testHardLinksShareInodeNumber(self):
+        hardLink = os.path.join(self.rootDir, 'hardlink')
+        os.link(self.dirStructure.f1, hardLink)
+        
+        inode = self.subject.getattr(self.__getEncryptedFilePath(self.dirStructure.f1))['st_ino']
+        self.assertEqual(os.stat(self.dirStructure.f1).st_ino, inode)
+        self.assertEqual(inode, self.subject.getattr(self.__getEncryptedFilePath(hardLink))['st_ino'])
+        self.assertNotEqual(inode, self.subject.getattr(self.__getEncryptedFilePath(self.dirStructure.f2))['st_ino'])
+        
+    def testCallRunsInCallingThreadByDefault(self):
+        self.subject('getattr', self.__getEncryptedFilePath(self.dirStructure.f1))
+        self.assertEqual(0, self.subject.scheduler.statistics()['metadata']['scheduled'])
+
+    def testCallDispatchesToScheduler(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, metadataWorkers=2, dataWorkers=2)
+        attributes = subject('getattr', self.__getEncryptedFilePath(self.dirStructure.f1))
+        self.assertEqual(self.encryption.encryptedFileSize(7), attributes['st_size'])
+        self.assertEqual(1, subject.scheduler.statistics()['metadata']['scheduled'])
+        with self.assertRaises(FuseOSError):
+            subject('getattr', '/missing')
+        subject('destroy', '/')
+        self.assertTrue(subject.scheduler.metadataPool.stopped)
+        
+    def testCallComputesReadDirEntriesInScheduler(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, metadataWorkers=2)
+        for i in range(0, EncViewFuse.READDIR_BATCH_SIZE):
+            open(os.path.join(self.rootDir, 'file{0}'.format(i)), 'w').close()
+        threads = set()
+        encryptFileName = subject.encryption.encryptFileName
+        def recordingEncryptFileName(*args):
+            threads.add(threading.current_thread().name)
+            return encryptFileName(*args)
+        subject.encryption.encryptFileName = recordingEncryptFileName
+        
+        result = list(subject('readdir', '/', None))
+        subject('destroy', '/')
+        
+        self.assertEqual(list(self.subject.readdir('/', None)), result)
+        self.assertEqual(3, subject.scheduler.statistics()['metadata']['scheduled'])
+        self.assertTrue(all(name.startswith('encviewfuse-metadata') for name in threads), threads)
+        
+    def testEffectiveFilesystemOptions(self):
+        options = _effectiveFilesystemOptions({'attrTimeout': 30})
+        self.assertEqual(30, options['attrTimeout'])
+        self.assertEqual(EncViewFuse.DEFAULT_BLOCK_CACHE_SIZE, options['blockCacheSize'])
+        self.assertNotIn('root', options)
+        self.assertNotIn('secret', options)
+        
     def testReadFile(self):
         self.__testReadFile(self.dirStructure.f2)
     
@@ -182,6 +237,520 @@ class TestEncryptedFuseFs(unittest.TestCase):
         self.__testReadFile(filePath)
         
     
+    def testPathCacheHit(self):
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+        self.subject.access(filePathEncrypted, os.R_OK)
+        self.subject.access(filePathEncrypted, os.R_OK)
+        
+        statistics = self.subject.pathCache.statistics()
+        self.assertEqual(1, statistics['hits'])
+        self.assertEqual(1, statistics['misses'])
+        
+    def testPathCacheInvalidatedOnDirectoryChange(self):
+        filePath = self.dirStructure.f2
+        filePathEncrypted = self.__getEncryptedFilePath(filePath)
+        self.subject.access(filePathEncrypted, os.R_OK)
+        
+        os.rename(filePath, filePath + '.moved')
+        with self.assertRaises(FuseOSError) as _:
+            self.subject.access(filePathEncrypted, os.R_OK)
+        self.assertEqual(0, self.subject.pathCache.statistics()['hits'])
+        
+    def testPathCacheDisabled(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, pathCacheSize=0)
+        filePath = self.dirStructure.f2
+        filePathEncrypted = self.__getEncryptedFilePath(filePath)
+        
+        self.__assertEqualsStats(os.lstat(filePath), subject.getattr(filePathEncrypted))
+        self.assertEqual(0, len(subject.pathCache))
+        
+    def testPathTrieDecryptsKnownDirectoriesOnce(self):
+        secondFile = TestEncryptedFuseFs.__createFileWithRandomContent(self.dirStructure.d1, 3)
+        decryptedPaths = self.__countCalls(self.subject.encryption, 'decryptPath')
+        
+        self.subject.getattr(self.__getEncryptedFilePath(self.dirStructure.f2))
+        self.subject.getattr(self.__getEncryptedFilePath(secondFile))
+        
+        self.assertEqual(3, len(decryptedPaths))
+        self.assertEqual(1, decryptedPaths.count((self.__getEncryptedFileName(self.dirStructure.d1),)))
+        
+    def testPathTrieInvalidatedOnDirectoryRename(self):
+        filePath = self.dirStructure.f2
+        filePathEncrypted = self.__getEncryptedFilePath(filePath)
+        self.subject.access(filePathEncrypted, os.R_OK)
+        
+        os.rename(self.dirStructure.d1, self.dirStructure.d1 + '.moved')
+        os.mkdir(self.dirStructure.d1)
+        with self.assertRaises(FuseOSError) as _:
+            self.subject.access(filePathEncrypted, os.R_OK)
+        
+    def testReadDirUsesEncryptedNameCache(self):
+        encryptedNames = self.__countCalls(self.subject.encryption, 'encryptFileName')
+        dirPathEncrypted = self.__getEncryptedFilePath(self.dirStructure.d1)
+        
+        firstResult = list(self.subject.readdir(dirPathEncrypted, None))
+        secondResult = list(self.subject.readdir(dirPathEncrypted, None))
+        
+        self.assertEqual(firstResult, secondResult)
+        self.assertEqual(1, len(encryptedNames))
+        
+    def testReadDirEncryptsModifiedEntryAgain(self):
+        encryptedNames = self.__countCalls(self.subject.encryption, 'encryptFileName')
+        dirPathEncrypted = self.__getEncryptedFilePath(self.dirStructure.d1)
+        
+        list(self.subject.readdir(dirPathEncrypted, None))
+        os.utime(self.dirStructure.f2, ns=(0, 0))
+        list(self.subject.readdir(dirPathEncrypted, None))
+        
+        self.assertEqual(2, len(encryptedNames))
+        
+    def testReadDirFillsDecryptedNameCache(self):
+        list(self.subject.readdir('/', None))
+        decryptedPaths = self.__countCalls(self.subject.encryption, 'decryptPath')
+        
+        self.subject.getattr(self.__getEncryptedFilePath(self.dirStructure.f1))
+        
+        self.assertEqual(0, len(decryptedPaths))
+        
+    def testGetAttrUsesAttributeCache(self):
+        filePath = self.dirStructure.f2
+        filePathEncrypted = self.__getEncryptedFilePath(filePath)
+        expected = self.subject.getattr(filePathEncrypted)
+        
+        os.remove(filePath)
+        
+        self.assertEqual(expected, self.subject.getattr(filePathEncrypted))
+        
+    def testGetAttrAttributeCacheExpires(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, attrTimeout=0)
+        filePath = self.dirStructure.f2
+        filePathEncrypted = self.__getEncryptedFilePath(filePath)
+        subject.getattr(filePathEncrypted)
+        
+        os.remove(filePath)
+        
+        with self.assertRaises(FuseOSError) as _:
+            subject.getattr(filePathEncrypted)
+            
+    def testGetAttrSingleStat(self):
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+        self.subject.access(filePathEncrypted, os.R_OK)
+        with mock.patch('os.stat', wraps=os.stat) as statMock, mock.patch('os.lstat', wraps=os.lstat) as lstatMock:
+            self.subject.getattr(filePathEncrypted)
+        self.assertEqual(1, lstatMock.call_count)
+        self.assertEqual(1, statMock.call_count) # validation of the path cache
+        
+    def testGetAttrNotExisting(self):
+        filePath = self.dirStructure.f2
+        filePathEncrypted = self.__getEncryptedFilePath(filePath)
+        os.remove(filePath)
+        with self.assertRaises(FuseOSError) as _:
+            self.subject.getattr(filePathEncrypted)
+        
+    def testReadDirPlus(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, readdirPlus=True)
+        dirPathEncrypted = self.__getEncryptedFilePath(self.dirStructure.d2)
+        
+        result = list(subject.readdir(dirPathEncrypted, None))
+        
+        self.assertEqual(['.', '..'], result[:2])
+        self.assertEqual(1, len(result[2:]))
+        entryName, attributes, offset = result[2]
+        self.assertEqual(self.__getEncryptedFileName(self.dirStructure.fl1), entryName)
+        self.assertEqual(0, offset)
+        self.__assertEqualsStats(os.lstat(self.dirStructure.f2), attributes)
+        
+    def testReadDirPlusFillsAttributeCache(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, readdirPlus=True)
+        dirPathEncrypted = self.__getEncryptedFilePath(self.dirStructure.d1)
+        list(subject.readdir(dirPathEncrypted, None))
+        decryptedPaths = self.__countCalls(subject.encryption, 'decryptPath')
+        
+        attributes = subject.getattr(self.__getEncryptedFilePath(self.dirStructure.f2))
+        
+        self.__assertEqualsStats(os.lstat(self.dirStructure.f2), attributes)
+        self.assertEqual(0, len(decryptedPaths))
+        
+    def testReadUsesBlockCache(self):
+        filePath = TestEncryptedFuseFs.__createFileWithRandomContent(self.rootDir, 3 * EncViewFuse.BLOCK_SIZE + 5)
+        encryptedFilePath = self.__getEncryptedFilePath(filePath)
+        fd = self.subject.open(encryptedFilePath, os.O_RDONLY)
+        try:
+            first = self.subject.read(None, 4096, EncViewFuse.BLOCK_SIZE - 100, fd)
+            second = self.subject.read(None, 4096, EncViewFuse.BLOCK_SIZE - 100, fd)
+        finally:
+            self.subject.release(None, fd)
+        
+        self.assertEqual(first, second)
+        statistics = self.subject.blockCache.statistics()
+        self.assertEqual(2, statistics['misses'])
+        self.assertEqual(2, statistics['hits'])
+        self.assertEqual(0.5, statistics['hitRatio'])
+        
+    def testReadWithBlockCacheMatchesEncryptedContent(self):
+        fileSize = 3 * EncViewFuse.BLOCK_SIZE + 5
+        encryptedFileSize = self.encryption.encryptedFileSize(fileSize)
+        filePath = TestEncryptedFuseFs.__createFileWithRandomContent(self.rootDir, fileSize)
+        encryptedFilePath = self.__getEncryptedFilePath(filePath)
+        virtualFile = VirtualFile(filePath)
+        fd = self.subject.open(encryptedFilePath, os.O_RDONLY)
+        try:
+            for offset, size in ((0, 4096), (0, EncViewFuse.BLOCK_SIZE), (7, 3 * EncViewFuse.BLOCK_SIZE),
+                                 (EncViewFuse.BLOCK_SIZE - 16, 32), (encryptedFileSize - 20, 4096)):
+                self.assertEqual(self.encryption.encryptedContent(virtualFile, offset, size), self.subject.read(None, size, offset, fd))
+            self.assertEqual(b'', self.subject.read(None, 4096, encryptedFileSize, fd))
+        finally:
+            self.subject.release(None, fd)
+            virtualFile.closeFileHandle()
+        
+    def testReadHardLinksWithNameDependentSalt(self):
+        self.__assertHardLinksMatchEncryptedContent(blockCacheSize=0, readAhead=0)
+        
+    def testReadHardLinksWithBlockCacheAndNameDependentSalt(self):
+        self.__assertHardLinksMatchEncryptedContent()
+        
+    def testSequentialReadUsesReadAhead(self):
+        fileSize = 4 * EncViewFuse.BLOCK_SIZE + 5
+        filePath = TestEncryptedFuseFs.__createFileWithRandomContent(self.rootDir, fileSize)
+        encryptedFilePath = self.__getEncryptedFilePath(filePath)
+        virtualFile = VirtualFile(filePath)
+        expected = self.encryption.encryptedContent(virtualFile, 0, self.encryption.encryptedFileSize(fileSize))
+        virtualFile.closeFileHandle()
+        fd = self.subject.open(encryptedFilePath, os.O_RDONLY)
+        try:
+            take = self.subject.readAhead.take
+            taken = list()
+            self.subject.readAhead.take = lambda *args: taken.append(take(*args)) or taken[-1]
+            content = list()
+            for offset in range(0, len(expected), EncViewFuse.BLOCK_SIZE):
+                content.append(self.subject.read(None, EncViewFuse.BLOCK_SIZE, offset, fd))
+        finally:
+            self.subject.release(None, fd)
+            self.subject.destroy(None)
+        
+        self.assertEqual(expected, b''.join(content))
+        self.assertEqual(4, len([block for block in taken if block is not None]))
+        
+    def testReadDirUsesMetadataIndexOfPreviousMount(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        indexDir = tempfile.mkdtemp()
+        try:
+            indexFile = os.path.join(indexDir, 'index.db')
+            subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, indexFile=indexFile)
+            expected = list(subject.readdir('/', None))
+            subject.destroy(None)
+            
+            subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, indexFile=indexFile)
+            encryptedNames = self.__countCalls(subject.encryption, 'encryptFileName')
+            self.assertEqual(expected, list(subject.readdir('/', None)))
+            self.assertEqual(0, len(encryptedNames))
+            subject.destroy(None)
+            
+            subject = EncViewFuse(self.rootDir, 'other secret', saltProvider, saltProvider, indexFile=indexFile)
+            encryptedNames = self.__countCalls(subject.encryption, 'encryptFileName')
+            list(subject.readdir('/', None))
+            self.assertEqual(len(os.listdir(self.rootDir)), len(encryptedNames))
+            subject.destroy(None)
+        finally:
+            shutil.rmtree(indexDir)
+        
+    
+    def testWarmUpFillsCaches(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, warmUp=True, warmUpRate=0)
+        subject.init('/')
+        subject.warmUpCrawler.join()
+        self.assertTrue(subject.warmUpCrawler.isFinished())
+        encryptions = self.__countCalls(subject.encryption, 'encryptFileName')
+        decryptions = self.__countCalls(subject.encryption, 'decryptPath')
+        
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+        self.__assertEqualsStats(os.stat(self.dirStructure.f2), subject.getattr(filePathEncrypted))
+        list(subject.readdir(os.path.dirname(filePathEncrypted), None))
+        subject.destroy('/')
+        
+        self.assertEqual(0, len(encryptions))
+        self.assertEqual(0, len(decryptions))
+        
+    def testWarmUpKeepsOwnCaches(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, warmUp=True, warmUpRate=0, attrTimeout=0.01)
+        subject.init('/')
+        subject.warmUpCrawler.join()
+        subject.destroy('/')
+        
+        # the caches of requests are left alone
+        self.assertEqual(0, len(subject.attributeCache))
+        self.assertEqual(0, len(subject.pathCache))
+        self.assertEqual(0, len(subject.encryptedNameCache))
+        time.sleep(0.02)
+        decryptions = self.__countCalls(subject.encryption, 'decryptPath')
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+        self.__assertEqualsStats(os.stat(self.dirStructure.f2), subject.getattr(filePathEncrypted))
+        self.assertEqual(0, len(decryptions))
+        
+        # entries are checked against the source like the path cache
+        os.rename(self.dirStructure.f2, self.dirStructure.f2 + '.moved')
+        time.sleep(0.02)
+        with self.assertRaises(FuseOSError):
+            subject.getattr(filePathEncrypted)
+        
+    def testWarmUpStopsWhenCacheIsFull(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, warmUp=True, warmUpRate=0, warmUpCacheSize=1)
+        subject.init('/')
+        subject.warmUpCrawler.join()
+        subject.destroy('/')
+        
+        self.assertEqual(1, len(subject.warmUpPaths))
+        self.assertEqual(1, subject.warmUpCrawler.visited)
+        
+    def testWatchInvalidatesChangedFile(self):
+        with mock.patch('encviewfuse.fuse.EncryptedFuseFs.KernelNotifier') as notifierClass:
+            subject = self.__createWatchingSubject()
+            try:
+                filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+                subject.getattr(filePathEncrypted)
+                with open(self.dirStructure.f2, 'ab') as f:
+                    f.write(os.urandom(32))
+                
+                self.__waitFor(lambda: filePathEncrypted not in subject.attributeCache)
+                self.__waitFor(lambda: mock.call(filePathEncrypted) in notifierClass.return_value.invalidate.call_args_list)
+                self.__assertEqualsStats(os.stat(self.dirStructure.f2), subject.getattr(filePathEncrypted))
+            finally:
+                subject.destroy('/')
+        
+    def testWatchInvalidatesDeletedFile(self):
+        with mock.patch('encviewfuse.fuse.EncryptedFuseFs.KernelNotifier') as notifierClass:
+            subject = self.__createWatchingSubject()
+            try:
+                filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+                list(subject.readdir(os.path.dirname(filePathEncrypted), None))
+                subject.getattr(filePathEncrypted)
+                os.remove(self.dirStructure.f2)
+                
+                self.__waitFor(lambda: mock.call(filePathEncrypted) in notifierClass.return_value.invalidate.call_args_list)
+                with self.assertRaises(FuseOSError):
+                    subject.getattr(filePathEncrypted)
+            finally:
+                subject.destroy('/')
+        
+    def testWatchDropsDigestsOfRenamedFile(self):
+        with mock.patch('encviewfuse.fuse.EncryptedFuseFs.KernelNotifier'):
+            subject = self.__createWatchingSubject(contentDigests=True)
+            try:
+                filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+                fd = subject.open(filePathEncrypted, os.O_RDONLY)
+                subject.read(filePathEncrypted, 4096, 0, fd)
+                subject.release(filePathEncrypted, fd)
+                self.assertEqual(1, len(subject.contentDigests.cache))
+                os.rename(self.dirStructure.f2, self.dirStructure.f2 + '.renamed')
+                
+                self.__waitFor(lambda: len(subject.contentDigests.cache) == 0)
+            finally:
+                subject.destroy('/')
+        
+    def testWatchShowsCreatedFile(self):
+        newFilePath = os.path.join(self.rootDir, 'new')
+        open(newFilePath, 'w').close()
+        newFilePathEncrypted = self.__getEncryptedFilePath(newFilePath)
+        os.remove(newFilePath)
+        with mock.patch('encviewfuse.fuse.EncryptedFuseFs.KernelNotifier') as notifierClass:
+            subject = self.__createWatchingSubject()
+            try:
+                with self.assertRaises(FuseOSError):
+                    subject.getattr(newFilePathEncrypted)
+                open(newFilePath, 'w').close()
+                
+                self.__waitFor(lambda: newFilePathEncrypted not in subject.negativeCache)
+                self.__assertEqualsStats(os.stat(newFilePath), subject.getattr(newFilePathEncrypted))
+                self.assertIn(mock.call('/'), notifierClass.return_value.invalidate.call_args_list)
+                # fusepy cannot drop negative entries of the kernel, so they expire as without watching
+                notifierClass.isSupported.return_value = True
+                fuseOptions = _fuseOptions(subject, 'fusepy', {})
+                self.assertEqual(subject.negativeTimeout, fuseOptions['negative_timeout'])
+                self.assertEqual(subject.attrTimeout, fuseOptions['entry_timeout'])
+                self.assertEqual(subject.watchTimeout, fuseOptions['attr_timeout'])
+            finally:
+                subject.destroy('/')
+        
+    def testWatchedPyfuse3MountCachesEntriesLonger(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, watch=True, watchTimeout=30.0)
+        try:
+            fuseOptions = _fuseOptions(subject, 'pyfuse3', {'entry_timeout': 5})
+            self.assertEqual(5, fuseOptions['entry_timeout'])
+            self.assertEqual(30.0, fuseOptions['attr_timeout'])
+            self.assertEqual(30.0, fuseOptions['negative_timeout'])
+            self.assertTrue(fuseOptions['kernel_cache'])
+        finally:
+            subject.sourceWatcher.stop()
+        
+    def testWatchKeepsAttributesLonger(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, watch=True, watchTimeout=30.0)
+        try:
+            self.assertTrue(subject.watched)
+            self.assertEqual(30.0, subject.attributeCache.ttl)
+        finally:
+            subject.sourceWatcher.stop()
+        
+    def testParallelReadDirKeepsOrder(self):
+        for _ in range(0, 50):
+            TestEncryptedFuseFs.__createFileWithRandomContent(self.dirStructure.d1, 1)
+        dirPathEncrypted = self.__getEncryptedFilePath(self.dirStructure.d1)
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, readdirThreshold=8, readdirWorkers=3)
+        
+        result = list(subject.readdir(dirPathEncrypted, None))
+        
+        self.assertIsNotNone(subject.readdirExecutor)
+        self.assertEqual(list(self.subject.readdir(dirPathEncrypted, None)), result)
+        subject.destroy('/')
+        
+    def testSmallReadDirStaysSerial(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, readdirThreshold=8, readdirWorkers=3)
+        
+        list(subject.readdir('/', None))
+        
+        self.assertIsNone(subject.readdirExecutor)
+        
+    def testSaltsOfUnchangedFilesAreDerivedOnce(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        salts = self.__countCalls(saltProvider, 'getSaltFor')
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, blockCacheSize=0, readAhead=0)
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f1)
+        
+        for _ in range(0, 2):
+            fd = subject.open(filePathEncrypted, os.O_RDONLY)
+            subject.read(filePathEncrypted, 4096, 0, fd)
+            subject.release(filePathEncrypted, fd)
+        
+        self.assertEqual(1, len(salts))
+        self.assertEqual(1, subject.fileSaltProvider.statistics()['avoided'])
+        
+    def testGetAttrRejectsMalformedNameWithoutDecryption(self):
+        decryptions = self.__countCalls(self.subject.encryption, 'decryptPath')
+        for name in ('.DS_Store', 'desktop.ini', '.git', 'a' * 32 + '.lock', 'a' * 28):
+            with self.assertRaises(FuseOSError):
+                self.subject.getattr('/' + name)
+        self.assertEqual(0, len(decryptions))
+        
+    def testGetAttrUsesNegativeCache(self):
+        missingFilePath = os.path.join(self.rootDir, 'missing')
+        open(missingFilePath, 'w').close()
+        missingFilePathEncrypted = self.__getEncryptedFilePath(missingFilePath)
+        os.remove(missingFilePath)
+        
+        for _ in range(0, 2):
+            with self.assertRaises(FuseOSError):
+                self.subject.getattr(missingFilePathEncrypted)
+        
+        self.assertEqual(1, self.subject.negativeCache.statistics()['hits'])
+        
+    def testReadDirDropsNegativeEntry(self):
+        newFilePath = os.path.join(self.rootDir, 'new')
+        open(newFilePath, 'w').close()
+        newFilePathEncrypted = self.__getEncryptedFilePath(newFilePath)
+        os.remove(newFilePath)
+        with self.assertRaises(FuseOSError):
+            self.subject.getattr(newFilePathEncrypted)
+        
+        open(newFilePath, 'w').close()
+        list(self.subject.readdir('/', None))
+        
+        self.__assertEqualsStats(os.stat(newFilePath), self.subject.getattr(newFilePathEncrypted))
+        
+    def testDigestAfterFullRead(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, contentDigests=True)
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+        self.assertEqual([], subject.listxattr(filePathEncrypted))
+        
+        fd = subject.open(filePathEncrypted, os.O_RDONLY)
+        content = subject.read(filePathEncrypted, 4096, 0, fd)
+        subject.release(filePathEncrypted, fd)
+        
+        self.assertEqual(hashlib.sha256(content).hexdigest().encode(), subject.getxattr(filePathEncrypted, EncViewFuse.DIGEST_ATTRIBUTE))
+        self.assertEqual([EncViewFuse.DIGEST_ATTRIBUTE], subject.listxattr(filePathEncrypted))
+        subject.destroy('/')
+        
+    def testDigestComputedInBackground(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, contentDigests=True)
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f1)
+        with self.assertRaises(FuseOSError):
+            subject.getxattr(filePathEncrypted, EncViewFuse.DIGEST_ATTRIBUTE)
+        subject.contentDigests.shutdown()
+        
+        f = VirtualFile(self.dirStructure.f1)
+        expectedContent = self.encryption.encryptedContent(f, 0, 4096)
+        f.closeFileHandle()
+        self.assertEqual(hashlib.sha256(expectedContent).hexdigest().encode(), subject.getxattr(filePathEncrypted, EncViewFuse.DIGEST_ATTRIBUTE))
+        
+    def testDigestsOfHardLinksWithNameDependentSalt(self):
+        fileSaltProvider = TestEncryptedFuseFs._NameSaltProviderMock()
+        filenameSaltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', fileSaltProvider, filenameSaltProvider, contentDigests=True)
+        encryption = Encryption('abc', fileSaltProvider, filenameSaltProvider)
+        linkPath = self.dirStructure.f2 + '.link'
+        os.link(self.dirStructure.f2, linkPath)
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f2)
+        linkPathEncrypted = self.__getEncryptedFilePath(linkPath)
+        
+        fd = subject.open(filePathEncrypted, os.O_RDONLY)
+        content = subject.read(filePathEncrypted, 4096, 0, fd)
+        subject.release(filePathEncrypted, fd)
+        self.assertEqual(hashlib.sha256(content).hexdigest().encode(), subject.getxattr(filePathEncrypted, EncViewFuse.DIGEST_ATTRIBUTE))
+        self.assertEqual([], subject.listxattr(linkPathEncrypted))
+        with self.assertRaises(FuseOSError):
+            subject.getxattr(linkPathEncrypted, EncViewFuse.DIGEST_ATTRIBUTE)
+        subject.contentDigests.shutdown()
+        
+        f = VirtualFile(linkPath)
+        linkContent = encryption.encryptedContent(f, 0, 4096)
+        f.closeFileHandle()
+        self.assertNotEqual(content, linkContent)
+        self.assertEqual(hashlib.sha256(linkContent).hexdigest().encode(), subject.getxattr(linkPathEncrypted, EncViewFuse.DIGEST_ATTRIBUTE))
+        
+    def testNoDigestsByDefault(self):
+        filePathEncrypted = self.__getEncryptedFilePath(self.dirStructure.f1)
+        with self.assertRaises(FuseOSError):
+            self.subject.getxattr(filePathEncrypted, EncViewFuse.DIGEST_ATTRIBUTE)
+        self.assertEqual([], self.subject.listxattr(filePathEncrypted))
+        
+    def testNoDigestOfDirectory(self):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, contentDigests=True)
+        with self.assertRaises(FuseOSError):
+            subject.getxattr(self.__getEncryptedFilePath(self.dirStructure.d1), EncViewFuse.DIGEST_ATTRIBUTE)
+        
+    def __createWatchingSubject(self, **options):
+        saltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider, watch=True, **options)
+        subject.init('/')
+        return subject
+    
+    def __waitFor(self, condition):
+        deadline = time.monotonic() + 5
+        while not condition():
+            self.assertLess(time.monotonic(), deadline, 'The condition was not met in time.')
+            time.sleep(0.01)
+    
+    def __countCalls(self, obj, methodName):
+        calls = list()
+        method = getattr(obj, methodName)
+        def countingMethod(*args):
+            calls.append(args)
+            return method(*args)
+        setattr(obj, methodName, countingMethod)
+        return calls
+    
     def __getEncryptedFileName(self, absPath):
         return self.encryption.encryptFileName(absPath, os.path.basename(absPath))
     
@@ -189,11 +758,35 @@ class TestEncryptedFuseFs(unittest.TestCase):
         relativePath = absPath[len(self.rootDir):]
         return self.encryption.encryptPath(self.rootDir, relativePath)
 
+    def __assertHardLinksMatchEncryptedContent(self, **options):
+        fileSaltProvider = TestEncryptedFuseFs._NameSaltProviderMock()
+        filenameSaltProvider = TestEncryptedFuseFs._SaltProviderMock()
+        subject = EncViewFuse(self.rootDir, 'abc', fileSaltProvider, filenameSaltProvider, **options)
+        encryption = Encryption('abc', fileSaltProvider, filenameSaltProvider)
+        fileSize = 2 * EncViewFuse.BLOCK_SIZE + 5
+        encryptedFileSize = encryption.encryptedFileSize(fileSize)
+        filePath = TestEncryptedFuseFs.__createFileWithRandomContent(self.rootDir, fileSize)
+        linkPath = filePath + '.link'
+        os.link(filePath, linkPath)
+        fds = [subject.open(self.__getEncryptedFilePath(path), os.O_RDONLY) for path in (filePath, linkPath)]
+        try:
+            contents = list()
+            for path, fd in zip((filePath, linkPath), fds):
+                virtualFile = VirtualFile(path)
+                expected = encryption.encryptedContent(virtualFile, 0, encryptedFileSize)
+                virtualFile.closeFileHandle()
+                self.assertEqual(expected, subject.read(None, encryptedFileSize, 0, fd))
+                contents.append(expected)
+            self.assertNotEqual(contents[0], contents[1])
+        finally:
+            for fd in fds:
+                subject.release(None, fd)
+
     def __testReadDir(self, absolutePath):
         dirPath = absolutePath
         dirNameEncrypted = self.__getEncryptedFileName(dirPath)
         
-        result = self.subject.readdir('/{0}'.format(dirNameEncrypted), None)
+        result = list(self.subject.readdir('/{0}'.format(dirNameEncrypted), None))
         
         self.assertIn('.', result)
         result.remove('.')
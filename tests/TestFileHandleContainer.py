@@ -3,6 +3,8 @@ from encviewfuse.fuse._FileHandleContainer import FileHandleContainer
 import tempfile
 import shutil
 import os
+import errno
+import threading
 
 
 class TestFileHandleContainer(unittest.TestCase):
@@ -56,6 +58,132 @@ class TestFileHandleContainer(unittest.TestCase):
             
     def testUnregisterSpecialHandle(self):
         self.subject.unregisterHandle(0)
+        
+    def testRegisterDirectory(self):
+        with self.assertRaises(ValueError) as _:
+            self.subject.registerHandle(self.tmpdir, os.O_RDONLY)
+        self.assertEqual(0, len(self.subject.sources))
+            
+    def testHandlesShareSourceFile(self):
+        fd1 = self.subject.registerHandle(self.files[0], os.O_RDONLY)
+        fd2 = self.subject.registerHandle(self.files[0], os.O_RDONLY)
+        
+        self.assertNotEqual(fd1, fd2)
+        self.assertIs(self.subject.getHandle(fd1), self.subject.getHandle(fd2))
+        
+        sourceFile = self.subject.getHandle(fd1)
+        self.subject.unregisterHandle(fd1)
+        self.assertEqual(b'', sourceFile.read(0, 10))
+        self.subject.unregisterHandle(fd2)
+        with self.assertRaises(OSError) as _:
+            sourceFile.read(0, 10)
+            
+    def testHardLinksShareOnlySourceFile(self):
+        linkPath = self.files[0] + '.link'
+        os.link(self.files[0], linkPath)
+        fd1 = self.subject.registerHandle(self.files[0], os.O_RDONLY)
+        fd2 = self.subject.registerHandle(linkPath, os.O_RDONLY)
+        
+        self.assertIsNot(self.subject.getHandle(fd1), self.subject.getHandle(fd2))
+        self.assertIs(self.subject.getHandle(fd1).sourceFile, self.subject.getHandle(fd2).sourceFile)
+        self.assertEqual(linkPath, self.subject.getHandle(fd2).name())
+        
+        sourceFile = self.subject.getHandle(fd1).sourceFile
+        self.subject.unregisterHandle(fd1)
+        self.assertEqual(b'', self.subject.getHandle(fd2).read(0, 10))
+        self.subject.unregisterHandle(fd2)
+        self.assertEqual(0, len(self.subject.names))
+        with self.assertRaises(OSError) as _:
+            sourceFile.read(0, 10)
+            
+    def testModifiedFileGetsNewSourceFile(self):
+        fd1 = self.subject.registerHandle(self.files[0], os.O_RDONLY)
+        os.utime(self.files[0], ns=(0, 0))
+        fd2 = self.subject.registerHandle(self.files[0], os.O_RDONLY)
+        
+        self.assertIsNot(self.subject.getHandle(fd1), self.subject.getHandle(fd2))
+        self.subject.unregisterHandle(fd1)
+        self.subject.unregisterHandle(fd2)
+        
+    def testDescriptorPoolLimitsOpenFiles(self):
+        subject = FileHandleContainer(maxOpenFiles=2)
+        fds = [subject.registerHandle(f, os.O_RDONLY) for f in self.files[0:4]]
+        
+        self.assertEqual(2, subject.descriptorPool.statistics()['open'])
+        for fd in fds:
+            self.assertEqual(b'', subject.getHandle(fd).read(0, 10))
+        self.assertEqual(2, subject.descriptorPool.statistics()['open'])
+        self.assertEqual(4, subject.descriptorPool.statistics()['reopened'])
+        
+        for fd in fds:
+            subject.unregisterHandle(fd)
+        self.assertEqual(0, subject.descriptorPool.statistics()['open'])
+        
+    def testDescriptorPoolDetectsReplacedFile(self):
+        subject = FileHandleContainer(maxOpenFiles=1)
+        fd1 = subject.registerHandle(self.files[0], os.O_RDONLY)
+        fd2 = subject.registerHandle(self.files[1], os.O_RDONLY)
+        os.remove(self.files[0])
+        with open(self.files[0], 'wb') as f:
+            f.write(b'replaced')
+        
+        with self.assertRaises(OSError) as context:
+            subject.getHandle(fd1).read(0, 10)
+        self.assertEqual(errno.ESTALE, context.exception.errno)
+        subject.unregisterHandle(fd1)
+        subject.unregisterHandle(fd2)
+        
+    def testNoCollisionAfterUnregisteringOutOfOrder(self):
+        fds = [self.subject.registerHandle(f, os.O_RDONLY) for f in self.files[0:3]]
+        self.subject.unregisterHandle(fds[0])
+        self.subject.unregisterHandle(fds[1])
+        
+        fd = self.subject.registerHandle(self.files[3], os.O_RDONLY)
+        
+        self.assertNotIn(fd, fds)
+        self.assertEqual(self.files[2], self.subject.getHandle(fds[2]).name())
+        self.assertEqual(self.files[3], self.subject.getHandle(fd).name())
+        
+    def testConcurrentRegisterAndUnregister(self):
+        fds = list()
+        errors = list()
+        def worker(path):
+            try:
+                for _ in range(0, 50):
+                    fd = self.subject.registerHandle(path, os.O_RDONLY)
+                    fds.append(fd)
+                    self.assertEqual(path, self.subject.getHandle(fd).name())
+                    self.subject.unregisterHandle(fd)
+            except Exception as e:
+                errors.append(e)
+        
+        threads = [threading.Thread(target=worker, args=(f,)) for f in self.files]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual([], errors)
+        self.assertEqual(len(fds), len(set(fds)))
+        
+    def testLookupDoesNotTakeLock(self):
+        fd = self.subject.registerHandle(self.files[0], os.O_RDONLY)
+        acquisitions = list()
+        class LockStub(object):
+            def __enter__(self):
+                acquisitions.append(True)
+            def __exit__(self, *args):
+                pass
+        self.subject.sourcesLock = LockStub()
+        
+        for _ in range(0, 10):
+            self.subject.getHandle(fd)
+        with self.assertRaises(ValueError):
+            self.subject.getHandle(fd + 1)
+        
+        self.assertEqual([], acquisitions)
+        self.subject.unregisterHandle(fd)
+        self.assertEqual(1, len(acquisitions))
 
 if __name__ == "__main__":
     #import sys;sys.argv = ['', 'Test.testName']
@@ -68,6 +68,78 @@ class TestFuseArgumentParser(unittest.TestCase):
         expectedOtherOptions['qq'] = '15'
         self.assertDictContainsSubset(expectedOtherOptions, args.mountOptions.others)
         
+    def testFilesystemMountOptions(self):
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,allow_other,pathCacheSize=10'])
+        self.assertEqual({'pathCacheSize': 10}, args.mountOptions.fsOptions)
+        self.assertNotIn('pathCacheSize', args.mountOptions.others)
+        
+    def testFloatFilesystemMountOption(self):
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,attrTimeout=2.5'])
+        self.assertEqual(2.5, args.mountOptions.fsOptions['attrTimeout'])
+        
+    def testBooleanFilesystemMountOptions(self):
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,readdirPlus'])
+        self.assertTrue(args.mountOptions.fsOptions['readdirPlus'])
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,readdirPlus=false'])
+        self.assertFalse(args.mountOptions.fsOptions['readdirPlus'])
+        
+    def testProfileMountOptions(self):
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,perf=backup'])
+        self.assertEqual('backup', args.mountOptions.profile)
+        self.assertEqual(30, args.mountOptions.fsOptions['attrTimeout'])
+        self.assertTrue(args.mountOptions.others['auto_cache'])
+        self.assertEqual('131072', args.mountOptions.others['max_read'])
+        self.assertNotIn('perf', args.mountOptions.others)
+        
+    def testExplicitMountOptionsOverrideProfile(self):
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'attrTimeout=2,secret=123,fileSalt=f0,filenameSalt=fn0,perf=backup,max_read=4096,readdirPlus=false'])
+        self.assertEqual(2, args.mountOptions.fsOptions['attrTimeout'])
+        self.assertFalse(args.mountOptions.fsOptions['readdirPlus'])
+        self.assertEqual('4096', args.mountOptions.others['max_read'])
+        self.assertEqual(32, args.mountOptions.fsOptions['readAhead'])
+        
+    def testWithoutProfile(self):
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0'])
+        self.assertIsNone(args.mountOptions.profile)
+        self.assertEqual({}, args.mountOptions.fsOptions)
+        
+    def testErrorUnknownProfile(self):
+        with self.assertRaises(ArgumentTypeError) as _:
+            self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,perf=fast'])
+        
+    def testBackendMountOption(self):
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0'])
+        self.assertEqual('fusepy', args.mountOptions.backend)
+        args = self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,backend=pyfuse3'])
+        self.assertEqual('pyfuse3', args.mountOptions.backend)
+        self.assertNotIn('backend', args.mountOptions.others)
+        
+    def testErrorUnknownBackend(self):
+        with self.assertRaises(ArgumentTypeError) as _:
+            self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,backend=llfuse'])
+        
+    def testValidExportArguments(self):
+        args = self.subject.parseExportArguments([self.tmpDir1, self.tmpDir2, 'a', 'b/c', '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0', '--workers', '3'])
+        self.assertEqual(self.tmpDir1, args.source)
+        self.assertEqual(self.tmpDir2, args.target)
+        self.assertEqual(['a', 'b/c'], args.paths)
+        self.assertEqual('123', args.mountOptions.secret)
+        self.assertEqual(3, args.workers)
+        self.assertFalse(args.tar)
+        
+    def testExportToTarOnStdout(self):
+        args = self.subject.parseExportArguments([self.tmpDir1, '-', '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0', '--tar'])
+        self.assertTrue(args.tar)
+        self.assertEqual('-', args.target)
+        
+    def testErrorExportToNotExistingDirectory(self):
+        with self.assertRaises(ArgumentTypeError):
+            self.subject.parseExportArguments([self.tmpDir1, os.path.join(self.tmpDir2, 'missing'), '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0'])
+        
+    def testErrorInvalidFilesystemMountOption(self):
+        with self.assertRaises(ArgumentTypeError) as _:
+            self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f0,filenameSalt=fn0,pathCacheSize=-1'])
+        
     def testErrorInvalidFileSaltProvider(self):
         with self.assertRaises(ArgumentTypeError) as _:
             self.subject.parseArguments([self.tmpDir1, self.tmpDir2, '-o', 'secret=123,fileSalt=f3,filenameSalt=fn0'])
@@ -0,0 +1,44 @@
+import unittest
+from encviewfuse.fuse._InodeMap import InodeMap
+
+
+class TestInodeMap(unittest.TestCase):
+
+    def setUp(self):
+        self.subject = InodeMap(0x803)
+
+    def testInodesOfRootDeviceAreKept(self):
+        self.assertEqual(42, self.subject.inode(0x803, 42))
+
+    def testSmallDevicesArePrefixes(self):
+        self.assertEqual((45 << 48) | 42, self.subject.inode(45, 42))
+        self.assertNotEqual(self.subject.inode(45, 42), self.subject.inode(46, 42))
+
+    def testLargeDevicesGetDistinctPrefixes(self):
+        count = InodeMap.TABLE_PREFIX - InodeMap.ASSIGNED_PREFIXES
+        first = self.subject.inode(0x10301, 42)
+        second = self.subject.inode(0x10301 + count, 42)
+        self.assertNotEqual(first, second)
+        self.assertEqual(first, self.subject.inode(0x10301, 42))
+        for inode in (first, second):
+            self.assertGreaterEqual(inode >> 48, InodeMap.ASSIGNED_PREFIXES)
+            self.assertLess(inode >> 48, InodeMap.TABLE_PREFIX)
+        self.assertEqual(42, first & ((1 << 48) - 1))
+
+    def testLargeInodesAreNumberedByTable(self):
+        first = self.subject.inode(0x803, 1 << 50)
+        second = self.subject.inode(45, 1 << 50)
+        self.assertNotEqual(first, second)
+        self.assertEqual(InodeMap.TABLE_PREFIX, first >> 48)
+        self.assertEqual(first, self.subject.inode(0x803, 1 << 50))
+
+    def testExhaustedPrefixesFallBackToTable(self):
+        count = InodeMap.TABLE_PREFIX - InodeMap.ASSIGNED_PREFIXES
+        for index in range(0, count):
+            self.subject.inode(0x10000 + index, 1)
+        inode = self.subject.inode(0x10000 + count, 1)
+        self.assertEqual(InodeMap.TABLE_PREFIX, inode >> 48)
+
+
+if __name__ == '__main__':
+    unittest.main()
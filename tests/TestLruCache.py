@@ -0,0 +1,86 @@
+import unittest
+from unittest import mock
+from encviewfuse.fuse._LruCache import LruCache
+
+
+class TestLruCache(unittest.TestCase):
+
+    def setUp(self):
+        self.subject = LruCache(2)
+
+    def testGetMissing(self):
+        self.assertIsNone(self.subject.get('a'))
+        self.assertEqual(42, self.subject.get('a', 42))
+        self.assertEqual(2, self.subject.statistics()['misses'])
+
+    def testPutAndGet(self):
+        self.subject.put('a', 1)
+        self.assertEqual(1, self.subject.get('a'))
+        self.assertEqual(1, self.subject.statistics()['hits'])
+
+    def testEvictsLeastRecentlyUsed(self):
+        self.subject.put('a', 1)
+        self.subject.put('b', 2)
+        self.subject.get('a')
+        self.subject.put('c', 3)
+        self.assertIn('a', self.subject)
+        self.assertNotIn('b', self.subject)
+        self.assertIn('c', self.subject)
+        self.assertEqual(2, len(self.subject))
+
+    def testDisabledCache(self):
+        subject = LruCache(0)
+        subject.put('a', 1)
+        self.assertIsNone(subject.get('a'))
+
+    def testNegativeCapacity(self):
+        with self.assertRaises(ValueError) as _:
+            LruCache(-1)
+
+    def testInvalidEntryIsDropped(self):
+        self.subject.put('a', 1)
+        self.assertIsNone(self.subject.get('a', validate=lambda value: False))
+        self.assertNotIn('a', self.subject)
+        self.assertEqual(0, self.subject.statistics()['hits'])
+        self.assertEqual(1, self.subject.statistics()['misses'])
+
+    def testValidEntryIsReturned(self):
+        self.subject.put('a', 1)
+        self.assertEqual(1, self.subject.get('a', validate=lambda value: value == 1))
+        self.assertEqual(1, self.subject.statistics()['hits'])
+
+    def testExpiredEntry(self):
+        subject = LruCache(2, 10)
+        with mock.patch('time.monotonic', return_value=100):
+            subject.put('a', 1)
+        with mock.patch('time.monotonic', return_value=105):
+            self.assertEqual(1, subject.get('a'))
+        with mock.patch('time.monotonic', return_value=110):
+            self.assertIsNone(subject.get('a'))
+        self.assertNotIn('a', subject)
+
+    def testZeroTtlDisablesCache(self):
+        subject = LruCache(2, 0)
+        subject.put('a', 1)
+        self.assertIsNone(subject.get('a'))
+
+    def testWeighedCapacity(self):
+        subject = LruCache(10, weigh=len)
+        subject.put('a', b'12345')
+        subject.put('b', b'123456')
+        self.assertNotIn('a', subject)
+        self.assertEqual(6, subject.statistics()['weight'])
+        subject.put('c', b'12345678901')
+        self.assertNotIn('c', subject)
+        self.assertIn('b', subject)
+
+    def testRemoveIf(self):
+        self.subject.put('a', 1)
+        self.subject.put('b', 2)
+        self.assertEqual(1, self.subject.removeIf(lambda key, value: value > 1))
+        self.assertIn('a', self.subject)
+        self.assertNotIn('b', self.subject)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
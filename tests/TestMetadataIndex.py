@@ -0,0 +1,122 @@
+import os, shutil, tempfile, unittest
+from encviewfuse.fuse._MetadataIndex import MetadataIndex
+
+
+class TestMetadataIndex(unittest.TestCase):
+
+    class _SaltProviderMock(object):
+        def __init__(self, identifier):
+            self.identifier = identifier
+
+        def getId(self):
+            return self.identifier
+
+        def getSaltFor(self, absoluteFilePath):
+            return '42'
+
+    def setUp(self):
+        self.tmpDir = tempfile.mkdtemp()
+        self.indexFile = os.path.join(self.tmpDir, 'index.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpDir)
+
+    def testStoreAndLookup(self):
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        directory = subject.directory(1, 2)
+        self.assertIsNone(directory.lookup('file', 3, 4))
+        directory.store('file', 3, 4, 'encrypted')
+        directory.finish(['file'])
+        subject.close()
+
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        directory = subject.directory(1, 2)
+        self.assertEqual('encrypted', directory.lookup('file', 3, 4))
+        self.assertIsNone(directory.lookup('file', 3, 5))
+        self.assertIsNone(directory.lookup('file', 4, 4))
+        self.assertIsNone(subject.directory(1, 3).lookup('file', 3, 4))
+        subject.close()
+
+    def testLargeInodeNumbers(self):
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        subject.store((1 << 64) - 1, (1 << 63), 'file', (1 << 64) - 2, 4, 'encrypted')
+        subject.flush()
+        self.assertEqual({'file': ((1 << 64) - 2, 4, 'encrypted')}, subject.loadDirectory((1 << 64) - 1, (1 << 63)))
+        subject.close()
+
+    def testUndecodableNames(self):
+        name = os.fsdecode(b'\xff\xfe')
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        subject.store(1, 2, name, 3, 4, 'encrypted')
+        subject.flush()
+        self.assertEqual({name: (3, 4, 'encrypted')}, subject.loadDirectory(1, 2))
+        subject.close()
+
+    def testOtherFingerprintResetsIndex(self):
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        subject.store(1, 2, 'file', 3, 4, 'encrypted')
+        subject.close()
+
+        subject = MetadataIndex(self.indexFile, 'other fingerprint')
+        self.assertEqual({}, subject.loadDirectory(1, 2))
+        subject.close()
+
+    def testFinishRemovesMissingNames(self):
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        subject.store(1, 2, 'file1', 3, 4, 'encrypted1')
+        subject.store(1, 2, 'file2', 5, 6, 'encrypted2')
+        subject.flush()
+
+        directory = subject.directory(1, 2)
+        directory.lookup('file1', 3, 4)
+        directory.finish(['file1'])
+
+        self.assertEqual({'file1': (3, 4, 'encrypted1')}, subject.loadDirectory(1, 2))
+        subject.close()
+
+    def testStoreAndLoadDigest(self):
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        subject.storeDigest(1, 2 ** 64 - 1, 3, 4, 'salt', 'digest')
+        subject.close()
+
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        self.assertEqual('digest', subject.loadDigest(1, 2 ** 64 - 1, 3, 4, 'salt'))
+        self.assertIsNone(subject.loadDigest(1, 2 ** 64 - 1, 5, 4, 'salt'))
+        self.assertIsNone(subject.loadDigest(1, 2 ** 64 - 1, 3, 4, 'other'))
+        subject.close()
+
+    def testNewDigestReplacesOldOne(self):
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        subject.storeDigest(1, 2, 3, 4, 'salt', 'old')
+        subject.storeDigest(1, 2, 3, 4, 'other', 'other')
+        subject.storeDigest(1, 2, 5, 6, 'salt', 'new')
+        self.assertIsNone(subject.loadDigest(1, 2, 3, 4, 'salt'))
+        self.assertIsNone(subject.loadDigest(1, 2, 3, 4, 'other'))
+        self.assertEqual('new', subject.loadDigest(1, 2, 5, 6, 'salt'))
+        subject.close()
+
+    def testDigestsPerSalt(self):
+        subject = MetadataIndex(self.indexFile, 'fingerprint')
+        subject.storeDigest(1, 2, 3, 4, 'a', 'digestA')
+        subject.storeDigest(1, 2, 3, 4, 'b', 'digestB')
+        self.assertEqual('digestA', subject.loadDigest(1, 2, 3, 4, 'a'))
+        self.assertEqual('digestB', subject.loadDigest(1, 2, 3, 4, 'b'))
+        
+        subject.removeDigests(1, 2)
+        self.assertIsNone(subject.loadDigest(1, 2, 3, 4, 'a'))
+        self.assertIsNone(subject.loadDigest(1, 2, 3, 4, 'b'))
+        subject.close()
+
+    def testFingerprint(self):
+        providerA = TestMetadataIndex._SaltProviderMock('a')
+        providerB = TestMetadataIndex._SaltProviderMock('b')
+        fingerprint = MetadataIndex.fingerprint('secret', providerA, providerB)
+
+        self.assertEqual(fingerprint, MetadataIndex.fingerprint('secret', providerA, providerB))
+        self.assertNotEqual(fingerprint, MetadataIndex.fingerprint('other secret', providerA, providerB))
+        self.assertNotEqual(fingerprint, MetadataIndex.fingerprint('secret', providerB, providerA))
+        self.assertNotIn('secret', fingerprint)
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
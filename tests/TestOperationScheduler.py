@@ -0,0 +1,74 @@
+import threading
+import unittest
+from encviewfuse.fuse._OperationScheduler import OperationScheduler
+
+
+class TestOperationScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.subject = OperationScheduler(2, 1)
+
+    def tearDown(self):
+        self.subject.shutdown()
+
+    def testRunsInWorkers(self):
+        threadName = self.subject.run('getattr', lambda: threading.current_thread().name)
+        self.assertTrue(threadName.startswith('encviewfuse-metadata'))
+        threadName = self.subject.run('read', lambda: threading.current_thread().name, 3)
+        self.assertTrue(threadName.startswith('encviewfuse-data'))
+
+    def testPropagatesExceptions(self):
+        def fail():
+            raise OSError(2, 'missing')
+        with self.assertRaises(OSError):
+            self.subject.run('getattr', fail)
+
+    def testWithoutWorkersRunsInCallingThread(self):
+        subject = OperationScheduler(0, 0)
+        self.assertIs(threading.current_thread(), subject.run('read', threading.current_thread, 1))
+        self.assertEqual(0, subject.statistics()['data']['scheduled'])
+
+    def testMetadataDoesNotWaitForData(self):
+        release = threading.Event()
+        reader = threading.Thread(target=self.subject.run, args=('read', release.wait, 1))
+        reader.start()
+        try:
+            self.assertEqual(42, self.subject.run('getattr', lambda: 42))
+        finally:
+            release.set()
+            reader.join()
+
+    def testServesKeysInTurn(self):
+        release = threading.Event()
+        order = list()
+        blocker = threading.Thread(target=self.subject.run, args=('read', release.wait, 0))
+        blocker.start()
+        self.__waitFor(lambda: self.subject.statistics()['data']['queued'] == 0)
+        threads = list()
+        # three reads of handle 1 are queued before the one of handle 2
+        for key, value in ((1, 'a'), (1, 'b'), (1, 'c'), (2, 'x')):
+            thread = threading.Thread(target=self.subject.run, args=('read', lambda value=value: order.append(value), key))
+            threads.append(thread)
+            thread.start()
+            self.__waitFor(lambda count=len(threads): self.subject.statistics()['data']['queued'] == count)
+        release.set()
+        for thread in [blocker] + threads:
+            thread.join()
+        self.assertEqual(['a', 'x', 'b', 'c'], order)
+
+    def testRunsDirectlyAfterShutdown(self):
+        self.subject.shutdown()
+        self.assertIs(threading.current_thread(), self.subject.run('getattr', threading.current_thread))
+
+    @staticmethod
+    def __waitFor(condition):
+        event = threading.Event()
+        for _ in range(0, 500):
+            if condition():
+                return
+            event.wait(0.01)
+        raise AssertionError('The condition was not met in time.')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from encviewfuse.fuse._PathTrie import PathTrie
+
+
+class TestPathTrie(unittest.TestCase):
+
+    def setUp(self):
+        self.subject = PathTrie(3)
+
+    def testLongestPrefixEmpty(self):
+        self.assertEqual((0, None), self.subject.longestPrefix(['a', 'b']))
+
+    def testLongestPrefix(self):
+        self.assertTrue(self.subject.insert(['a'], 1))
+        self.assertTrue(self.subject.insert(['a', 'b'], 2))
+        self.assertEqual((2, 2), self.subject.longestPrefix(['a', 'b', 'c']))
+        self.assertEqual((1, 1), self.subject.longestPrefix(['a', 'c']))
+        statistics = self.subject.statistics()
+        self.assertEqual(3, statistics['hits'])
+        self.assertEqual(2, statistics['misses'])
+
+    def testInsertWithoutParent(self):
+        self.assertFalse(self.subject.insert(['a', 'b'], 2))
+        self.assertEqual(0, len(self.subject))
+
+    def testInsertReplacesValue(self):
+        self.subject.insert(['a'], 1)
+        self.subject.insert(['a'], 2)
+        self.assertEqual((1, 2), self.subject.longestPrefix(['a']))
+        self.assertEqual(1, len(self.subject))
+
+    def testRemoveSubtree(self):
+        self.subject.insert(['a'], 1)
+        self.subject.insert(['a', 'b'], 2)
+        self.subject.insert(['c'], 3)
+        self.subject.remove(['a'])
+        self.assertEqual((0, None), self.subject.longestPrefix(['a', 'b']))
+        self.assertEqual(1, len(self.subject))
+
+    def testClearedWhenFull(self):
+        self.subject.insert(['a'], 1)
+        self.subject.insert(['a', 'b'], 2)
+        self.subject.insert(['a', 'b', 'c'], 3)
+        self.assertTrue(self.subject.insert(['d'], 4))
+        self.assertEqual(1, len(self.subject))
+        self.assertEqual((1, 4), self.subject.longestPrefix(['d']))
+
+    def testDisabledTrie(self):
+        subject = PathTrie(0)
+        self.assertFalse(subject.insert(['a'], 1))
+        self.assertEqual((0, None), subject.longestPrefix(['a']))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,249 @@
+import asyncio, os, shutil, stat, subprocess, sys, tempfile, time, unittest
+from unittest import mock
+from encviewfuse.fuse.EncryptedFuseFs import EncViewFuse
+from encviewfuse.fuse._ArgumentParser import FuseArgumentParser
+from deterministic_encryption_utils.encryption.extensions.ExtensionRegistry import ExtensionRegistry
+from deterministic_encryption_utils.encryption.Encryption import Encryption
+try:
+    import pyfuse3
+    from encviewfuse.fuse._Pyfuse3Backend import Pyfuse3Operations
+except ImportError:
+    pyfuse3 = None
+
+
+@unittest.skipIf(pyfuse3 is None, 'pyfuse3 is not installed')
+class TestPyfuse3Backend(unittest.TestCase):
+
+    class _SaltProviderMock(object):
+        def getSaltFor(self, absoluteFilePath):
+            return '42'
+
+    class _NameSaltProviderMock(object):
+        def getSaltFor(self, absoluteFilePath):
+            return os.path.basename(absoluteFilePath)
+
+    def setUp(self):
+        # RootDir
+        # - f1
+        # - l1 (hard link of f1)
+        # - d1
+        #   - f2
+        # - dl1 (--> d1)
+        self.rootDir = tempfile.mkdtemp()
+        self.f1 = self.__createFile(self.rootDir, 'f1', 1000)
+        os.link(self.f1, os.path.join(self.rootDir, 'l1'))
+        self.d1 = os.path.join(self.rootDir, 'd1')
+        os.mkdir(self.d1)
+        self.f2 = self.__createFile(self.d1, 'f2', 15)
+        os.symlink(self.d1, os.path.join(self.rootDir, 'dl1'))
+        saltProvider = TestPyfuse3Backend._SaltProviderMock()
+        self.encryption = Encryption('abc', saltProvider, saltProvider)
+        self.fs = EncViewFuse(self.rootDir, 'abc', saltProvider, saltProvider)
+        self.subject = Pyfuse3Operations(self.fs, negativeTimeout=1.0, keepCache=Pyfuse3Operations.KEEP_CACHE_AUTO)
+
+    def tearDown(self):
+        self.subject.shutdown()
+        shutil.rmtree(self.rootDir)
+
+    def testLookupAndGetattrMatchFusepyBackend(self):
+        entry = self.__lookup(pyfuse3.ROOT_INODE, self.f1)
+        expected = self.fs.getattr(self.encryption.encryptPath(self.rootDir, '/f1'))
+
+        self.assertEqual(expected['st_ino'], entry.st_ino)
+        self.assertEqual(expected['st_size'], entry.st_size)
+        self.assertEqual(expected['st_mode'], entry.st_mode)
+        self.assertEqual(expected['st_size'], self.__run(self.subject.getattr(entry.st_ino)).st_size)
+
+    def testLookupOfMissingEntryIsCachedNegatively(self):
+        entry = self.__run(self.subject.lookup(pyfuse3.ROOT_INODE, b'missing'))
+        self.assertEqual(0, entry.st_ino)
+        self.assertEqual(1.0, entry.entry_timeout)
+
+    def testHardLinksWithSameSaltShareNode(self):
+        nodes = self.__readHardLinks(self.subject, self.fs)
+        self.assertEqual(nodes[0][0], nodes[1][0])
+        for _, data, expected in nodes:
+            self.assertEqual(expected, data)
+
+    def testHardLinksWithNameDependentSaltGetOwnNodes(self):
+        fs = EncViewFuse(self.rootDir, 'abc', TestPyfuse3Backend._NameSaltProviderMock(), TestPyfuse3Backend._SaltProviderMock())
+        subject = Pyfuse3Operations(fs)
+        try:
+            nodes = self.__readHardLinks(subject, fs)
+        finally:
+            subject.shutdown()
+        self.assertNotEqual(nodes[0][0], nodes[1][0])
+        self.assertNotEqual(nodes[0][1], nodes[1][1])
+        for _, data, expected in nodes:
+            self.assertEqual(expected, data)
+
+    def testLinkedDirectoriesGetOwnNodes(self):
+        directory = self.__lookup(pyfuse3.ROOT_INODE, self.d1)
+        link = self.__lookup(pyfuse3.ROOT_INODE, os.path.join(self.rootDir, 'dl1'))
+        self.assertNotEqual(directory.st_ino, link.st_ino)
+        self.assertEqual(self.__lookup(directory.st_ino, self.f2).st_ino, self.__lookup(link.st_ino, self.f2).st_ino)
+
+    def testReadMatchesFusepyBackend(self):
+        entry = self.__lookup(pyfuse3.ROOT_INODE, self.f1)
+        fileInfo = self.__run(self.subject.open(entry.st_ino, os.O_RDONLY))
+        try:
+            data = self.__run(self.subject.read(fileInfo.fh, 0, 4096))
+        finally:
+            self.__run(self.subject.release(fileInfo.fh))
+        fh = self.fs.open(self.encryption.encryptPath(self.rootDir, '/f1'), os.O_RDONLY)
+        try:
+            self.assertEqual(self.fs.read(None, 4096, 0, fh), data)
+        finally:
+            self.fs.release(None, fh)
+
+    def testOpenKeepsCacheOfUnchangedFile(self):
+        entry = self.__lookup(pyfuse3.ROOT_INODE, self.f1)
+        for keepCache in (False, True):
+            fileInfo = self.__run(self.subject.open(entry.st_ino, os.O_RDONLY))
+            self.assertEqual(keepCache, fileInfo.keep_cache)
+            self.__run(self.subject.release(fileInfo.fh))
+
+    def testReaddirStreamsEntriesWithAttributes(self):
+        expected = sorted(name for name in self.fs.readdir('/', None) if name not in ('.', '..'))
+        replies = list()
+        def reply(token, name, entry, nextId):
+            # the buffer of every request only takes two entries
+            if len(token) == 2:
+                return False
+            token.append(name)
+            replies.append((os.fsdecode(name), entry.st_mode, nextId))
+            return True
+        fh = self.__run(self.subject.opendir(pyfuse3.ROOT_INODE))
+        try:
+            self.assertIsNone(self.subject.directories[fh].entries)
+            with mock.patch('pyfuse3.readdir_reply', side_effect=reply):
+                for _ in range(0, len(expected)):
+                    self.__run(self.subject.readdir(fh, len(replies), list()))
+        finally:
+            self.__run(self.subject.releasedir(fh))
+        self.assertEqual(expected, sorted(name for name, _, _ in replies))
+        self.assertEqual(list(range(1, len(expected) + 1)), [nextId for _, _, nextId in replies])
+        self.assertTrue(all(mode != 0 for _, mode, _ in replies))
+
+    def testReaddirFromEarlierOffsetReadsAgain(self):
+        names = list()
+        def reply(token, name, entry, nextId):
+            names.append(os.fsdecode(name))
+            return True
+        fh = self.__run(self.subject.opendir(pyfuse3.ROOT_INODE))
+        try:
+            with mock.patch('pyfuse3.readdir_reply', side_effect=reply):
+                self.__run(self.subject.readdir(fh, 0, None))
+                count = len(names)
+                self.__run(self.subject.readdir(fh, 1, None))
+        finally:
+            self.__run(self.subject.releasedir(fh))
+        self.assertEqual(names[1:count], names[count:])
+
+    def testForgetDropsNode(self):
+        entry = self.__lookup(pyfuse3.ROOT_INODE, self.f1)
+        self.__run(self.subject.forget([(entry.st_ino, 1)]))
+        with self.assertRaises(pyfuse3.FUSEError):
+            self.__run(self.subject.getattr(entry.st_ino))
+
+    def __lookup(self, parentInode, absPath, subject=None):
+        name = self.encryption.encryptFileName(absPath, os.path.basename(absPath))
+        return self.__run((subject or self.subject).lookup(parentInode, os.fsencode(name)))
+
+    def __readHardLinks(self, subject, fs):
+        '''
+        Returns (node id, content read through the node, content of the view
+        path) for both names of f1.
+        '''
+        nodes = list()
+        for absPath in (self.f1, os.path.join(self.rootDir, 'l1')):
+            inode = self.__lookup(pyfuse3.ROOT_INODE, absPath, subject).st_ino
+            fileInfo = self.__run(subject.open(inode, os.O_RDONLY))
+            try:
+                data = self.__run(subject.read(fileInfo.fh, 0, 4096))
+            finally:
+                self.__run(subject.release(fileInfo.fh))
+            fh = fs.open(self.encryption.encryptPath(self.rootDir, absPath[len(self.rootDir):]), os.O_RDONLY)
+            try:
+                nodes.append((inode, data, fs.read(None, 4096, 0, fh)))
+            finally:
+                fs.release(None, fh)
+        return nodes
+
+    @staticmethod
+    def __run(coroutine):
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(coroutine)
+        finally:
+            loop.close()
+
+    @staticmethod
+    def __createFile(path, name, size):
+        filePath = os.path.join(path, name)
+        with open(filePath, 'wb') as f:
+            f.write(os.urandom(size))
+        return filePath
+
+
+def _canMount():
+    '''
+    Returns whether the installed pyfuse3 can mount here, which the stub of
+    the other tests cannot.
+    '''
+    return pyfuse3 is not None and hasattr(pyfuse3, 'main') and os.path.exists('/dev/fuse') \
+        and shutil.which('fusermount3') is not None
+
+
+@unittest.skipUnless(_canMount(), 'pyfuse3 cannot mount here')
+class TestPyfuse3Mount(unittest.TestCase):
+
+    def setUp(self):
+        self.rootDir = tempfile.mkdtemp()
+        self.mountDir = tempfile.mkdtemp()
+        with open(os.path.join(self.rootDir, 'f1'), 'wb') as f:
+            f.write(os.urandom(100000))
+        # the filename salt gives the hard link a content of its own
+        os.link(os.path.join(self.rootDir, 'f1'), os.path.join(self.rootDir, 'l1'))
+        os.mkdir(os.path.join(self.rootDir, 'd1'))
+        options = 'secret=abc,fileSalt=filename,filenameSalt=filename'
+        args = FuseArgumentParser(ExtensionRegistry()).parseArguments([self.rootDir, self.mountDir, '-o', options])
+        self.fs = EncViewFuse(args.device, args.mountOptions.secret, args.mountOptions.fileSalt, args.mountOptions.filenameSalt)
+        self.process = subprocess.Popen([sys.executable, '-m', 'encviewfuse.fuse.EncryptedFuseFs', self.rootDir, self.mountDir,
+                                         '-o', options + ',backend=pyfuse3'])
+
+    def tearDown(self):
+        if os.path.ismount(self.mountDir):
+            subprocess.call(['fusermount3', '-u', self.mountDir])
+        try:
+            self.process.wait(10)
+        finally:
+            self.process.kill()
+            shutil.rmtree(self.mountDir)
+            shutil.rmtree(self.rootDir)
+
+    def testMountedViewMatchesFilesystem(self):
+        deadline = time.monotonic() + 10
+        while not os.path.ismount(self.mountDir):
+            self.assertIsNone(self.process.poll(), 'The mount process ended.')
+            self.assertLess(time.monotonic(), deadline, 'The directory was not mounted in time.')
+            time.sleep(0.05)
+        
+        expected = sorted(name for name in self.fs.readdir('/', None) if name not in ('.', '..'))
+        self.assertEqual(expected, sorted(os.listdir(self.mountDir)))
+        for name in expected:
+            attributes = self.fs.getattr('/' + name)
+            self.assertEqual(attributes['st_size'], os.stat(os.path.join(self.mountDir, name)).st_size)
+            if not stat.S_ISREG(attributes['st_mode']):
+                continue
+            fh = self.fs.open('/' + name, os.O_RDONLY)
+            try:
+                content = self.fs.read(None, attributes['st_size'], 0, fh)
+            finally:
+                self.fs.release(None, fh)
+            with open(os.path.join(self.mountDir, name), 'rb') as f:
+                self.assertEqual(content, f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from threading import Event
+from encviewfuse.fuse._ReadAhead import ReadAhead
+
+
+class TestReadAhead(unittest.TestCase):
+
+    def setUp(self):
+        self.subject = ReadAhead(16, 4, 1)
+
+    def tearDown(self):
+        self.subject.shutdown()
+
+    def testWindowGrowsForSequentialReads(self):
+        self.assertEqual(1, self.subject.access(1, 0, 16))
+        self.assertEqual(2, self.subject.access(1, 16, 16))
+        self.assertEqual(4, self.subject.access(1, 32, 16))
+        self.assertEqual(4, self.subject.access(1, 48, 16))
+
+    def testWindowDropsForRandomReads(self):
+        self.subject.access(1, 0, 16)
+        self.subject.access(1, 16, 16)
+        self.assertEqual(0, self.subject.access(1, 64, 16))
+        self.assertEqual(1, self.subject.access(1, 80, 16))
+
+    def testHandlesAreIndependent(self):
+        self.subject.access(1, 0, 16)
+        self.assertEqual(1, self.subject.access(2, 0, 16))
+        self.assertEqual(2, self.subject.access(1, 16, 16))
+
+    def testDisabled(self):
+        subject = ReadAhead(16, 0, 1)
+        self.assertFalse(subject.isEnabled())
+        self.assertEqual(0, subject.access(1, 0, 16))
+
+    def testScheduleAndTake(self):
+        self.subject.access(1, 0, 16)
+        self.subject.schedule(1, 'file', 1, lambda: b'block')
+        self.assertEqual(b'block', self.subject.take(1, 'file', 1))
+        self.assertIsNone(self.subject.take(1, 'file', 1))
+
+    def testTakeForChangedFile(self):
+        self.subject.access(1, 0, 16)
+        self.subject.schedule(1, 'file', 1, lambda: b'block')
+        self.assertIsNone(self.subject.take(1, 'changed file', 1))
+
+    def testTakeFailedBlock(self):
+        def failingFunction():
+            raise OSError()
+        self.subject.access(1, 0, 16)
+        self.subject.schedule(1, 'file', 1, failingFunction)
+        self.assertIsNone(self.subject.take(1, 'file', 1))
+
+    def testRandomReadDropsPendingBlocks(self):
+        self.subject.access(1, 0, 16)
+        self.subject.schedule(1, 'file', 1, lambda: b'block')
+        self.subject.access(1, 64, 16)
+        self.assertIsNone(self.subject.take(1, 'file', 1))
+
+    def testReleaseWaitsForRunningBlocks(self):
+        started = Event()
+        finished = Event()
+        def slowFunction():
+            started.set()
+            finished.wait(0.1)
+            finished.set()
+            return b'block'
+        self.subject.access(1, 0, 16)
+        self.subject.schedule(1, 'file', 1, slowFunction)
+        started.wait()
+        self.subject.release(1)
+        self.assertTrue(finished.is_set())
+        self.assertIsNone(self.subject.take(1, 'file', 1))
+
+if __name__ == "__main__":
+    #import sys;sys.argv = ['', 'Test.testName']
+    unittest.main()
@@ -0,0 +1,84 @@
+import os, shutil, tempfile, unittest
+from threading import Condition
+from encviewfuse.fuse._SourceWatcher import SourceWatcher
+
+try:
+    SourceWatcher(None, None).stop()
+    INOTIFY_AVAILABLE = True
+except (OSError, TypeError):
+    INOTIFY_AVAILABLE = False
+
+
+@unittest.skipUnless(INOTIFY_AVAILABLE, 'inotify is not available')
+class TestSourceWatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.rootDir = tempfile.mkdtemp()
+        self.changes = list()
+        self.overflows = 0
+        self.condition = Condition()
+        self.subject = SourceWatcher(self.__changed, self.__overflow)
+
+    def tearDown(self):
+        self.subject.stop()
+        shutil.rmtree(self.rootDir)
+
+    def testReportsCreatedFile(self):
+        self.__start()
+        open(os.path.join(self.rootDir, 'f1'), 'w').close()
+        self.__waitFor((self.rootDir, 'f1', False))
+
+    def testReportsChangesInSubdirectories(self):
+        subdir = os.path.join(self.rootDir, 'd1')
+        os.mkdir(subdir)
+        self.__start()
+        with open(os.path.join(subdir, 'f1'), 'w') as f:
+            f.write('content')
+        self.__waitFor((subdir, 'f1', False))
+
+    def testWatchesNewDirectories(self):
+        self.__start()
+        subdir = os.path.join(self.rootDir, 'd1')
+        os.mkdir(subdir)
+        self.__waitFor((self.rootDir, 'd1', True))
+        open(os.path.join(subdir, 'f1'), 'w').close()
+        self.__waitFor((subdir, 'f1', False))
+
+    def testFollowsMovedDirectories(self):
+        os.mkdir(os.path.join(self.rootDir, 'd1'))
+        self.__start()
+        os.rename(os.path.join(self.rootDir, 'd1'), os.path.join(self.rootDir, 'd2'))
+        self.__waitFor((self.rootDir, 'd2', True))
+        open(os.path.join(self.rootDir, 'd2', 'f1'), 'w').close()
+        self.__waitFor((os.path.join(self.rootDir, 'd2'), 'f1', False))
+
+    def testReportsDeletedFile(self):
+        filePath = os.path.join(self.rootDir, 'f1')
+        open(filePath, 'w').close()
+        self.__start()
+        os.remove(filePath)
+        self.__waitFor((self.rootDir, 'f1', False))
+
+    def testComplete(self):
+        self.__start()
+        self.assertTrue(self.subject.isComplete())
+
+    def __start(self):
+        self.subject.watchTree(self.rootDir)
+        self.subject.start()
+
+    def __waitFor(self, change):
+        with self.condition:
+            self.assertTrue(self.condition.wait_for(lambda: change in self.changes, 5), '{0} was not reported'.format(change))
+
+    def __changed(self, directory, name, isDirectory):
+        with self.condition:
+            self.changes.append((directory, name, isDirectory))
+            self.condition.notify_all()
+
+    def __overflow(self):
+        self.overflows += 1
+
+
+if __name__ == "__main__":
+    unittest.main()
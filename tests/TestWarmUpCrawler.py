@@ -0,0 +1,69 @@
+import time
+import unittest
+from threading import Lock
+from encviewfuse.fuse._WarmUpCrawler import WarmUpCrawler
+
+
+class TestWarmUpCrawler(unittest.TestCase):
+
+    # maps directories to (mtime, subdirectory) tuples
+    TREE = {'/': [(1, '/a'), (3, '/b'), (2, '/c')],
+            '/a': [(5, '/a/x')],
+            '/b': [],
+            '/c': [],
+            '/a/x': []}
+
+    def setUp(self):
+        self.visited = list()
+        self.lock = Lock()
+
+    def testVisitsWholeTree(self):
+        subject = WarmUpCrawler(self.__visit, 2, 0)
+        subject.start('/')
+        subject.join()
+        self.assertTrue(subject.isFinished())
+        self.assertEqual(sorted(TestWarmUpCrawler.TREE.keys()), sorted(self.visited))
+
+    def testVisitsRecentlyModifiedDirectoriesFirst(self):
+        subject = WarmUpCrawler(self.__visit, 1, 0)
+        subject.start('/')
+        subject.join()
+        self.assertEqual(['/', '/b', '/c', '/a', '/a/x'], self.visited)
+
+    def testFailingVisitIsSkipped(self):
+        def visit(directory):
+            if directory == '/a':
+                raise OSError()
+            return self.__visit(directory)
+        subject = WarmUpCrawler(visit, 1, 0)
+        subject.start('/')
+        subject.join()
+        self.assertEqual(['/', '/b', '/c'], self.visited)
+
+    def testRateLimitsVisits(self):
+        subject = WarmUpCrawler(lambda directory: (10, [(0, directory + 'x')]), 1, 100)
+        subject.start('/')
+        time.sleep(0.25)
+        subject.stop()
+        self.assertLess(subject.visited, 10)
+
+    def testStop(self):
+        subject = WarmUpCrawler(lambda directory: (1, [(0, directory + 'x')]), 2, 0)
+        subject.start('/')
+        subject.stop()
+        self.assertTrue(subject.isFinished())
+        for thread in subject.threads:
+            self.assertFalse(thread.is_alive())
+
+    def testInvalidArguments(self):
+        self.assertRaises(ValueError, WarmUpCrawler, self.__visit, 0, 0)
+        self.assertRaises(ValueError, WarmUpCrawler, self.__visit, 1, -1)
+
+    def __visit(self, directory):
+        with self.lock:
+            self.visited.append(directory)
+        return 1, TestWarmUpCrawler.TREE[directory]
+
+
+if __name__ == "__main__":
+    unittest.main()